@@ -0,0 +1,100 @@
+# benchmarks/import_budget.py
+"""
+Ngân sách thời gian import (cold start) cho app và các module lõi.
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --repeat 7 --scale 2.0 --json import_times.json
+
+Mỗi mục được import trong một tiến trình Python mới (đo bằng perf_counter, lấy min
+của --repeat lần) và kiểm tra hai điều:
+  * thời gian import <= budget_ms * --scale (máy CI chậm hơn thì tăng --scale)
+  * các thư viện nặng bị cấm (pandas, altair, docx, openpyxl...) KHÔNG bị nạp kèm
+
+Vi phạm thì in BUDGET và thoát với mã 1. "app.startup" là đúng tập import ở đầu
+main.py, tức phần phải chạy xong trước khi st.set_page_config/tiêu đề hiện ra.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY = ("pandas", "altair", "docx", "openpyxl", "pyarrow", "aiohttp")
+
+# tên -> (các module import cùng lúc, budget ms, thư viện không được nạp)
+BUDGETS = {
+    "app.startup": (("streamlit", "src.export.lazy_export", "src.logic.parse_cache", "src.monitoring.metrics"),
+                    450, HEAVY),
+    "src.monitoring.metrics": (("src.monitoring.metrics",), 60, HEAVY + ("numpy",)),
+    "src.logic.parser_docx": (("src.logic.parser_docx",), 80, HEAVY + ("numpy",)),
+    "src.logic.parse_cache": (("src.logic.parse_cache",), 40, HEAVY + ("numpy",)),
+    "src.export.lazy_export": (("src.export.lazy_export",), 40, HEAVY + ("numpy",)),
+    "src.export.excel_stream": (("src.export.excel_stream",), 80, HEAVY + ("numpy",)),
+    "src.export.report_engine": (("src.export.report_engine",), 80, HEAVY + ("numpy",)),
+    "src.logic.finance": (("src.logic.finance",), 200, HEAVY),
+    "src.storage.dossier_store": (("src.storage.dossier_store",), 200, HEAVY),
+    "src.ui.charts": (("src.ui.charts",), 200, HEAVY),
+    "src.portfolio.book": (("src.portfolio.book",), 200, HEAVY),
+    # worker process con import lại module này: giữ pandas/docx/openpyxl ngoài lúc import
+    "src.service.api": (("src.service.api",), 400, tuple(h for h in HEAVY if h != "aiohttp")),
+    "src.ui.components": (("src.ui.components",), 1000, HEAVY),
+}
+
+_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+for m in {modules!r}:
+    __import__(m)
+dt = time.perf_counter() - t0
+print(json.dumps({{"ms": dt * 1000, "loaded": sorted({{n.split(".")[0] for n in sys.modules}})}}))
+"""
+
+def measure(modules, repeat):
+    """Thời gian import nhỏ nhất (ms) qua `repeat` tiến trình mới và tập gói gốc đã nạp."""
+    best, loaded = None, set()
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(modules=tuple(modules))],
+                             capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        best = r["ms"] if best is None else min(best, r["ms"])
+        loaded |= set(r["loaded"])
+    return best, loaded
+
+def run(names, repeat, scale):
+    results, problems = {}, []
+    for name in names:
+        modules, budget_ms, forbidden = BUDGETS[name]
+        ms, loaded = measure(modules, repeat)
+        leaked = sorted(set(forbidden) & loaded)
+        limit = budget_ms * scale
+        results[name] = {"ms": ms, "budget_ms": limit, "leaked": leaked}
+        status = "ok" if ms <= limit and not leaked else "OVER"
+        print(f"{name:<26} {ms:8.1f} ms / {limit:6.0f} ms  {status}"
+              + (f"  nạp kèm: {', '.join(leaked)}" if leaked else ""), file=sys.stderr)
+        if ms > limit:
+            problems.append(f"{name}: {ms:.1f} ms > budget {limit:.0f} ms")
+        if leaked:
+            problems.append(f"{name}: nạp thư viện nặng lúc import: {', '.join(leaked)}")
+    return results, problems
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Kiểm tra ngân sách thời gian import của app")
+    ap.add_argument("names", nargs="*", help=f"chỉ đo các mục này (mặc định: tất cả): {', '.join(BUDGETS)}")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--scale", type=float, default=1.0, help="nhân budget (máy chậm)")
+    ap.add_argument("--json", help="ghi kết quả ra file JSON")
+    args = ap.parse_args(argv)
+    unknown = [n for n in args.names if n not in BUDGETS]
+    if unknown:
+        ap.error(f"không có mục: {', '.join(unknown)}")
+
+    results, problems = run(args.names or list(BUDGETS), args.repeat, args.scale)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    for p in problems:
+        print("BUDGET " + p, file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/load_api.py
+"""
+Load test cho HTTP API (src/service/api.py).
+
+    python -m benchmarks.load_api --spawn --workers 4 --duration 10 --concurrency 64
+    python -m benchmarks.load_api --url http://127.0.0.1:8090 --mix parse=1,schedule=4
+
+--spawn tự chạy service ở tiến trình con (cổng --port) rồi dừng khi xong.
+Hồ sơ gửi lên /parse được sinh bởi benchmarks.synthetic (--unique file khác nhau,
+dùng xoay vòng: sau vòng đầu phần lớn là cache hit). In thông lượng (request/s),
+độ trễ p50/p95/p99 theo endpoint và số request theo mã trạng thái (503 = bị từ
+chối do backpressure).
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.synthetic import make_dossier
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))]
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def _requests(docs, rnd):
+    """Sinh (endpoint, kwargs cho session.post) theo từng loại."""
+    return {
+        "parse": lambda: ("/parse", {"data": rnd.choice(docs)}),
+        "schedule": lambda: ("/schedule", {"json": {
+            "principal": rnd.randrange(100, 5000) * 1_000_000, "rate": rnd.choice([7.5, 8.5, 9.5]),
+            "months": rnd.choice([12, 60, 120, 240]), "monthly_income": 50_000_000,
+            "collateral_value": 3_000_000_000, "limit": 24}}),
+        "xlsx": lambda: ("/export/xlsx", {"json": {"principal": 1_500_000_000, "rate": 8.5,
+                                                   "months": rnd.choice([60, 120, 240])}}),
+        "docx": lambda: ("/export/docx", {"json": {"principal": 1_500_000_000, "rate": 8.5,
+                                                   "months": rnd.choice([60, 120, 240])}}),
+    }
+
+async def run(url, duration, concurrency, mix, unique, seed):
+    rnd = random.Random(seed)
+    docs = [make_dossier(i)[0] for i in range(unique)]
+    makers = _requests(docs, rnd)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies = {n: [] for n in names}
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(session):
+        while time.perf_counter() < deadline:
+            name = rnd.choices(names, weights)[0]
+            path, kwargs = makers[name]()
+            t0 = time.perf_counter()
+            try:
+                async with session.post(url + path, **kwargs) as resp:
+                    await resp.read()
+                    status = resp.status
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            latencies[name].append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(statuses.values())
+    report = {"requests": total, "seconds": elapsed, "rps": total / elapsed, "statuses": statuses, "endpoints": {}}
+    for n, lat in latencies.items():
+        report["endpoints"][n] = {
+            "requests": len(lat),
+            "p50_ms": _percentile(lat, 50) * 1000,
+            "p95_ms": _percentile(lat, 95) * 1000,
+            "p99_ms": _percentile(lat, 99) * 1000,
+        }
+    return report
+
+async def _wait_ready(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url + "/health") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"service không sẵn sàng sau {timeout}s: {url}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load test HTTP API thẩm định")
+    ap.add_argument("--url", default=None, help="địa chỉ service (mặc định: http://127.0.0.1:PORT)")
+    ap.add_argument("--spawn", action="store_true", help="tự chạy service trong tiến trình con")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--workers", type=int, default=None, help="số process của service khi --spawn")
+    ap.add_argument("--max-pending", type=int, default=None)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--mix", default="parse=1,schedule=4", help="tỉ trọng endpoint: parse,schedule,xlsx,docx")
+    ap.add_argument("--unique", type=int, default=50, help="số file .docx khác nhau gửi lên /parse")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="ghi kết quả ra file JSON")
+    args = ap.parse_args(argv)
+
+    url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    proc = None
+    if args.spawn:
+        cmd = [sys.executable, "-m", "src.service.api", "--port", str(args.port)]
+        if args.workers:
+            cmd += ["--workers", str(args.workers)]
+        if args.max_pending:
+            cmd += ["--max-pending", str(args.max_pending)]
+        proc = subprocess.Popen(cmd)
+    try:
+        asyncio.run(_wait_ready(url))
+        report = asyncio.run(run(url, args.duration, args.concurrency, _parse_mix(args.mix), args.unique, args.seed))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print(f"{report['requests']} request trong {report['seconds']:.1f}s = {report['rps']:.0f} req/s; "
+          f"trạng thái: {report['statuses']}", file=sys.stderr)
+    for name, r in report["endpoints"].items():
+        print(f"  {name:<9} {r['requests']:7d}  p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  "
+              f"p99 {r['p99_ms']:7.1f} ms", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/portfolio_bench.py
+"""
+Benchmark truy vấn danh mục (src/portfolio/book.py) trên dữ liệu giả lập.
+
+    python -m benchmarks.portfolio_bench                       # 1 triệu khoản, 20 part
+    python -m benchmarks.portfolio_bench -n 5000000 --parts 50 --dir /tmp/portfolio --keep
+
+Sinh N khoản vay (chi nhánh, sản phẩm, ngày thẩm định, tiền vay, lãi suất, thời hạn, DSR,
+LTV) ghi thành --parts lần append, rồi đo: append, lần đọc đầu (mở + memory-map các part),
+summary theo chi nhánh/sản phẩm, phân bố LTV/DSR, run-off toàn danh mục và của một chi
+nhánh, trước và sau compact(). Mỗi truy vấn lấy thời gian nhỏ nhất qua --repeat lần.
+Lãi suất lấy liên tục trong 6-11 %/năm; số mức lãi suất và số nhóm (lãi suất, thời hạn)
+được in ra cùng kết quả.
+"""
+import argparse
+import datetime as dt
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.portfolio.book import DSR_BUCKETS, PortfolioBook
+
+BRANCHES = [f"CN{i:02d}" for i in range(1, 41)]
+PRODUCTS = ["mua nhà", "sửa nhà", "kinh doanh", "mua ô tô", "tiêu dùng"]
+
+def make_loans(n, seed=0):
+    """Dict cột (numpy) cho n khoản vay giả lập."""
+    rng = np.random.default_rng(seed)
+    principal = np.round(rng.lognormal(np.log(8e8), 0.8, n), -6)
+    # lãi suất liên tục (làm tròn 0,01 %/năm) như danh mục thật: run-off không được
+    # hưởng lợi từ việc chỉ có vài mức lãi suất
+    rate = np.round(rng.uniform(6.0, 11.0, n), 2)
+    months = rng.choice([12, 24, 36, 60, 84, 120, 180, 240], n).astype(np.int32)
+    collateral = principal / rng.uniform(0.3, 1.1, n)
+    r = rate / 1200.0
+    payment = principal * r / (1.0 - (1.0 + r) ** -months)
+    income = np.round(payment / rng.uniform(0.15, 0.75, n), -5)
+    start = np.datetime64("2020-01-01", "s")
+    appraised = start + rng.integers(0, 6 * 365 * 86400, n).astype("timedelta64[s]")
+    return {
+        "loan_id": np.char.add("L", np.arange(n).astype(str)),
+        "branch": np.asarray(BRANCHES)[rng.integers(0, len(BRANCHES), n)],
+        "product": np.asarray(PRODUCTS)[rng.integers(0, len(PRODUCTS), n)],
+        "appraised_at": appraised,
+        "so_tien_vay": principal, "lai_suat_p_a": rate, "thoi_han_thang": months,
+        "thu_nhap_hang_thang": income, "gia_tri_tsdb": collateral, "monthly_payment": payment,
+        "dsr_percent": payment / income * 100.0, "ltv_percent": principal / collateral * 100.0,
+    }
+
+def timed(fn, repeat=1):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark truy vấn danh mục cho vay")
+    ap.add_argument("-n", "--loans", type=int, default=1_000_000)
+    ap.add_argument("--parts", type=int, default=20, help="số lần append (số part trước compact)")
+    ap.add_argument("--dir", default=None, help="thư mục dataset (mặc định: thư mục tạm)")
+    ap.add_argument("--keep", action="store_true", help="giữ lại dataset sau khi chạy")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    path = args.dir or tempfile.mkdtemp(prefix="cadap_portfolio_")
+    as_of = dt.date(2026, 1, 1)
+    try:
+        cols = make_loans(args.loans)
+        book = PortfolioBook(path)
+        bounds = np.linspace(0, args.loans, args.parts + 1).astype(int)
+
+        def append_all():
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                book.append({k: v[lo:hi] for k, v in cols.items()})
+        t_append, _ = timed(append_all)
+        print(f"{args.loans:,} khoản vay, {args.parts} part: append {t_append:.2f}s", file=sys.stderr)
+        groups = np.unique(np.stack([cols["lai_suat_p_a"], cols["thoi_han_thang"]]), axis=1).shape[1]
+        print(f"  {len(np.unique(cols['lai_suat_p_a']))} mức lãi suất, {groups} nhóm (lãi suất, thời hạn)",
+              file=sys.stderr)
+
+        queries = {
+            "summary(branch)": lambda b: b.summary(by=("branch",)),
+            "summary(branch,product)": lambda b: b.summary(by=("branch", "product")),
+            "buckets(ltv)": lambda b: b.buckets("ltv_percent", by=("product",)),
+            "buckets(dsr)": lambda b: b.buckets("dsr_percent", DSR_BUCKETS),
+            "runoff(all)": lambda b: b.runoff(as_of=as_of),
+            "runoff(CN01)": lambda b: b.runoff(where={"branch": "CN01"}, as_of=as_of),
+        }
+        for label in ("trước compact", "sau compact"):
+            cold = PortfolioBook(path)
+            t_open, _ = timed(lambda: len(cold))
+            print(f"[{label}] mở {len(os.listdir(path))} part: {t_open * 1000:.0f} ms", file=sys.stderr)
+            for name, q in queries.items():
+                t, _ = timed(lambda: q(cold), args.repeat)
+                print(f"  {name:<26} {t * 1000:8.0f} ms", file=sys.stderr)
+            if label == "trước compact":
+                t_compact, n = timed(book.compact)
+                print(f"compact {n} part: {t_compact:.2f}s", file=sys.stderr)
+    finally:
+        if not args.keep and not args.dir:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
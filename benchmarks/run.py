@@ -0,0 +1,143 @@
+# benchmarks/run.py
+"""
+Benchmark các bước xử lý hồ sơ: parse, recalc, xuất Excel, xuất DOCX.
+
+    python -m benchmarks.run                               # 1, 100, 10000 hồ sơ
+    python -m benchmarks.run --sizes 1 100 --pages 20 --images 2 --image-kb 8192
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.2
+
+Với mỗi cỡ lô N và mỗi bước: đo thời gian, thông lượng (hồ sơ/s) và bộ nhớ đỉnh
+(tracemalloc, trên một mẫu tối đa --mem-sample hồ sơ để không làm chậm phép đo
+thời gian). So với baseline: thông lượng giảm hoặc bộ nhớ tăng quá --threshold
+(tỉ lệ) thì báo REGRESSION và thoát với mã 1.
+"""
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_dossier
+from src.export.export_docx import export_docx
+from src.export.export_excel import export_schedule_excel
+from src.logic.finance import recalc_all
+from src.logic.parser_docx import parse_docx_streamlit
+
+STAGES = ("parse", "recalc", "excel", "docx")
+
+def _stage_fn(stage):
+    if stage == "parse":
+        return lambda item: parse_docx_streamlit(io.BytesIO(item["docx"]))
+    if stage == "recalc":
+        # state mới mỗi lần: đo chi phí tính thật, không tính cache của RecalcModel
+        return lambda item: recalc_all({"data": item["data"]})
+    if stage == "excel":
+        return lambda item: export_schedule_excel(item["schedule"])
+    if stage == "docx":
+        return lambda item: export_docx(item["data"], item["schedule"])
+    raise ValueError(stage)
+
+def build_corpus(n_unique, **gen_opts):
+    """Sinh n_unique hồ sơ khác nhau, kèm dữ liệu đã parse và lịch trả nợ cho các bước sau."""
+    corpus = []
+    for seed in range(n_unique):
+        content, _expected = make_dossier(seed, **gen_opts)
+        data = parse_docx_streamlit(io.BytesIO(content))
+        corpus.append({"docx": content, "data": data, "schedule": recalc_all({"data": data})})
+    return corpus
+
+def _items(corpus, n):
+    return (corpus[i % len(corpus)] for i in range(n))
+
+def bench_stage(stage, corpus, n, mem_sample):
+    fn = _stage_fn(stage)
+    gc.collect()
+    start = time.perf_counter()
+    for item in _items(corpus, n):
+        fn(item)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    for item in _items(corpus, min(n, mem_sample)):
+        fn(item)
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "n": n,
+        "seconds": elapsed,
+        "throughput_per_s": n / elapsed if elapsed > 0 else float("inf"),
+        "peak_mem_mb": peak / 1e6,
+    }
+
+def run(sizes, stages, unique, mem_sample, gen_opts):
+    corpus = build_corpus(min(unique, max(sizes)), **gen_opts)
+    results = {}
+    for n in sizes:
+        for stage in stages:
+            r = bench_stage(stage, corpus, n, mem_sample)
+            results[f"{stage}@{n}"] = r
+            print(f"{stage:>7} x {n:<6} {r['seconds']:9.3f}s {r['throughput_per_s']:10.1f}/s "
+                  f"peak {r['peak_mem_mb']:8.2f} MB", file=sys.stderr)
+    return results
+
+def compare(results, baseline, threshold):
+    """Trả về danh sách thông báo regression so với baseline."""
+    problems = []
+    for key, r in results.items():
+        b = baseline.get(key)
+        if not b:
+            continue
+        if r["throughput_per_s"] < b["throughput_per_s"] * (1 - threshold):
+            problems.append(f"{key}: thông lượng {r['throughput_per_s']:.1f}/s < baseline {b['throughput_per_s']:.1f}/s")
+        if r["peak_mem_mb"] > b["peak_mem_mb"] * (1 + threshold) + 1.0:
+            problems.append(f"{key}: bộ nhớ đỉnh {r['peak_mem_mb']:.1f} MB > baseline {b['peak_mem_mb']:.1f} MB")
+    return problems
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark parse/recalc/export trên hồ sơ PASDV giả lập")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    ap.add_argument("--unique", type=int, default=200, help="số hồ sơ khác nhau được sinh (dùng xoay vòng)")
+    ap.add_argument("--mem-sample", type=int, default=20)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--collateral", type=int, default=2)
+    ap.add_argument("--tables", type=int, default=1)
+    ap.add_argument("--images", type=int, default=0)
+    ap.add_argument("--image-kb", type=int, default=512)
+    ap.add_argument("--baseline", help="file JSON baseline để so sánh")
+    ap.add_argument("--threshold", type=float, default=0.2, help="ngưỡng regression (tỉ lệ, mặc định 0.2 = 20%%)")
+    ap.add_argument("--save-baseline", help="ghi kết quả ra file JSON làm baseline")
+    ap.add_argument("--json", help="ghi kết quả chi tiết ra file JSON")
+    args = ap.parse_args(argv)
+
+    gen_opts = dict(pages=args.pages, collateral_blocks=args.collateral, tables=args.tables,
+                    images=args.images, image_kb=args.image_kb)
+    results = run(args.sizes, args.stages, args.unique, args.mem_sample, gen_opts)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "generator": gen_opts,
+              "results": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("generator") != gen_opts:
+            print("Cảnh báo: tham số sinh hồ sơ khác baseline, kết quả không so sánh trực tiếp được", file=sys.stderr)
+        problems = compare(results, baseline.get("results", {}), args.threshold)
+        for p in problems:
+            print("REGRESSION " + p, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+        print("Không có regression so với baseline", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
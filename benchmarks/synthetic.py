@@ -0,0 +1,165 @@
+# benchmarks/synthetic.py
+"""
+Sinh hồ sơ PASDV .docx giả lập (tiếng Việt) với kích thước tuỳ chỉnh để benchmark.
+
+Gói .docx được dựng trực tiếp bằng zipfile (không cần python-docx) nên sinh hàng
+nghìn file rất nhanh. Có thể điều chỉnh số trang chữ, số khối TSĐB, số bảng và số/
+kích thước ảnh nhúng (ảnh scan sổ đỏ là nguyên nhân chính làm file phình to).
+
+    python -m benchmarks.synthetic out_dir -n 100 --pages 20 --images 3 --image-kb 4096
+"""
+import argparse
+import io
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+PARAGRAPHS_PER_PAGE = 35
+
+_HO = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng"]
+_DEM = ["Văn", "Thị", "Hữu", "Đức", "Minh", "Thanh", "Ngọc", "Quang"]
+_TEN = ["An", "Bình", "Cường", "Dũng", "Hà", "Hải", "Hoa", "Hùng", "Lan", "Long", "Mai", "Nam", "Tâm"]
+_TINH = ["Hà Nội", "TP. Hồ Chí Minh", "Đà Nẵng", "Hải Phòng", "Cần Thơ", "Nghệ An", "Thanh Hoá"]
+_MUC_DICH = ["Mua nhà ở", "Sửa chữa nhà", "Bổ sung vốn kinh doanh", "Mua ô tô", "Mua đất nông nghiệp"]
+_FILLER = (
+    "Căn cứ hồ sơ khách hàng cung cấp và kết quả thẩm định thực tế, phương án sử dụng vốn "
+    "được đánh giá là khả thi, nguồn trả nợ ổn định từ lương và hoạt động kinh doanh hộ gia đình."
+)
+
+def _vnd(n):
+    return f"{n:,}".replace(",", ".")
+
+def _p(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+def _table(rows):
+    def tc(t):
+        return f"<w:tc><w:p><w:r><w:t xml:space=\"preserve\">{escape(t)}</w:t></w:r></w:p></w:tc>"
+    return "<w:tbl>" + "".join("<w:tr>" + "".join(tc(c) for c in r) + "</w:tr>" for r in rows) + "</w:tbl>"
+
+def _drawing(rid, idx):
+    # ảnh inline tối thiểu trỏ tới part media qua relationship rid
+    return (
+        '<w:p><w:r><w:drawing><wp:inline xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing">'
+        '<wp:extent cx="1828800" cy="1828800"/>'
+        f'<wp:docPr id="{idx}" name="Scan {idx}"/>'
+        '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+        '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:nvPicPr><pic:cNvPr id="{idx}" name="scan{idx}.png"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="1828800" cy="1828800"/></a:xfrm>'
+        '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+        '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>'
+    )
+
+def make_dossier(seed=0, pages=2, collateral_blocks=1, tables=1, images=0, image_kb=512):
+    """
+    Trả về (docx_bytes, expected) — expected là một số trường đã biết để kiểm tra parser.
+    """
+    rnd = random.Random(seed)
+    ten = f"{rnd.choice(_HO)} {rnd.choice(_DEM)} {rnd.choice(_TEN)}"
+    cccd = "0" + "".join(str(rnd.randint(0, 9)) for _ in range(11))
+    tong = rnd.randrange(500, 10000) * 1_000_000
+    doi_ung = tong * rnd.randint(20, 50) // 100
+    vay = tong - doi_ung
+    lai = rnd.choice([7.5, 8.0, 8.5, 9.0, 9.5, 10.2])
+    thoi_han = rnd.choice([12, 36, 60, 120, 180, 240])
+    thu_nhap = rnd.randrange(15, 200) * 1_000_000
+    chi_phi = thu_nhap * rnd.randint(20, 60) // 100
+
+    body = [
+        _p("CỘNG HOÀ XÃ HỘI CHỦ NGHĨA VIỆT NAM"),
+        _p("PHƯƠNG ÁN SỬ DỤNG VỐN"),
+        _p("I. THÔNG TIN KHÁCH HÀNG"),
+        _p(f"1. Họ và tên: {ten}"),
+        _p(f"Số CCCD: {cccd}"),
+        _p(f"Địa chỉ: Số {rnd.randint(1, 300)} đường {rnd.choice(_TEN)}, {rnd.choice(_TINH)}"),
+        _p(f"Số điện thoại: 09{rnd.randint(10000000, 99999999)}"),
+        _p("II. PHƯƠNG ÁN VAY VỐN"),
+        _p(f"Mục đích: {rnd.choice(_MUC_DICH)}"),
+        _p(f"Tổng nhu cầu vốn: {_vnd(tong)} đồng"),
+        _p(f"Vốn đối ứng: {_vnd(doi_ung)} đồng"),
+        _p(f"Số tiền vay: {_vnd(vay)} đồng"),
+        _p(f"Lãi suất: {str(lai).replace('.', ',')} %/năm"),
+        _p(f"Thời hạn vay: {thoi_han} tháng"),
+        _p("III. NGUỒN TRẢ NỢ"),
+        _p(f"Tổng thu nhập hàng tháng: {_vnd(thu_nhap)} đồng"),
+        _p(f"Tổng chi phí hàng tháng: {_vnd(chi_phi)} đồng"),
+    ]
+    for t in range(tables):
+        body.append(_table([["Khoản mục", "Số tiền"]] + [
+            [f"Thu nhập từ nguồn {k + 1}", f"{_vnd(rnd.randrange(1, 50) * 1_000_000)} đồng"] for k in range(5)
+        ]))
+    body.append(_p("IV. TÀI SẢN BẢO ĐẢM"))
+    for b in range(collateral_blocks):
+        body += [
+            _p(f"Tài sản bảo đảm {b + 1}: Quyền sử dụng đất và tài sản gắn liền với đất"),
+            _p(f"Giấy chứng nhận số: CS{rnd.randint(100000, 999999)}"),
+            _p(f"Địa chỉ: Thửa {rnd.randint(1, 500)}, tờ bản đồ {rnd.randint(1, 60)}, {rnd.choice(_TINH)}"),
+            _p(f"Giá trị định giá: {_vnd(rnd.randrange(500, 20000) * 1_000_000)} đồng"),
+        ]
+    rels = []
+    for i in range(images):
+        rid = f"rIdImg{i + 1}"
+        rels.append((rid, f"media/scan{i + 1}.png"))
+        body.append(_drawing(rid, i + 1))
+    for k in range(max(0, pages * PARAGRAPHS_PER_PAGE - len(body))):
+        body.append(_p(f"{k + 1}. {_FILLER}"))
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _XML_DECL + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Default Extension="png" ContentType="image/png"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        z.writestr("_rels/.rels", _XML_DECL + (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_R_NS}/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>'
+        ))
+        z.writestr("word/_rels/document.xml.rels", _XML_DECL + (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="{rid}" Type="{_R_NS}/image" Target="{t}"/>' for rid, t in rels)
+            + '</Relationships>'
+        ))
+        z.writestr("word/document.xml", _XML_DECL + (
+            f'<w:document xmlns:w="{_W_NS}" xmlns:r="{_R_NS}"><w:body>{"".join(body)}</w:body></w:document>'
+        ))
+        for _rid, target in rels:
+            # dữ liệu ngẫu nhiên (không nén được) mô phỏng ảnh scan; lưu không nén như ảnh thật
+            z.writestr("word/" + target, b"\x89PNG\r\n\x1a\n" + rnd.randbytes(image_kb * 1024),
+                       compress_type=zipfile.ZIP_STORED)
+
+    expected = {"ten": ten, "cccd": cccd, "so_tien_vay": vay, "lai_suat_p_a": lai, "thoi_han_thang": thoi_han,
+                "thu_nhap_hang_thang": thu_nhap}
+    return buf.getvalue(), expected
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sinh hồ sơ PASDV .docx giả lập")
+    ap.add_argument("out_dir")
+    ap.add_argument("-n", "--count", type=int, default=10)
+    ap.add_argument("--pages", type=int, default=2)
+    ap.add_argument("--collateral", type=int, default=1)
+    ap.add_argument("--tables", type=int, default=1)
+    ap.add_argument("--images", type=int, default=0)
+    ap.add_argument("--image-kb", type=int, default=512)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    os.makedirs(args.out_dir, exist_ok=True)
+    for i in range(args.count):
+        content, _ = make_dossier(args.seed + i, args.pages, args.collateral, args.tables, args.images, args.image_kb)
+        with open(os.path.join(args.out_dir, f"pasdv_{i:06d}.docx"), "wb") as f:
+            f.write(content)
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,61 @@
 import streamlit as st
-import pandas as pd
-from docx import Document
-import altair as alt
+
+# set_page_config chạy ngay sau streamlit: các module nặng (numpy/pandas cho lịch trả nợ,
+# altair cho biểu đồ, writer xlsx/docx) chỉ được import khi bước cần đến chúng chạy,
+# nên tiêu đề và ô tải file hiện ra trước. Ngân sách import: benchmarks/import_budget.py
+st.set_page_config(page_title="Thẩm định vay vốn", layout="wide")
+
 import io
+import os
 import re
+from concurrent.futures import wait
 
-st.set_page_config(page_title="Thẩm định vay vốn", layout="wide")
+from src.export.lazy_export import ExportManager, dossier_key
+from src.logic.parse_cache import shared_parse_cache
+from src.monitoring import metrics
 
-# ======================================================
-# 1) HÀM PARSER DOCX (TÍCH HỢP TRỰC TIẾP)
-# ======================================================
-def parse_vnd(s):
-    if not s: return 0
-    s = s.replace(".", "").replace(",", "").replace(" ", "")
-    try: return int(s)
-    except: return 0
-
-def first(pattern, text):
-    m = re.search(pattern, text, re.IGNORECASE)
-    return m.group(1).strip() if m else None
-
-def parse_docx(content):
-    doc = Document(content)
-    text = "\n".join([p.text.strip() for p in doc.paragraphs if p.text.strip()])
-    lines = text.splitlines()
-
-    # ==== Identification ====
-    ten = first(r"Họ và tên[:\s]*(.+)", text) or ""
-    cccd = first(r"(?:CCCD|CMND)[:\s]*([0-9]{9,12})", text) or ""
-    diachi = first(r"(?:Địa chỉ|Nơi cư trú)[:\s]*(.+)", text) or ""
-    phone = first(r"(?:Điện thoại|SĐT|Phone)[:\s]*([\d\+\-\s]{7,20})", text) or ""
-
-    # ==== Finance ====
-    mucdich = first(r"Mục đích[:\s]*(.+)", text) or ""
-    tongnhucau = parse_vnd(first(r"Tổng nhu cầu.*?([\d\., ]+)", text) or "0")
-    vondoing = parse_vnd(first(r"Vốn đối ứng.*?([\d\., ]+)", text) or "0")
-    sotienvay = parse_vnd(first(r"(?:Số tiền vay|Vốn vay).*?([\d\., ]+)", text) or str(tongnhucau - vondoing))
-    laisuat = float((first(r"Lãi suất[:\s]*([\d\.,]+)", text) or "8.5").replace(",", "."))
-    thoihan = int(first(r"Thời hạn.*?(\d+)", text) or "60")
-
-    # ==== Income ====
-    thunhap = parse_vnd(first(r"Thu nhập.*?([\d\., ]+)", text) or "0")
-    chiphi = parse_vnd(first(r"Chi phí.*?([\d\., ]+)", text) or "0")
-
-    # ==== Collateral (simple detect) ====
-    ts = []
-    for i, L in enumerate(lines):
-        if "giá trị" in L.lower() or "tài sản" in L.lower() or "bất động sản" in L.lower():
-            val = parse_vnd(first(r"([\d\., ]+)\s*đ", L) or "0")
-            addr = ""
-            for n in range(i, min(i+5, len(lines))):
-                if "địa chỉ" in lines[n].lower():
-                    addr = re.sub(r"địa chỉ[:\s]*", "", lines[n], flags=re.I)
-                    break
-            ts.append({
-                "loai": "TSĐB",
-                "gia_tri": val,
-                "dia_chi": addr,
-                "ltv_percent": 0,
-                "giay_to": ""
-            })
-
-    if not ts:
-        ts.append({"loai":"TSĐB","gia_tri":0,"dia_chi":"","ltv_percent":0,"giay_to":""})
-
-    return {
-        "identification": {
-            "ten": ten,
-            "cccd": cccd,
-            "dia_chi": diachi,
-            "phone": phone
-        },
-        "finance": {
-            "muc_dich": mucdich,
-            "tong_nhu_cau": tongnhucau,
-            "von_doi_ung": vondoing,
-            "so_tien_vay": sotienvay,
-            "lai_suat_p_a": laisuat,
-            "thoi_han_thang": thoihan
-        },
-        "income": {
-            "thu_nhap_hang_thang": thunhap,
-            "chi_phi_hang_thang": chiphi
-        },
-        "collateral": ts
-    }
+@st.cache_resource
+def init_metrics():
+    # opt-in qua CADAP_METRICS=1 (xem src/monitoring/metrics.py)
+    return metrics.init_from_env()
+
+init_metrics()
 
 # ======================================================
-# 2) TÍNH TOÁN DÒNG TIỀN
+# 1) TÍNH TOÁN DÒNG TIỀN
 # ======================================================
-def monthly_payment(P, r, n):
-    r = r/100/12
-    if r == 0: return P/n
-    return P * (r * (1 + r)**n) / ((1 + r)**n - 1)
-
 def build_schedule(P, r, n):
-    pay = monthly_payment(P, r, n)
-    bal = P
-    rows = []
-    r_m = r/100/12
-    for m in range(1, n+1):
-        interest = bal * r_m
-        principal = pay - interest
-        bal -= principal
-        rows.append({
-            "month": m,
-            "payment": round(pay),
-            "interest": round(interest),
-            "principal": round(principal),
-            "balance": round(bal if bal > 0 else 0)
-        })
-    return pd.DataFrame(rows)
+    # dùng chung engine closed-form với src/logic/finance.py, làm tròn về đồng;
+    # Schedule lười: chỉ tính các kỳ thực sự được đọc
+    from src.logic.schedule import Schedule
+    return Schedule(P, r, n, dtype="int64")
 
 # ======================================================
-# 3) EXPORT EXCEL
+# 2) EXPORT EXCEL
 # ======================================================
 def export_excel(df):
+    from src.export.excel_stream import write_schedule_xlsx
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as w:
-        df.to_excel(w, index=False)
+    write_schedule_xlsx(buf, df)
     buf.seek(0)
     return buf
 
 # ======================================================
-# 4) EXPORT DOCX
+# 3) EXPORT DOCX
 # ======================================================
+@st.cache_resource
+def get_report_template():
+    # CADAP_REPORT_TEMPLATE: đường dẫn mẫu .docx của ngân hàng (mặc định dùng mẫu có sẵn)
+    from src.export.report_engine import ReportTemplate
+    return ReportTemplate.load(os.environ.get("CADAP_REPORT_TEMPLATE"))
+
 def export_docx(full_data, df):
-    doc = Document()
-    idf = full_data["identification"]
-    fin = full_data["finance"]
-
-    doc.add_heading("BÁO CÁO THẨM ĐỊNH PHƯƠNG ÁN", 1)
-    doc.add_paragraph(f"Họ tên: {idf['ten']}")
-    doc.add_paragraph(f"CCCD: {idf['cccd']}")
-    doc.add_paragraph(f"Địa chỉ: {idf['dia_chi']}")
-    doc.add_paragraph(f"SĐT: {idf['phone']}")
-    doc.add_paragraph("")
-    doc.add_paragraph(f"Mục đích vay: {fin['muc_dich']}")
-    doc.add_paragraph(f"Số tiền vay: {fin['so_tien_vay']:,} đồng")
-    doc.add_paragraph(f"Lãi suất: {fin['lai_suat_p_a']}%/năm")
-    doc.add_paragraph(f"Thời hạn vay: {fin['thoi_han_thang']} tháng")
-    doc.add_page_break()
-
-    table = doc.add_table(rows=1, cols=5)
-    hdr = table.rows[0].cells
-    hdr[0].text="Tháng"; hdr[1].text="Thanh toán"; hdr[2].text="Lãi"; hdr[3].text="Gốc"; hdr[4].text="Dư nợ"
-
-    for _, r in df.head(24).iterrows():
-        row = table.add_row().cells
-        row[0].text = str(r["month"])
-        row[1].text = f"{r['payment']:,}"
-        row[2].text = f"{r['interest']:,}"
-        row[3].text = f"{r['principal']:,}"
-        row[4].text = f"{r['balance']:,}"
-
-    b = io.BytesIO()
-    doc.save(b)
+    b = io.BytesIO(get_report_template().render(full_data, df))
     b.seek(0)
     return b
 
 # ======================================================
-# 5) STREAMLIT APP
+# 4) STREAMLIT APP
 # ======================================================
 st.title("📝 Thẩm định phương án sử dụng vốn (Bản 1 file đơn giản)")
 
@@ -169,8 +64,72 @@ uploaded = st.file_uploader("Tải lên file PASDV (.docx)", type=["docx"])
 if "data" not in st.session_state:
     st.session_state.data = None
 
+@st.cache_resource
+def get_parse_cache():
+    # dùng chung cho mọi session và cùng khoá với HTTP API; CADAP_PARSE_CACHE_DIR để bật cache trên đĩa
+    return shared_parse_cache(disk_dir=os.environ.get("CADAP_PARSE_CACHE_DIR"))
+
+@st.cache_resource
+def get_dossier_store():
+    from src.storage.dossier_store import DossierStore
+    # CADAP_DOSSIER_DB: file SQLite dùng chung cho mọi session/worker (WAL)
+    return DossierStore(os.environ.get("CADAP_DOSSIER_DB", "dossiers.sqlite3"))
+
+@st.cache_resource
+def get_portfolio_book():
+    # CADAP_PORTFOLIO_DIR: sổ danh mục (Arrow) cho báo cáo theo chi nhánh/sản phẩm; không đặt thì tắt
+    from src.portfolio.book import PortfolioBook
+    path = os.environ.get("CADAP_PORTFOLIO_DIR")
+    return PortfolioBook(path) if path else None
+
+def open_dossier(rec):
+    st.session_state.data = rec["data"]
+    st.session_state.dossier_id = rec["id"]
+    st.session_state.dossier_version = rec["version"]
+    st.session_state.dossier_upload_key = rec["upload_key"]
+
+store = get_dossier_store()
+
+with st.sidebar:
+    st.subheader("🗂️ Hồ sơ đã lưu")
+    query = st.text_input("Tìm theo CCCD / SĐT / tên", key="dossier_query").strip()
+    if query:
+        if re.fullmatch(r"[\d\s\.\+\-]+", query):
+            found = {r["id"]: r for r in store.search(cccd=query) + store.search(phone=query)}
+            results = list(found.values())
+        else:
+            results = store.search(name=query)
+        if results:
+            picked = st.selectbox("Kết quả", results, key="dossier_pick",
+                                  format_func=lambda r: f"{r['ten'] or '(chưa có tên)'} · {r['cccd']} · "
+                                                        f"{r['so_tien_vay']:,.0f} đ")
+            if st.button("Mở hồ sơ", key="open_dossier"):
+                open_dossier(store.get(picked["id"]))
+                st.rerun()
+        else:
+            st.caption("Không tìm thấy hồ sơ.")
+
+    # key Gemini cho nút "Nhận xét AI"; để trống thì dùng GEMINI_API_KEY / stub offline
+    from src.ui.components import sidebar_api_input
+    sidebar_api_input()
+
 if uploaded:
-    st.session_state.data = parse_docx(uploaded)
+    content = uploaded.getvalue()
+    cache = get_parse_cache()
+    upload_key = cache.key(content)
+    # chỉ parse lại khi bytes thay đổi, giữ nguyên chỉnh sửa của cán bộ qua các lần rerun
+    if st.session_state.get("upload_key") != upload_key:
+        saved = store.find_by_upload_key(upload_key)
+        if saved is not None:
+            # file đã được lưu trước đó: mở bản đã lưu (kèm chỉnh sửa), không parse lại
+            open_dossier(saved)
+        else:
+            with metrics.stage("app.parse", bytes=len(content)):
+                _, st.session_state.data = cache.get_or_parse(content, key=upload_key)
+            st.session_state.dossier_id = None
+            st.session_state.dossier_version = None
+            st.session_state.dossier_upload_key = upload_key
+        st.session_state.upload_key = upload_key
     st.success("Đọc file thành công!")
 
 # default template
@@ -194,25 +153,113 @@ st.write(idf)
 st.subheader("💰 Thông tin phương án")
 st.write(fin)
 
+with st.expander("📐 Số tiền vay tối đa theo thời hạn"):
+    from src.ui.components import max_loan_panel
+    max_loan_panel(data)
+
+book = get_portfolio_book()
+if book is not None:
+    # chi nhánh/sản phẩm để xem danh mục theo nhóm; lưu cùng hồ sơ
+    dm = data.setdefault("danh_muc", {"chi_nhanh": os.environ.get("CADAP_BRANCH", ""), "san_pham": ""})
+    c1, c2 = st.columns(2)
+    dm["chi_nhanh"] = c1.text_input("Chi nhánh", dm.get("chi_nhanh", "")).strip()
+    dm["san_pham"] = c2.text_input("Sản phẩm", dm.get("san_pham") or fin.get("muc_dich", "")).strip()
+
+def save_dossier():
+    from src.storage.dossier_store import StoreConflict
+    is_new = st.session_state.get("dossier_id") is None
+    if is_new and book is not None and not (data["danh_muc"]["chi_nhanh"] and data["danh_muc"]["san_pham"]):
+        st.error("Nhập chi nhánh và sản phẩm trước khi lưu hồ sơ mới.")
+        return
+    try:
+        dossier_id = store.save(data, dossier_id=st.session_state.get("dossier_id"),
+                                upload_key=st.session_state.get("dossier_upload_key"),
+                                expected_version=st.session_state.get("dossier_version"))
+    except StoreConflict:
+        st.error("Hồ sơ đã được sửa ở phiên làm việc khác; tìm và mở lại để xem bản mới nhất.")
+        return
+    if is_new and book is not None:
+        # sổ danh mục chỉ ghi thêm: mỗi hồ sơ vào một lần, khi lưu lần đầu
+        book.append_dossier(data, branch=data["danh_muc"]["chi_nhanh"], product=data["danh_muc"]["san_pham"],
+                            loan_id=str(dossier_id))
+    open_dossier(store.get(dossier_id))
+    st.success(f"Đã lưu hồ sơ #{dossier_id}")
+
+if st.button("💾 Lưu hồ sơ", key="save_dossier"):
+    save_dossier()
+
 # ====== CALC ======
-df = build_schedule(fin["so_tien_vay"], fin["lai_suat_p_a"], fin["thoi_han_thang"])
+with metrics.stage("app.schedule") as m:
+    schedule = build_schedule(fin["so_tien_vay"], fin["lai_suat_p_a"], fin["thoi_han_thang"])
+    m["months"] = len(schedule)
 
 st.subheader("📊 Lịch trả nợ (24 tháng đầu)")
-st.dataframe(df.head(24))
+st.dataframe(schedule.head(24).to_pandas())
 
 # Chart
-chart = alt.Chart(df).mark_line().encode(
-    x="month",
-    y="payment"
-).properties(width=800)
-st.altair_chart(chart, use_container_width=True)
+with metrics.stage("app.chart", rows=len(schedule)):
+    # giảm mẫu LTTB ngay trên mảng của Schedule: không dựng DataFrame đủ kỳ mỗi lần rerun,
+    # spec Vega gửi xuống trình duyệt không lớn theo số kỳ
+    from src.ui.charts import line_chart, schedule_chart_frame
+    chart = line_chart(schedule_chart_frame(schedule, "payment", max_points=800), "month", "payment", width=800)
+    st.altair_chart(chart, use_container_width=True)
+
+# ===== KỊCH BẢN =====
+with st.expander("🧪 Kịch bản lãi suất / thu nhập / TSĐB"):
+    from src.ui.components import stress_test_panel
+    stress_test_panel(data)
+
+# ===== NHẬN XÉT AI =====
+st.subheader("🤖 Nhận xét thẩm định (Gemini)")
+from src.ui.components import ai_commentary_panel
+ai_commentary_panel(data)
 
 # ===== EXPORT =====
+# file chỉ được dựng khi bấm nút, trong thread riêng, và cache theo hash dữ liệu
+@st.cache_resource
+def get_export_manager():
+    return ExportManager()
+
+def export_section(kind, builder, file_name, label):
+    if st.button(f"Tạo {file_name}", key=f"make_{kind}"):
+        exports.submit(kind, export_key, builder, data, schedule)
+    fut = exports.future(kind, export_key)
+    if fut is None:
+        return
+    if not fut.done():
+        with st.spinner("Đang tạo file..."):
+            wait([fut], timeout=15)
+    if not fut.done():
+        st.info("File vẫn đang được tạo, bấm lại sau giây lát.")
+    elif fut.exception() is not None:
+        st.error(f"Lỗi khi tạo file: {fut.exception()}")
+    else:
+        st.download_button(label, fut.result(), file_name=file_name, key=f"dl_{kind}")
+
+# DataFrame đủ kỳ chỉ được dựng trong thread export, khi người dùng bấm tạo file
+def _excel_bytes(full_data, schedule):
+    return export_excel(schedule.to_pandas()).getvalue()
+
+def _docx_bytes(full_data, schedule):
+    return export_docx(full_data, schedule.to_pandas()).getvalue()
+
+exports = get_export_manager()
+with metrics.stage("app.export_key"):
+    # lịch trả nợ xác định hoàn toàn bởi (tiền vay, lãi suất, thời hạn): khoá theo input, không hash lịch
+    export_key = dossier_key({"data": data, "schedule": (schedule.principal, schedule.annual_rate_percent,
+                                                         schedule.months)}, None)
+
 col1, col2 = st.columns(2)
 with col1:
     st.subheader("📤 Xuất Excel")
-    st.download_button("Tải file Excel", export_excel(df), file_name="ke_hoach.xlsx")
+    export_section("xlsx", _excel_bytes, "ke_hoach.xlsx", "Tải file Excel")
 
 with col2:
     st.subheader("📤 Xuất DOCX")
-    st.download_button("Tải file DOCX", export_docx(data, df), file_name="bao_cao.docx")
+    export_section("docx", _docx_bytes, "bao_cao.docx", "Tải file DOCX")
+
+# ===== DANH MỤC =====
+if book is not None:
+    with st.expander("📈 Danh mục cho vay"):
+        from src.ui.components import portfolio_panel
+        portfolio_panel(book)
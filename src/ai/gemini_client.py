@@ -1,3 +1,260 @@
+"""
+Client Gemini (REST generateContent) cho việc viết nhận xét thẩm định.
+
+AsyncGeminiClient dùng asyncio + aiohttp với connection pool, giới hạn số request
+đồng thời, token bucket giới hạn tốc độ, retry có jitter cho 429/5xx/lỗi mạng và
+cache phản hồi theo hash của prompt. generate_many/appraisal_commentary_batch chạy
+hàng trăm hồ sơ cùng lúc trong giới hạn đó.
+
+GeminiClient giữ API đồng bộ cũ (chat) cho UI; không có key thì trả chuỗi stub
+như trước. Chạy offline: python -m src.ai.mock_server rồi đặt
+GEMINI_BASE_URL=http://127.0.0.1:8089.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class GeminiError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class TokenBucket:
+    """Giới hạn tốc độ: `rate` request/giây, cho phép dồn tối đa `capacity` request."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+class ResponseCache:
+    """LRU trong bộ nhớ, tuỳ chọn lưu thêm ra thư mục (mỗi khoá một file JSON)."""
+
+    def __init__(self, max_entries=2048, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(model, prompt, config=None):
+        raw = json.dumps({"model": model, "prompt": prompt, "config": config or {}}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return self._mem[key]
+        if self.disk_dir:
+            try:
+                with open(os.path.join(self.disk_dir, key + ".json"), encoding="utf-8") as f:
+                    value = json.load(f)["text"]
+            except (OSError, ValueError, KeyError):
+                return None
+            self._remember(key, value)
+            return value
+        return None
+
+    def _remember(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, key + ".json")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"text": value}, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+class AsyncGeminiClient:
+    def __init__(self, api_key=None, model=DEFAULT_MODEL, base_url=None, max_concurrency=8, pool_size=16,
+                 rate_per_s=5.0, burst=None, max_retries=4, backoff_base=0.5, backoff_cap=20.0,
+                 timeout=60.0, cache=None, generation_config=None):
+        """
+        max_concurrency: số request đang bay tối đa; pool_size: số kết nối TCP giữ trong pool
+        rate_per_s/burst: token bucket; cache: ResponseCache (None = cache bộ nhớ mặc định, False = tắt)
+        """
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        self.model = model
+        self.base_url = (base_url or os.environ.get("GEMINI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.generation_config = generation_config or {}
+        self.cache = ResponseCache() if cache is None else (cache or None)
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_s, burst) if rate_per_s else None
+        self._session = None
+        self._inflight = {}   # key -> Future: prompt trùng nhau trong cùng lô chỉ gọi API một lần
+
+    async def __aenter__(self):
+        await self._ensure_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _url(self):
+        return f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        # full jitter
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def _post(self, prompt):
+        import aiohttp
+        session = await self._ensure_session()
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if self.generation_config:
+            body["generationConfig"] = self.generation_config
+        # key gửi qua header, không qua query string: URL có thể lọt vào log, proxy và thông báo lỗi
+        headers = {"x-goog-api-key": self.api_key} if self.api_key else None
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if self._bucket is not None:
+                await self._bucket.acquire()
+            retry_after = None
+            try:
+                async with self._sem:
+                    async with session.post(self._url(), headers=headers, json=body) as resp:
+                        if resp.status == 200:
+                            return _extract_text(await resp.json())
+                        text = await resp.text()
+                        last_error = GeminiError(f"HTTP {resp.status}: {text[:300]}", status=resp.status)
+                        if resp.status not in RETRY_STATUS:
+                            raise last_error
+                        ra = resp.headers.get("Retry-After")
+                        retry_after = float(ra) if ra and ra.replace(".", "", 1).isdigit() else None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = GeminiError(f"{type(e).__name__}: {e}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise last_error
+
+    async def generate(self, prompt):
+        key = ResponseCache.key(self.model, prompt, self.generation_config)
+        if self.cache is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            text = await self._post(prompt)
+            if self.cache is not None:
+                self.cache.put(key, text)
+            fut.set_result(text)
+            return text
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # đã xử lý, tránh cảnh báo "exception never retrieved"
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def generate_many(self, prompts, return_exceptions=True):
+        """Chạy nhiều prompt song song (trong giới hạn concurrency/rate); giữ nguyên thứ tự."""
+        return await asyncio.gather(*(self.generate(p) for p in prompts), return_exceptions=return_exceptions)
+
+    async def appraisal_commentary_batch(self, dossiers):
+        """dossiers: list các (data, summary). Trả về list nhận xét (hoặc exception) theo thứ tự."""
+        return await self.generate_many([appraisal_prompt(d, s) for d, s in dossiers])
+
+def _extract_text(payload):
+    try:
+        parts = payload["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        raise GeminiError(f"Phản hồi không hợp lệ: {str(payload)[:300]}")
+    return "".join(p.get("text", "") for p in parts)
+
+def appraisal_prompt(data, summary=None):
+    """Prompt nhận xét thẩm định cho một hồ sơ (chỉ đưa số liệu cần thiết, không gửi CCCD/SĐT)."""
+    fin = data.get("finance", {}) or {}
+    inc = data.get("income", {}) or {}
+    summary = summary or {}
+    coll = sum((c.get("gia_tri") or 0) for c in data.get("collateral", []) or [])
+
+    def pct(v):
+        return "không xác định" if v is None else f"{v:.1f}%"
+
+    return (
+        "Bạn là cán bộ thẩm định tín dụng. Viết nhận xét ngắn (tối đa 150 chữ) về phương án vay sau, "
+        "nêu rủi ro chính và kết luận đề xuất.\n"
+        f"- Mục đích: {fin.get('muc_dich', '')}\n"
+        f"- Số tiền vay: {fin.get('so_tien_vay', 0):,} đồng; lãi suất {fin.get('lai_suat_p_a')}%/năm; "
+        f"thời hạn {fin.get('thoi_han_thang')} tháng\n"
+        f"- Thu nhập hàng tháng: {inc.get('thu_nhap_hang_thang', 0):,} đồng; "
+        f"chi phí hàng tháng: {inc.get('chi_phi_hang_thang', 0):,} đồng\n"
+        f"- Tổng giá trị TSĐB: {coll:,} đồng\n"
+        f"- DSR: {pct(summary.get('dsr_percent'))}; LTV: {pct(summary.get('ltv_percent'))}\n"
+    )
+
 class GeminiClient:
-    def __init__(self,key=None): self.key=key
-    def chat(self,msg): return "Gemini stub: "+msg
+    """API đồng bộ cho UI; không có key thì trả stub để chạy offline.
+
+    Mỗi lần chat() chạy một event loop riêng nên session/semaphore không dùng lại được giữa các lần gọi,
+    nhưng cache phản hồi thì giữ suốt đời client: bấm lại với cùng hồ sơ không gọi API lần nữa.
+    """
+
+    def __init__(self, key=None, cache=None, **kwargs):
+        self.key = key
+        self.cache = ResponseCache() if cache is None else (cache or None)
+        self.kwargs = kwargs
+
+    def chat(self, msg):
+        if not self.key and not os.environ.get("GEMINI_BASE_URL"):
+            return "Gemini stub: " + msg
+
+        cache = False if self.cache is None else self.cache
+
+        async def run():
+            async with AsyncGeminiClient(self.key, cache=cache, **self.kwargs) as client:
+                return await client.generate(msg)
+        return asyncio.run(run())
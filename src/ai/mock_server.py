@@ -0,0 +1,78 @@
+"""
+Server giả lập Gemini generateContent để chạy/kiểm thử offline.
+
+    python -m src.ai.mock_server --port 8089 --latency 0.2 --failure-rate 0.1
+    GEMINI_BASE_URL=http://127.0.0.1:8089 streamlit run main.py
+
+Trả lời POST /v1beta/models/{model}:generateContent với văn bản dựng từ prompt,
+có thể thêm độ trễ, tỉ lệ lỗi 503 (hoặc n request đầu luôn lỗi 503) và giới hạn request/giây (vượt thì trả 429
+kèm Retry-After) để thử retry/rate limit của AsyncGeminiClient.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+
+from aiohttp import web
+
+def make_app(latency=0.05, jitter=0.05, failure_rate=0.0, max_rps=None, seed=None, fail_first=0):
+    rnd = random.Random(seed)
+    stats = {"requests": 0, "ok": 0, "failed": 0, "throttled": 0}
+    window = {"start": time.monotonic(), "count": 0}
+
+    async def generate(request):
+        stats["requests"] += 1
+        if max_rps:
+            now = time.monotonic()
+            if now - window["start"] >= 1.0:
+                window["start"], window["count"] = now, 0
+            window["count"] += 1
+            if window["count"] > max_rps:
+                stats["throttled"] += 1
+                return web.json_response({"error": {"code": 429, "message": "Resource exhausted"}},
+                                         status=429, headers={"Retry-After": "1"})
+        await asyncio.sleep(max(0.0, latency + rnd.uniform(-jitter, jitter)))
+        if stats["requests"] <= fail_first or rnd.random() < failure_rate:
+            stats["failed"] += 1
+            return web.json_response({"error": {"code": 503, "message": "Service unavailable"}}, status=503)
+        body = await request.json()
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        stats["ok"] += 1
+        text = f"[mock {request.match_info['model']}] Nhận xét thẩm định ({digest}): phương án khả thi, " \
+               f"cần theo dõi dòng tiền trả nợ."
+        return web.json_response({"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]})
+
+    async def get_stats(_request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/v1beta/models/{model}:generateContent", generate)
+    app.router.add_get("/stats", get_stats)
+    app["stats"] = stats
+    return app
+
+async def start_mock_server(port=0, host="127.0.0.1", **options):
+    """Khởi động trong event loop hiện tại; trả về (runner, base_url). Dừng bằng await runner.cleanup()."""
+    runner = web.AppRunner(make_app(**options))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    real_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{real_port}"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Server giả lập Gemini generateContent")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.05)
+    ap.add_argument("--failure-rate", type=float, default=0.0)
+    ap.add_argument("--max-rps", type=int, default=None)
+    args = ap.parse_args(argv)
+    web.run_app(make_app(args.latency, args.jitter, args.failure_rate, args.max_rps),
+                host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# src/batch/appraise_cli.py
+"""
+Thẩm định hàng loạt (headless) cho cả danh mục hồ sơ PASDV.
+
+    python -m src.batch.appraise_cli <thư mục | file .zip> -o ket_qua.csv
+    python -m src.batch.appraise_cli ho_so.zip -o ket_qua_parquet/ --format parquet
+    python -m src.batch.appraise_cli ho_so/ -o ket_qua.csv --portfolio danh_muc/ --branch HN01 --product "mua nhà"
+
+Mỗi hồ sơ .docx được parse bằng parse_docx_streamlit và tính lại bằng recalc_all
+trong một process pool (mặc định dùng toàn bộ CPU). Kết quả được ghi dần ra CSV
+(flush từng dòng) hoặc Parquet (mỗi lô một file part-*.parquet trong thư mục output).
+Chạy lại cùng lệnh sẽ bỏ qua các hồ sơ đã có trong output (resume sau khi crash).
+--portfolio ghi thêm các hồ sơ thẩm định thành công vào sổ danh mục (src/portfolio/book.py).
+"""
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+import zipfile
+
+from src.logic.finance import recalc_all
+from src.logic.parser_docx import parse_docx_streamlit
+
+OUTPUT_COLUMNS = [
+    "source", "ten", "cccd", "phone", "so_tien_vay", "lai_suat_p_a", "thoi_han_thang",
+    "thu_nhap_hang_thang", "gia_tri_tsdb", "monthly_payment", "dsr_percent", "ltv_percent",
+    "warnings", "error",
+]
+
+# ======================================================
+# 1) LIỆT KÊ HỒ SƠ
+# ======================================================
+def iter_sources(path):
+    """
+    Trả về các task (source_key, zip_path, member) cho thư mục hoặc file .zip.
+    source_key là đường dẫn tương đối, dùng làm khoá resume.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            names = sorted(n for n in z.namelist() if n.lower().endswith(".docx"))
+        for n in names:
+            if os.path.basename(n).startswith("~$"):
+                continue
+            yield (n, path, n)
+        return
+    for root, _dirs, files in os.walk(path):
+        for fn in sorted(files):
+            if fn.lower().endswith(".docx") and not fn.startswith("~$"):
+                full = os.path.join(root, fn)
+                yield (os.path.relpath(full, path), None, full)
+
+# ======================================================
+# 2) WORKER (chạy trong process con)
+# ======================================================
+def dossier_warnings(data):
+    """Cảnh báo khi parser không tìm thấy các trường quan trọng."""
+    idf = data.get("identification", {})
+    fin = data.get("finance", {})
+    inc = data.get("income", {})
+    warnings = []
+    if not idf.get("ten"):
+        warnings.append("thiếu họ tên")
+    if not idf.get("cccd"):
+        warnings.append("thiếu CCCD")
+    if not fin.get("so_tien_vay"):
+        warnings.append("thiếu số tiền vay")
+    if not inc.get("thu_nhap_hang_thang"):
+        warnings.append("thiếu thu nhập")
+    if not sum((c.get("gia_tri") or 0) for c in data.get("collateral", [])):
+        warnings.append("thiếu giá trị TSĐB")
+    return warnings
+
+# ZipFile mở sẵn theo đường dẫn, một bộ cho mỗi process: mở lại zip ở từng task phải đọc
+# lại central directory (O(số file)) nên cả lô thành O(n^2)
+_ZIPS = {}
+
+def _init_worker():
+    # process con tạo bằng fork thừa hưởng cache (và vị trí đọc file) của process cha
+    _ZIPS.clear()
+
+def _read_member(zip_path, member):
+    z = _ZIPS.get(zip_path)
+    if z is None:
+        z = _ZIPS[zip_path] = zipfile.ZipFile(zip_path)
+    return z.read(member)
+
+def appraise_one(task):
+    """Parse + recalc một hồ sơ, trả về một dòng kết quả (không bao giờ raise)."""
+    key, zip_path, member = task
+    row = dict.fromkeys(OUTPUT_COLUMNS, None)
+    row["source"] = key
+    try:
+        if zip_path:
+            content = io.BytesIO(_read_member(zip_path, member))
+        else:
+            content = member
+        data = parse_docx_streamlit(content)
+        state = {"data": data}
+        recalc_all(state)
+        summary = state["summary"]
+        idf, fin = data["identification"], data["finance"]
+        row.update({
+            "ten": idf.get("ten"),
+            "cccd": idf.get("cccd"),
+            "phone": idf.get("phone"),
+            "so_tien_vay": fin.get("so_tien_vay"),
+            "lai_suat_p_a": fin.get("lai_suat_p_a"),
+            "thoi_han_thang": fin.get("thoi_han_thang"),
+            "thu_nhap_hang_thang": data["income"].get("thu_nhap_hang_thang"),
+            "gia_tri_tsdb": sum((c.get("gia_tri") or 0) for c in data["collateral"]),
+            "monthly_payment": summary["monthly_payment"],
+            "dsr_percent": summary["dsr_percent"],
+            "ltv_percent": summary["ltv_percent"],
+            "warnings": "; ".join(dossier_warnings(data)),
+        })
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+# ======================================================
+# 3) GHI KẾT QUẢ (CSV / PARQUET) + RESUME
+# ======================================================
+class CsvSink:
+    def __init__(self, path):
+        self.path = path
+
+    def _rows(self):
+        # chỉ đọc phần gồm các dòng trọn vẹn: dòng cuối bị cắt dở khi crash không tính là xong
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        text = data[:_complete_size(data)].decode("utf-8")
+        return list(csv.DictReader(io.StringIO(text, newline="")))
+
+    def done_keys(self):
+        return {r["source"] for r in self._rows() if r.get("source") and r.get("error") is not None}
+
+    def ok_keys(self):
+        """Các hồ sơ đã ghi xong và không lỗi."""
+        return {r["source"] for r in self._rows() if r.get("source") and r.get("error") == ""}
+
+    def __enter__(self):
+        if os.path.exists(self.path):
+            # cắt bỏ dòng dở dang cuối file trước khi ghi tiếp, không để lại dòng rác giữa file
+            with open(self.path, "r+b") as f:
+                f.truncate(_complete_size(f.read()))
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._f = open(self.path, "a", newline="", encoding="utf-8")
+        self._w = csv.DictWriter(self._f, fieldnames=OUTPUT_COLUMNS)
+        if new:
+            self._w.writeheader()
+        return self
+
+    def write(self, row):
+        self._w.writerow(row)
+        self._f.flush()
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+def _complete_size(data):
+    """Số byte đầu của CSV gồm các dòng trọn vẹn (tới dấu xuống dòng cuối cùng nằm ngoài ngoặc kép)."""
+    end = 0
+    quoted = False
+    for m in re.finditer(rb'["\n]', data):
+        if m.group() == b'"':
+            quoted = not quoted
+        elif not quoted:
+            end = m.end()
+    return end
+
+class ParquetSink:
+    """Thư mục các file part-NNNNN.parquet; mỗi part ghi một lô `batch_size` dòng."""
+
+    def __init__(self, path, batch_size=500):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Cần cài pyarrow để ghi Parquet (pip install pyarrow)")
+        self.path = path
+        self.batch_size = batch_size
+        self._rows = []
+
+    def _parts(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(f for f in os.listdir(self.path) if f.startswith("part-") and f.endswith(".parquet"))
+
+    def done_keys(self):
+        import pyarrow.parquet as pq
+        keys = set()
+        for fn in self._parts():
+            keys.update(pq.read_table(os.path.join(self.path, fn), columns=["source"]).column(0).to_pylist())
+        return keys
+
+    def ok_keys(self):
+        import pyarrow.parquet as pq
+        keys = set()
+        for fn in self._parts():
+            t = pq.read_table(os.path.join(self.path, fn), columns=["source", "error"])
+            keys.update(s for s, e in zip(t.column(0).to_pylist(), t.column(1).to_pylist()) if not e)
+        return keys
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._next = len(self._parts())
+        return self
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not self._rows:
+            return
+        table = pa.Table.from_pylist(self._rows, schema=_parquet_schema())
+        final = os.path.join(self.path, f"part-{self._next:05d}.parquet")
+        # ghi ra file tạm rồi rename để part dở dang không bao giờ được đọc khi resume
+        pq.write_table(table, final + ".tmp")
+        os.replace(final + ".tmp", final)
+        self._next += 1
+        self._rows = []
+
+    def __exit__(self, *exc):
+        self._flush()
+
+def _parquet_schema():
+    import pyarrow as pa
+    types = {
+        "so_tien_vay": pa.float64(), "lai_suat_p_a": pa.float64(), "thoi_han_thang": pa.int64(),
+        "thu_nhap_hang_thang": pa.float64(), "gia_tri_tsdb": pa.float64(),
+        "monthly_payment": pa.float64(), "dsr_percent": pa.float64(), "ltv_percent": pa.float64(),
+    }
+    return pa.schema([(c, types.get(c, pa.string())) for c in OUTPUT_COLUMNS])
+
+# ======================================================
+# 4) CLI
+# ======================================================
+class PortfolioSink:
+    """
+    Ghi các dòng thẩm định thành công vào PortfolioBook, mỗi lô `batch_size` dòng một part
+    (lô dở được ghi khi thoát khối with, kể cả khi lỗi). Hồ sơ có trong output nhưng chưa
+    vào sổ (crash trước khi ghi lô) được run() thẩm định lại và chỉ ghi vào sổ.
+    """
+
+    def __init__(self, path, branch="", product="", batch_size=5000):
+        from src.portfolio.book import PortfolioBook
+        self.book = PortfolioBook(path)
+        self.branch = branch
+        self.product = product
+        self.batch_size = batch_size
+        self._rows = []
+
+    def write(self, row):
+        if row.get("error"):
+            return
+        self._rows.append({**row, "loan_id": row["source"], "branch": self.branch, "product": self.product})
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def done_keys(self):
+        return set(self.book.table(["loan_id"]).column(0).to_pylist()) - {None}
+
+    def flush(self):
+        if not self._rows:
+            return
+        self.book.append(self._rows)
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+def run(source, output, fmt="csv", workers=None, chunksize=8, progress=True, portfolio=None):
+    sink = ParquetSink(output) if fmt == "parquet" else CsvSink(output)
+    done = sink.done_keys()
+    redo = set()
+    if portfolio is not None:
+        # đã ghi output nhưng chưa vào sổ danh mục: thẩm định lại, chỉ ghi vào sổ
+        redo = sink.ok_keys() - portfolio.done_keys()
+    tasks = [t for t in iter_sources(source) if t[0] not in done or t[0] in redo]
+    total = len(tasks)
+    if progress:
+        print(f"{len(done)} hồ sơ đã xử lý, còn {total} hồ sơ"
+              + (f" ({len(redo)} chỉ ghi lại vào sổ danh mục)" if redo else ""), file=sys.stderr)
+    if not tasks:
+        return 0
+
+    started = time.time()
+    n = 0
+    pool = mp.Pool(processes=workers or os.cpu_count(), initializer=_init_worker)
+    with sink, portfolio or contextlib.nullcontext(), pool:
+        for row in pool.imap_unordered(appraise_one, tasks, chunksize=chunksize):
+            if row["source"] not in redo:
+                sink.write(row)
+            if portfolio is not None:
+                portfolio.write(row)
+            n += 1
+            if progress and (n % 100 == 0 or n == total):
+                rate = n / max(time.time() - started, 1e-9)
+                print(f"  {n}/{total} ({rate:.0f} hồ sơ/s)", file=sys.stderr)
+    return n
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Thẩm định hàng loạt hồ sơ PASDV (.docx)")
+    ap.add_argument("source", help="thư mục hoặc file .zip chứa các file .docx")
+    ap.add_argument("-o", "--output", required=True, help="file CSV hoặc thư mục Parquet")
+    ap.add_argument("--format", choices=["csv", "parquet"], default=None,
+                    help="mặc định suy ra từ đuôi output (.csv -> csv, còn lại parquet)")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="số process (mặc định: số CPU)")
+    ap.add_argument("--chunksize", type=int, default=8)
+    ap.add_argument("--portfolio", default=None, help="thư mục sổ danh mục để ghi thêm kết quả (src/portfolio)")
+    ap.add_argument("--branch", default="", help="chi nhánh ghi vào sổ danh mục")
+    ap.add_argument("--product", default="", help="sản phẩm ghi vào sổ danh mục")
+    ap.add_argument("-q", "--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "parquet")
+    run(args.source, args.output, fmt=fmt, workers=args.workers,
+        chunksize=args.chunksize, progress=not args.quiet,
+        portfolio=PortfolioSink(args.portfolio, args.branch, args.product) if args.portfolio else None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# src/export/excel_stream.py
+"""
+Ghi lịch trả nợ ra .xlsx theo kiểu streaming, bộ nhớ không đổi theo số dòng.
+
+Mỗi dòng được format thành XML SpreadsheetML và ghi thẳng vào entry nén của zip
+output (file hoặc stream bất kỳ, kể cả không seek được), không dựng workbook trong
+RAM như pandas.ExcelWriter/openpyxl. Xuất một lịch 60 kỳ hay toàn bộ lịch của một
+danh mục 50.000 khoản vay đều dùng cùng một lượng bộ nhớ.
+
+    with open("danh_muc.xlsx", "wb") as f:
+        write_schedules_xlsx(f, ((hd.ma, schedule_of(hd)) for hd in hop_dongs), layout="long")
+"""
+import math
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from src.monitoring import metrics
+
+EXCEL_MAX_ROWS = 1_048_576
+
+# style index trong styles.xml bên dưới
+S_HEADER, S_INT, S_VND, S_TEXT, S_PERCENT = 1, 2, 3, 4, 5
+
+SCHEDULE_HEADERS = [
+    ("month", "Tháng", S_INT),
+    ("payment", "Thanh toán", S_VND),
+    ("interest", "Lãi", S_VND),
+    ("principal", "Gốc", S_VND),
+    ("balance", "Dư nợ", S_VND),
+]
+
+SUMMARY_HEADERS = [
+    ("loan_id", "Mã khoản vay", S_TEXT),
+    ("months", "Số kỳ", S_INT),
+    ("principal", "Số tiền vay", S_VND),
+    ("total_payment", "Tổng thanh toán", S_VND),
+    ("total_interest", "Tổng lãi", S_VND),
+    ("first_payment", "Kỳ đầu", S_VND),
+]
+
+LOAN_ID_COLUMN = ("loan_id", "Mã khoản vay", S_TEXT)
+
+_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_STYLES_XML = _XML_DECL + (
+    f'<styleSheet xmlns="{_NS}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="#,##0 &quot;₫&quot;"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="6">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="1" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="49" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="2" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_INVALID_TITLE_CHARS = str.maketrans({c: "_" for c in '[]:*?/\\'})
+
+def _cell(value, style):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, str):
+        return f'<c t="inlineStr" s="{style}"><is><t>{escape(value)}</t></is></c>'
+    if isinstance(value, float) and not math.isfinite(value):
+        return "<c/>"
+    return f'<c s="{style}"><v>{value}</v></c>'
+
+def _row_xml(row_idx, values, styles):
+    return f'<row r="{row_idx}">' + "".join(_cell(v, s) for v, s in zip(values, styles)) + "</row>"
+
+class XlsxStreamWriter:
+    """
+    Workbook ghi tuần tự: mỗi lúc chỉ một sheet mở (giới hạn của zipfile khi ghi).
+    Thứ tự sheet trong workbook có thể khác thứ tự ghi (tham số position của sheet()).
+    """
+
+    def __init__(self, target):
+        self._zip = zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=3)
+        self._sheets = []   # (vị trí, thứ tự ghi, tên sheet, part trong zip)
+        self._titles = set()
+
+    def _unique_title(self, name):
+        base = str(name).translate(_INVALID_TITLE_CHARS)[:31] or "Sheet"
+        title, i = base, 1
+        while title.lower() in self._titles:
+            i += 1
+            suffix = f" ({i})"
+            title = base[:31 - len(suffix)] + suffix
+        self._titles.add(title.lower())
+        return title
+
+    def sheet(self, name, headers, position=None):
+        """Mở sheet mới để ghi (context manager); headers: list (key, nhãn, style)."""
+        title = self._unique_title(name)
+        part = f"xl/worksheets/sheet{len(self._sheets) + 1}.xml"
+        pos = len(self._sheets) if position is None else position
+        self._sheets.append((pos, len(self._sheets), title, part))
+        return _Sheet(self._zip.open(part, "w"), headers)
+
+    def write_raw_sheet(self, name, fileobj, position=None):
+        """Chép một sheet XML đã dựng sẵn (vd ghi tạm ra đĩa) vào workbook."""
+        title = self._unique_title(name)
+        part = f"xl/worksheets/sheet{len(self._sheets) + 1}.xml"
+        pos = len(self._sheets) if position is None else position
+        self._sheets.append((pos, len(self._sheets), title, part))
+        fileobj.seek(0)
+        with self._zip.open(part, "w") as out:
+            shutil.copyfileobj(fileobj, out)
+
+    def close(self):
+        if not self._sheets:
+            with self.sheet("Sheet1", []):
+                pass
+        ordered = sorted(self._sheets)
+        z = self._zip
+        overrides = "".join(
+            f'<Override PartName="/{part}" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for _p, _i, _t, part in self._sheets
+        )
+        z.writestr("[Content_Types].xml", _XML_DECL + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>'
+        ))
+        z.writestr("_rels/.rels", _XML_DECL + (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        sheets = "".join(
+            f'<sheet name={quoteattr(title)} sheetId="{n}" r:id="rId{i + 1}"/>'
+            for n, (_p, i, title, _part) in enumerate(ordered, 1)
+        )
+        z.writestr("xl/workbook.xml", _XML_DECL + (
+            f'<workbook xmlns="{_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>'
+        ))
+        rels = "".join(
+            f'<Relationship Id="rId{i + 1}" Type="{_REL_NS}/worksheet" Target="{part[3:]}"/>'
+            for _p, i, _t, part in self._sheets
+        )
+        z.writestr("xl/_rels/workbook.xml.rels", _XML_DECL + (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{rels}<Relationship Id="rId{len(self._sheets) + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        z.writestr("xl/styles.xml", _STYLES_XML)
+        z.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _Sheet:
+    def __init__(self, out, headers, owns_stream=True):
+        self._out = out
+        self._owns_stream = owns_stream
+        self.styles = [s for _k, _l, s in headers]
+        self.rows = 0
+        cols = f'<cols><col min="1" max="{len(headers)}" width="18" customWidth="1"/></cols>' if headers else ""
+        out.write((_XML_DECL + (
+            f'<worksheet xmlns="{_NS}"><sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            f'</sheetView></sheetViews>{cols}<sheetData>'
+        )).encode("utf-8"))
+        if headers:
+            self._write(_row_xml(1, [l for _k, l, _s in headers], [S_HEADER] * len(headers)))
+            self.rows = 1
+
+    def _write(self, xml):
+        self._out.write(xml.encode("utf-8"))
+
+    def append(self, values):
+        self.rows += 1
+        self._write(_row_xml(self.rows, values, self.styles))
+
+    def append_many(self, rows):
+        """Ghi nhiều dòng một lần (gộp chuỗi trước khi nén)."""
+        styles, start = self.styles, self.rows + 1
+        chunk = [_row_xml(start + i, r, styles) for i, r in enumerate(rows)]
+        self.rows += len(chunk)
+        self._write("".join(chunk))
+
+    def close(self):
+        if self._out is not None:
+            self._write("</sheetData></worksheet>")
+            if self._owns_stream:
+                self._out.close()
+            self._out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _columns(schedule):
+    """Lấy các cột của lịch trả nợ dưới dạng list Python (DataFrame hoặc dict các mảng)."""
+    cols = []
+    for name, _title, _style in SCHEDULE_HEADERS:
+        col = schedule[name]
+        cols.append(col.tolist() if hasattr(col, "tolist") else list(col))
+    return cols
+
+@metrics.timed("export_xlsx", size=lambda written, *a, **k: {"rows": written})
+def write_schedules_xlsx(target, schedules, layout="long", summary=True, max_rows=EXCEL_MAX_ROWS):
+    """
+    target: đường dẫn file hoặc stream nhị phân có thể ghi
+    schedules: iterable các cặp (loan_id, schedule); schedule là DataFrame hoặc dict
+               các mảng có cột month, payment, interest, principal, balance
+    layout: "long"     - một sheet dài có thêm cột mã khoản vay (tự sang sheet mới khi chạm giới hạn dòng Excel)
+            "per_loan" - mỗi khoản vay một sheet
+    summary: thêm sheet "Tổng hợp" (một dòng mỗi khoản vay) ở đầu workbook
+    Trả về số dòng lịch trả nợ đã ghi.
+    """
+    if layout not in ("long", "per_loan"):
+        raise ValueError(f"layout không hợp lệ: {layout}")
+
+    written = 0
+    long_headers = [LOAN_ID_COLUMN] + SCHEDULE_HEADERS
+    # sheet tổng hợp được ghi tạm ra đĩa (không giữ trong RAM) rồi chép vào cuối zip
+    with XlsxStreamWriter(target) as book, tempfile.TemporaryFile() as summary_tmp:
+        summary_ws = _Sheet(summary_tmp, SUMMARY_HEADERS, owns_stream=False) if summary else None
+        long_ws = None
+        for loan_id, schedule in schedules:
+            cols = _columns(schedule)
+            n = len(cols[0])
+            if layout == "per_loan":
+                with book.sheet(loan_id, SCHEDULE_HEADERS) as ws:
+                    ws.append_many(zip(*cols))
+            else:
+                lid = str(loan_id)
+                start = 0
+                while start < n or long_ws is None:
+                    if long_ws is None or long_ws.rows >= max_rows:
+                        if long_ws is not None:
+                            long_ws.close()
+                        long_ws = book.sheet("Lịch trả nợ", long_headers)
+                    take = min(n - start, max_rows - long_ws.rows)
+                    long_ws.append_many((lid,) + r for r in zip(*(c[start:start + take] for c in cols)))
+                    start += take
+            written += n
+
+            if summary_ws is not None:
+                pay, interest, principal = cols[1], cols[2], cols[3]
+                summary_ws.append((
+                    str(loan_id), n, float(sum(principal)), float(sum(pay)),
+                    float(sum(interest)), float(pay[0]) if n else 0.0,
+                ))
+
+        if long_ws is not None:
+            long_ws.close()
+        elif layout == "long":
+            # danh mục rỗng vẫn có sheet lịch trả nợ với tiêu đề
+            book.sheet("Lịch trả nợ", long_headers).close()
+        if summary_ws is not None:
+            summary_ws.close()
+            book.write_raw_sheet("Tổng hợp", summary_tmp, position=-1)
+    return written
+
+def write_schedule_xlsx(target, df):
+    """Một lịch trả nợ, một sheet, không có sheet tổng hợp."""
+    return write_schedules_xlsx(target, [("Lịch trả nợ", df)], layout="per_loan", summary=False)
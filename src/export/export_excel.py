@@ -1,9 +1,15 @@
 import io
-import pandas as pd
 
-def export_schedule_excel(df):
+from src.export.excel_stream import write_schedule_xlsx
+
+def export_schedule_excel(df, target=None):
+    """
+    Ghi lịch trả nợ ra xlsx (streaming, write-only).
+    target: file/stream để ghi thẳng ra; None -> trả về bytes như trước.
+    """
+    if target is not None:
+        write_schedule_xlsx(target, df)
+        return target
     buf=io.BytesIO()
-    with pd.ExcelWriter(buf,engine="openpyxl") as w:
-        df.to_excel(w,index=False)
-    buf.seek(0)
+    write_schedule_xlsx(buf, df)
     return buf.getvalue()
@@ -0,0 +1,63 @@
+# src/export/lazy_export.py
+"""
+Tạo file export (xlsx/docx) theo yêu cầu, ngoài luồng chạy script Streamlit.
+
+File chỉ được dựng khi người dùng bấm nút, trong một thread pool dùng chung;
+kết quả được cache theo hash của dữ liệu hồ sơ + lịch trả nợ, nên các lần rerun
+do gõ phím không tốn chi phí export, và dữ liệu không đổi thì không dựng lại.
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+def dossier_key(data, df=None):
+    """
+    Hash ổn định của dữ liệu hồ sơ và lịch trả nợ. df=None khi lịch đã được xác định bởi
+    input nằm trong `data` (app khoá theo (tiền vay, lãi suất, thời hạn), không hash lịch).
+    """
+    h = hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    if df is not None and len(df):
+        import pandas as pd
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+class ExportManager:
+    def __init__(self, max_workers=2, max_entries=64):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._futures = OrderedDict()   # (kind, key) -> Future[bytes]
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def submit(self, kind, key, builder, *args):
+        """
+        Lên lịch builder(*args) -> bytes nếu (kind, key) chưa có/không đang chạy.
+        Tham số được deep-copy để người dùng sửa tiếp trong UI không ảnh hưởng file đang dựng.
+        """
+        with self._lock:
+            fut = self._futures.get((kind, key))
+            if fut is not None and not (fut.done() and fut.exception() is not None):
+                self._futures.move_to_end((kind, key))
+                return fut
+            fut = self._pool.submit(builder, *copy.deepcopy(args))
+            self._futures[(kind, key)] = fut
+            while len(self._futures) > self.max_entries:
+                self._futures.popitem(last=False)
+            return fut
+
+    def future(self, kind, key):
+        with self._lock:
+            return self._futures.get((kind, key))
+
+    def result(self, kind, key):
+        """bytes nếu đã dựng xong, None nếu chưa yêu cầu/đang dựng. Lỗi khi dựng được raise lại."""
+        fut = self.future(kind, key)
+        if fut is None or not fut.done():
+            return None
+        return fut.result()
+
+    def pending(self, kind, key):
+        fut = self.future(kind, key)
+        return fut is not None and not fut.done()
@@ -0,0 +1,367 @@
+# src/export/report_engine.py
+"""
+Sinh báo cáo thẩm định .docx từ template, dựng XML trực tiếp (không qua python-docx).
+
+Template là file .docx bất kỳ (mẫu của ngân hàng) chứa các placeholder dạng
+{{ten}}, {{so_tien_vay}}, ... và một đoạn chỉ chứa {{BANG_LICH_TRA_NO}} — đoạn này
+được thay bằng bảng lịch trả nợ đầy đủ, sinh bằng nối chuỗi một lượt thay vì
+table.add_row() từng dòng. Các part khác của template (styles, header, ảnh logo)
+được giữ nguyên.
+
+    tpl = ReportTemplate.load("mau_bao_cao.docx")
+    docx_bytes = tpl.render(data, schedule_df)
+    render_reports_zip([(ten_file, data, df), ...], "bao_cao.zip", template="mau_bao_cao.docx")
+"""
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from src.monitoring import metrics
+
+TABLE_PLACEHOLDER = "BANG_LICH_TRA_NO"
+DOCUMENT_PART = "word/document.xml"
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_PLACEHOLDER_BYTES_RE = re.compile(rb"\{\{\s*(\w+)\s*\}\}")
+
+# ======================================================
+# 1) TEMPLATE MẶC ĐỊNH (khi ngân hàng chưa cung cấp mẫu)
+# ======================================================
+def _p(text, bold=False, size=None):
+    rpr = ""
+    if bold or size:
+        rpr = "<w:rPr>" + ("<w:b/>" if bold else "") + (f'<w:sz w:val="{size}"/>' if size else "") + "</w:rPr>"
+    return f'<w:p><w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+_DEFAULT_BODY = "".join([
+    _p("BÁO CÁO THẨM ĐỊNH PHƯƠNG ÁN", bold=True, size=32),
+    _p("Họ tên: {{ten}}"),
+    _p("CCCD: {{cccd}}"),
+    _p("Địa chỉ: {{dia_chi}}"),
+    _p("SĐT: {{phone}}"),
+    _p(""),
+    _p("Mục đích vay: {{muc_dich}}"),
+    _p("Số tiền vay: {{so_tien_vay}} đồng"),
+    _p("Lãi suất: {{lai_suat_p_a}}%/năm"),
+    _p("Thời hạn vay: {{thoi_han_thang}} tháng"),
+    '<w:p><w:r><w:br w:type="page"/></w:r></w:p>',
+    _p("LỊCH TRẢ NỢ", bold=True, size=28),
+    _p("{{" + TABLE_PLACEHOLDER + "}}"),
+])
+
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+def default_template_bytes():
+    """Gói .docx tối thiểu chứa template mặc định."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _XML_DECL + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        z.writestr("_rels/.rels", _XML_DECL + (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'
+        ))
+        z.writestr(DOCUMENT_PART, _XML_DECL + (
+            f'<w:document xmlns:w="{_W_NS}"><w:body>{_DEFAULT_BODY}'
+            '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+            '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1418" w:header="709" w:footer="709" w:gutter="0"/>'
+            '</w:sectPr></w:body></w:document>'
+        ))
+    return buf.getvalue()
+
+# ======================================================
+# 2) DỰNG DỮ LIỆU
+# ======================================================
+def _vnd(v):
+    try:
+        return f"{int(round(float(v or 0))):,}"
+    except (TypeError, ValueError):
+        return str(v)
+
+def report_context(data, summary=None):
+    """Làm phẳng dữ liệu hồ sơ thành dict placeholder -> chuỗi hiển thị."""
+    idf = data.get("identification", {}) or {}
+    fin = data.get("finance", {}) or {}
+    inc = data.get("income", {}) or {}
+    ctx = {k: "" if v is None else str(v) for k, v in idf.items()}
+    ctx.update({k: "" if v is None else str(v) for k, v in fin.items()})
+    for k in ("tong_nhu_cau", "von_doi_ung", "so_tien_vay"):
+        ctx[k] = _vnd(fin.get(k))
+    for k in ("thu_nhap_hang_thang", "chi_phi_hang_thang"):
+        ctx[k] = _vnd(inc.get(k))
+    ctx["gia_tri_tsdb"] = _vnd(sum((c.get("gia_tri") or 0) for c in data.get("collateral", []) or []))
+    for k, v in (summary or {}).items():
+        if isinstance(v, float):
+            ctx[k] = f"{v:,.2f}" if k.endswith("_percent") else _vnd(v)
+        elif v is not None:
+            ctx[k] = str(v)
+    return ctx
+
+_BORDERS = "".join(
+    f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    for side in ("top", "left", "bottom", "right", "insideH", "insideV")
+)
+_TABLE_HEADERS = ("Tháng", "Thanh toán", "Lãi", "Gốc", "Dư nợ")
+
+def _tc(text, bold=False, right=False):
+    ppr = '<w:pPr><w:jc w:val="right"/></w:pPr>' if right else ""
+    rpr = "<w:rPr><w:b/></w:rPr>" if bold else ""
+    return f"<w:tc><w:p>{ppr}<w:r>{rpr}<w:t>{text}</w:t></w:r></w:p></w:tc>"
+
+def schedule_table_xml(schedule):
+    """Bảng lịch trả nợ đầy đủ dưới dạng một chuỗi <w:tbl>, dựng theo cột rồi nối một lần."""
+    months = [str(int(m)) for m in schedule["month"]]
+    money = [[_vnd(v) for v in schedule[c]] for c in ("payment", "interest", "principal", "balance")]
+    head = "<w:tr><w:trPr><w:tblHeader/></w:trPr>" + "".join(_tc(h, bold=True) for h in _TABLE_HEADERS) + "</w:tr>"
+    rows = [
+        f'<w:tr><w:tc><w:p><w:r><w:t>{m}</w:t></w:r></w:p></w:tc>'
+        + "".join(f'<w:tc><w:p><w:pPr><w:jc w:val="right"/></w:pPr><w:r><w:t>{v}</w:t></w:r></w:p></w:tc>' for v in vals)
+        + "</w:tr>"
+        for m, *vals in zip(months, *money)
+    ]
+    grid = "".join('<w:gridCol w:w="1870"/>' for _ in _TABLE_HEADERS)
+    return (
+        f'<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/><w:tblBorders>{_BORDERS}</w:tblBorders></w:tblPr>'
+        f"<w:tblGrid>{grid}</w:tblGrid>{head}{''.join(rows)}</w:tbl>"
+    )
+
+# ======================================================
+# 3) TEMPLATE
+# ======================================================
+_P, _R, _T, _RPR = (f"{_W_NS} {n}" for n in ("p", "r", "t", "rPr"))
+
+class _El:
+    """Vị trí (byte) của một phần tử trong XML gốc: [start, open_end) là thẻ mở, [close, end) là thẻ đóng."""
+    __slots__ = ("name", "parent", "children", "start", "open_end", "close", "end")
+
+    def __init__(self, name, parent, start, open_end):
+        self.name, self.parent, self.children = name, parent, []
+        self.start, self.open_end = start, open_end
+        self.close = self.end = open_end
+
+def _scan(xml):
+    """
+    Dựng cây vị trí của document.xml bằng expat (parser XML thật, không phải regex) để
+    đoạn lồng (text box w:txbxContent) và bảng trong ô được nhận đúng. XML gốc không bị
+    serialize lại: mọi chỉnh sửa là thay các khoảng byte, phần còn lại giữ nguyên.
+    """
+    from xml.parsers import expat
+    parser = expat.ParserCreate(namespace_separator=" ")
+    root = _El(None, None, 0, 0)
+    stack = [root]
+
+    def start(name, _attrs):
+        i = parser.CurrentByteIndex
+        el = _El(name, stack[-1], i, xml.index(b">", i) + 1)
+        stack[-1].children.append(el)
+        stack.append(el)
+
+    def end(_name):
+        el = stack.pop()
+        if xml[el.open_end - 2:el.open_end] != b"/>":
+            el.close = parser.CurrentByteIndex
+            el.end = xml.index(b">", el.close) + 1
+
+    parser.StartElementHandler, parser.EndElementHandler = start, end
+    parser.Parse(xml, True)
+    return root
+
+def _iter(el, name):
+    for child in el.children:
+        if child.name == name:
+            yield child
+        yield from _iter(child, name)
+
+def _own_runs(para):
+    """Các run thuộc trực tiếp đoạn này (không gồm run của đoạn lồng trong text box)."""
+    out = []
+
+    def walk(el):
+        for child in el.children:
+            if child.name == _R:
+                out.append(child)
+            elif child.name != _P:
+                walk(child)
+    walk(para)
+    return out
+
+def _run_text(xml, run):
+    return b"".join(xml[t.open_end:t.close] for t in run.children if t.name == _T)
+
+def _paragraph_text(xml, para):
+    return b"".join(_run_text(xml, r) for r in _own_runs(para))
+
+def _merged_run(xml, runs):
+    """Một run thay cho `runs`: thẻ mở và rPr của run đầu, text liền nhau gộp vào một w:t, phần tử khác giữ nguyên."""
+    first = runs[0]
+    out = [xml[first.start:first.open_end]]
+    rpr = next((c for c in first.children if c.name == _RPR), None)
+    if rpr is not None:
+        out.append(xml[rpr.start:rpr.end])
+    pending = []
+
+    def flush():
+        if pending:
+            out.append(b'<w:t xml:space="preserve">' + b"".join(pending) + b"</w:t>")
+            pending.clear()
+    for run in runs:
+        for child in run.children:
+            if child.name == _T:
+                pending.append(xml[child.open_end:child.close])
+            elif child.name != _RPR:
+                flush()
+                out.append(xml[child.start:child.end])
+    flush()
+    out.append(b"</w:r>")
+    return b"".join(out)
+
+def _merge_split_placeholders(xml):
+    """
+    Word hay cắt '{{ten}}' thành nhiều run; chỉ gộp dãy run chứa placeholder bị cắt về một run
+    (giữ rPr của run đầu). Các run khác, pPr, tab, field, hình vẽ của đoạn được giữ nguyên;
+    phần tử không phải run nằm xen trong dãy (bookmark, proofErr) được đặt ngay sau run gộp.
+    xml: bytes; trả về bytes.
+    """
+    edits = []  # (start, end, bytes thay thế)
+    for para in _iter(_scan(xml), _P):
+        runs = _own_runs(para)
+        owner, joined = [], []
+        for i, run in enumerate(runs):
+            text = _run_text(xml, run)
+            owner.extend([i] * len(text))
+            joined.append(text)
+        joined = b"".join(joined)
+        spans = []
+        for m in _PLACEHOLDER_BYTES_RE.finditer(joined):
+            lo, hi = owner[m.start()], owner[m.end() - 1]
+            if lo == hi:
+                continue
+            if spans and lo <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], hi)
+            else:
+                spans.append([lo, hi])
+        for lo, hi in spans:
+            group = runs[lo:hi + 1]
+            parent = group[0].parent
+            if any(r.parent is not parent for r in group):
+                continue  # run nằm trong các phần tử khác nhau (vd. một nửa trong hyperlink): không gộp được
+            siblings = parent.children
+            between = siblings[siblings.index(group[0]):siblings.index(group[-1]) + 1]
+            others = b"".join(xml[e.start:e.end] for e in between if e.name != _R)
+            edits.append((group[0].start, group[-1].end, _merged_run(xml, group) + others))
+    for start, end, new in reversed(edits):
+        xml = xml[:start] + new + xml[end:]
+    return xml
+
+class ReportTemplate:
+    def __init__(self, template_bytes):
+        parts = {}  # giữ nguyên thứ tự part của template
+        with zipfile.ZipFile(io.BytesIO(template_bytes)) as z:
+            for info in z.infolist():
+                parts[info.filename] = z.read(info.filename)
+        xml = _merge_split_placeholders(parts[DOCUMENT_PART])
+        # tách sẵn quanh đoạn placeholder bảng để mỗi lần render chỉ cần nối chuỗi
+        marker = ("{{" + TABLE_PLACEHOLDER + "}}").encode()
+        table_para = next((p for p in _iter(_scan(xml), _P) if marker in _paragraph_text(xml, p)), None)
+        self._table_suffix = ""
+        if table_para is not None:
+            self._head = xml[:table_para.start].decode("utf-8")
+            self._tail = xml[table_para.end:].decode("utf-8")
+            if table_para.parent.name != f"{_W_NS} body":
+                # ô bảng / text box phải kết thúc bằng một đoạn văn
+                self._table_suffix = "<w:p/>"
+        else:
+            self._head, self._tail = xml.decode("utf-8"), None
+        self._parts = parts
+
+    @classmethod
+    def load(cls, template=None):
+        """template: None (mẫu mặc định), đường dẫn, bytes hoặc ReportTemplate."""
+        if isinstance(template, ReportTemplate):
+            return template
+        if template is None:
+            return cls(default_template_bytes())
+        if isinstance(template, (bytes, bytearray)):
+            return cls(bytes(template))
+        with open(template, "rb") as f:
+            return cls(f.read())
+
+    def render_xml(self, context, schedule=None):
+        def sub(text):
+            return _PLACEHOLDER_RE.sub(lambda m: escape(context.get(m.group(1), "")), text)
+        if self._tail is None:
+            return sub(self._head)
+        table = schedule_table_xml(schedule) if schedule is not None and len(schedule) else ""
+        return sub(self._head) + table + self._table_suffix + sub(self._tail)
+
+    @metrics.timed("export_docx", size=lambda r, self, data, schedule=None, *a, **k: {"rows": 0 if schedule is None else len(schedule)})
+    def render(self, data, schedule=None, summary=None, target=None):
+        """Trả về bytes .docx (hoặc ghi vào target nếu có)."""
+        out = target if target is not None else io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+            for name, content in self._parts.items():
+                if name == DOCUMENT_PART:
+                    content = self.render_xml(report_context(data, summary), schedule).encode("utf-8")
+                z.writestr(name, content)
+        return out.getvalue() if target is None else target
+
+# ======================================================
+# 4) SINH HÀNG LOẠT
+# ======================================================
+_WORKER_TEMPLATE = None
+
+def _init_worker(template_bytes):
+    global _WORKER_TEMPLATE
+    # worker spawn/forkserver không thừa hưởng trạng thái metrics của process cha
+    metrics.init_from_env()
+    _WORKER_TEMPLATE = ReportTemplate(template_bytes)
+
+def _render_item(item):
+    name, data, schedule = item[:3]
+    summary = item[3] if len(item) > 3 else None
+    return name, _WORKER_TEMPLATE.render(data, schedule, summary)
+
+def render_reports_zip(items, target, template=None, workers=None, chunksize=8):
+    """
+    items: iterable các tuple (tên file, data, schedule[, summary])
+    target: đường dẫn hoặc stream của file .zip kết quả
+    Mỗi process nạp template một lần; các báo cáo được ghi vào zip ngay khi xong.
+    Trả về số báo cáo đã sinh.
+    """
+    if isinstance(template, ReportTemplate):
+        raise TypeError("render_reports_zip cần đường dẫn/bytes template để gửi sang các process")
+    if template is None:
+        template_bytes = default_template_bytes()
+    elif isinstance(template, (bytes, bytearray)):
+        template_bytes = bytes(template)
+    else:
+        with open(template, "rb") as f:
+            template_bytes = f.read()
+
+    n = 0
+    seen = set()
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_STORED) as out, \
+            ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                initializer=_init_worker, initargs=(template_bytes,)) as pool:
+        for name, content in pool.map(_render_item, items, chunksize=chunksize):
+            fname = name if name.lower().endswith(".docx") else name + ".docx"
+            base, i = fname, 1
+            while fname in seen:
+                i += 1
+                fname = f"{base[:-5]} ({i}).docx"
+            seen.add(fname)
+            # docx vốn đã nén, lưu thẳng không nén lại
+            out.writestr(fname, content)
+            n += 1
+    return n
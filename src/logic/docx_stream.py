@@ -0,0 +1,118 @@
+# src/logic/docx_stream.py
+"""
+Đọc nội dung chữ của file .docx theo kiểu streaming, không qua python-docx.
+
+Chỉ mở part word/document.xml trong zip và duyệt bằng iterparse; các part ảnh
+(word/media/*), styles, header/footer không bao giờ được giải nén. Mỗi khối ở cấp
+body được giải phóng ngay sau khi đọc xong, nên bộ nhớ đỉnh phụ thuộc vào lượng
+chữ chứ không phụ thuộc kích thước file.
+"""
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+_P, _T, _TAB, _BR, _CR = W_NS + "p", W_NS + "t", W_NS + "tab", W_NS + "br", W_NS + "cr"
+_TBL, _TR, _TC, _BODY = W_NS + "tbl", W_NS + "tr", W_NS + "tc", W_NS + "body"
+_FALLBACK = MC_NS + "Fallback"
+
+def _open_zip(source):
+    """source: đường dẫn, bytes, hoặc file-like (vd UploadedFile của Streamlit)."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, "seek"):
+        source.seek(0)
+    return zipfile.ZipFile(source)
+
+def _add_piece(para, piece):
+    if para[2]:
+        para[0].append("\n")
+        para[2] = False
+    para[0].append(piece)
+
+def _add_line(para, text):
+    """Chữ của đoạn/bảng lồng (textbox) thành một dòng riêng trong đoạn chứa nó."""
+    if para[0] and not para[0][-1].endswith("\n"):
+        para[0].append("\n")
+    para[0].append(text)
+    para[2] = True
+
+def iter_docx_blocks(source):
+    """
+    Sinh các khối theo thứ tự trong tài liệu:
+      ("p", text)          - đoạn văn ở cấp body
+      ("row", [cell, ...]) - một hàng của bảng cấp ngoài cùng; mỗi cell là text các đoạn nối bằng "\\n"
+    Bảng lồng trong ô được làm phẳng vào text của ô chứa nó (các cell nối bằng " | ").
+    Đoạn lồng trong đoạn (textbox, w:txbxContent) thành một dòng riêng ngay tại vị trí của nó trong
+    đoạn chứa; bản sao VML trong mc:Fallback bị bỏ qua để chữ của textbox không lặp hai lần.
+    """
+    with _open_zip(source) as z, z.open("word/document.xml") as xml:
+        body = None
+        paras = []           # stack: [các mảnh text, số ô đang mở, chờ xuống dòng] của từng đoạn đang mở
+        cells = []           # stack: text các đoạn của từng ô đang mở
+        rows = []            # stack: các ô của từng hàng đang mở
+        fallback = 0         # độ sâu mc:Fallback đang mở
+        for event, el in ET.iterparse(xml, events=("start", "end")):
+            tag = el.tag
+            if tag == _FALLBACK:
+                fallback += 1 if event == "start" else -1
+                continue
+            if fallback:
+                continue
+            if event == "start":
+                if tag == _P:
+                    paras.append([[], len(cells), False])
+                elif tag == _TC:
+                    cells.append([])
+                elif tag == _TR:
+                    rows.append([])
+                elif tag == _BODY:
+                    body = el
+                continue
+
+            if tag in (_T, _TAB, _BR, _CR):
+                piece = el.text if tag == _T else "\t" if tag == _TAB else "\n"
+                if paras and piece:
+                    _add_piece(paras[-1], piece)
+            elif tag == _P:
+                text = "".join(paras.pop()[0])
+                if cells and (not paras or len(cells) > paras[-1][1]):
+                    cells[-1].append(text)
+                elif paras:
+                    if text.strip():
+                        _add_line(paras[-1], text)
+                elif text.strip():
+                    yield ("p", text)
+            elif tag == _TC:
+                text = "\n".join(t for t in cells.pop() if t.strip())
+                if rows:
+                    rows[-1].append(text)
+            elif tag == _TR:
+                row = rows.pop()
+                if rows:
+                    # hàng của bảng lồng -> một dòng trong ô chứa nó
+                    if cells:
+                        cells[-1].append(" | ".join(row))
+                elif paras:
+                    # bảng trong textbox -> một dòng trong đoạn chứa textbox
+                    if any(c.strip() for c in row):
+                        _add_line(paras[-1], " | ".join(row))
+                elif any(c.strip() for c in row):
+                    yield ("row", row)
+
+            # giải phóng khối cấp body đã xử lý xong
+            if body is not None and tag in (_P, _TBL) and not rows and not cells and not paras:
+                body.clear()
+
+def blocks_to_lines(blocks):
+    """Làm phẳng các khối thành danh sách dòng; hàng bảng nối các ô bằng tab."""
+    lines = []
+    for kind, value in blocks:
+        text = "\t".join(c.replace("\n", " ") for c in value) if kind == "row" else value
+        lines.extend(l.strip() for l in text.splitlines() if l.strip())
+    return lines
+
+def read_docx_lines(source):
+    """Toàn bộ đoạn văn + hàng bảng của file .docx dưới dạng list các dòng đã strip."""
+    return blocks_to_lines(iter_docx_blocks(source))
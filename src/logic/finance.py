@@ -1,5 +1,34 @@
 # src/logic/finance.py
-import pandas as pd
+import numpy as np
+
+# pandas chỉ nạp khi thật sự dựng DataFrame (xem benchmarks/import_budget.py)
+
+from src.logic.reactive import Derived
+from src.monitoring import metrics
+
+def _loan_arrays(principal, annual_rate_percent, months):
+    """
+    Chuẩn hoá (principal, rate, months) thành 3 mảng 1-D cùng độ dài.
+    Chấp nhận scalar hoặc array-like; None/NaN/âm được coi là 0.
+    """
+    P = np.nan_to_num(np.atleast_1d(np.asarray(principal, dtype=float)))
+    R = np.nan_to_num(np.atleast_1d(np.asarray(annual_rate_percent, dtype=float)))
+    N = np.nan_to_num(np.atleast_1d(np.asarray(months, dtype=float))).astype(np.int64)
+    P, R, N = np.broadcast_arrays(P, R, N)
+    return np.maximum(P, 0.0), R, np.maximum(N, 0)
+
+def annuity_payment(principal, annual_rate_percent, months):
+    """
+    Khoản thanh toán annuity hàng tháng cho cả mảng khoản vay (vectorized).
+    Trả về ndarray float64; khoản vay có principal <= 0 hoặc months <= 0 -> 0.
+    """
+    P, R, N = _loan_arrays(principal, annual_rate_percent, months)
+    r = R / 100.0 / 12.0
+    valid = (P > 0) & (N > 0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = np.power(1.0 + r, N)
+        pay = np.where(r == 0, P / np.maximum(N, 1), P * (r * growth) / (growth - 1.0))
+    return np.where(valid, pay, 0.0)
 
 def monthly_payment(principal, annual_rate_percent, months):
     """
@@ -8,73 +37,429 @@ def monthly_payment(principal, annual_rate_percent, months):
     annual_rate_percent: %/năm (vd 8.5)
     months: số tháng
     """
-    principal = float(principal or 0)
-    months = int(months or 0)
-    if principal <= 0 or months <= 0:
-        return 0.0
-    monthly_rate = annual_rate_percent / 100.0 / 12.0
-    if monthly_rate == 0:
-        return principal / months
-    # chuẩn công thức annuity
-    return principal * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
+    return float(annuity_payment(principal or 0, annual_rate_percent or 0, months or 0)[0])
 
-def amortization_schedule(principal, annual_rate_percent, months):
+@metrics.timed("amortization_arrays", size=lambda r, *a, **k: {"loans": len(r["months"]), "months": int(r["months"].sum())})
+def amortization_arrays(principal, annual_rate_percent, months, month=None):
+    """
+    Engine closed-form: tính lịch trả nợ của nhiều khoản vay cùng lúc, không vòng lặp theo tháng.
+    Trả về dict:
+      - month: ndarray (max_months,) 1..max_months
+      - payment, interest, principal, balance: ndarray (n_loans, max_months)
+      - months: ndarray (n_loans,) kỳ hạn từng khoản
+    Các tháng vượt quá kỳ hạn của khoản vay được điền 0.
+    month: chỉ tính các kỳ này (1-based, tăng dần) thay cho 1..max_months; mỗi kỳ độc lập
+    nên xem 24 tháng đầu không phải tính phần còn lại (xem src/logic/schedule.py).
+    Dư nợ sau k kỳ: B_k = P*(1+r)^k - A*((1+r)^k - 1)/r  (r = 0: B_k = P - A*k)
+    """
+    P, R, N = _loan_arrays(principal, annual_rate_percent, months)
+    r = (R / 100.0 / 12.0)[:, None]
+    A = annuity_payment(P, R, N)[:, None]
+    if month is None:
+        max_months = int(N.max()) if N.size else 0
+        month = np.arange(1, max_months + 1)
+    else:
+        month = np.asarray(month, dtype=np.int64)
+    k_prev = (month - 1)[None, :]
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = np.power(1.0 + r, k_prev)
+        safe_r = np.where(r == 0, 1.0, r)
+        bal_prev = np.where(r == 0,
+                            P[:, None] - A * k_prev,
+                            P[:, None] * growth - A * (growth - 1.0) / safe_r)
+    bal_prev = np.maximum(bal_prev, 0.0)
+
+    interest = bal_prev * r
+    # numeric guard: kỳ cuối không trả gốc vượt quá dư nợ còn lại
+    principal_paid = np.minimum(A - interest, bal_prev)
+    payment = interest + principal_paid
+    balance = np.maximum(bal_prev - principal_paid, 0.0)
+
+    active = (month[None, :] <= N[:, None]) & (P[:, None] > 0)
+    for arr in (interest, principal_paid, payment, balance):
+        arr[~active] = 0.0
+
+    return {
+        "month": month,
+        "payment": payment,
+        "interest": interest,
+        "principal": principal_paid,
+        "balance": balance,
+        "months": N,
+    }
+
+SCHEDULE_COLUMNS = ["month", "payment", "interest", "principal", "balance"]
+
+def schedules_to_frame(arrays, loan_ids=None):
+    """
+    Chuyển kết quả amortization_arrays thành DataFrame dạng dài
+    (loan_id, month, payment, interest, principal, balance), chỉ giữ các tháng trong kỳ hạn.
+    """
+    N = arrays["months"]
+    n_loans, max_months = arrays["payment"].shape
+    if loan_ids is None:
+        loan_ids = np.arange(n_loans)
+    import pandas as pd
+    mask = arrays["month"][None, :] <= N[:, None]
+    return pd.DataFrame({
+        "loan_id": np.repeat(np.asarray(loan_ids), N),
+        "month": np.broadcast_to(arrays["month"], (n_loans, max_months))[mask],
+        "payment": arrays["payment"][mask],
+        "interest": arrays["interest"][mask],
+        "principal": arrays["principal"][mask],
+        "balance": arrays["balance"][mask],
+    })
+
+@metrics.timed("amortization_schedule", size=lambda r, *a, **k: {"months": len(r)})
+def amortization_schedule(principal, annual_rate_percent, months, method="annuity", grace_months=0, rate_resets=()):
     """
     Trả về DataFrame gồm các cột: month, payment, interest, principal, balance
     interest, principal, payment, balance là float
+    method: "annuity" | "equal_principal"; grace_months: số kỳ đầu chỉ trả lãi;
+    rate_resets: các cặp (kỳ, lãi suất mới) cho khoản vay thả nổi (xem structured_arrays)
     """
+    import pandas as pd
     principal = float(principal or 0)
     months = int(months or 0)
     if months <= 0 or principal <= 0:
         # empty dataframe with expected columns
-        return pd.DataFrame(columns=["month", "payment", "interest", "principal", "balance"])
-    monthly_rate = annual_rate_percent / 100.0 / 12.0
-    payment = monthly_payment(principal, annual_rate_percent, months)
-    balance = principal
-    rows = []
-    for m in range(1, months + 1):
-        interest = balance * monthly_rate
-        principal_paid = payment - interest
-        # numeric guard: if last payment rounding may overshoot
-        if principal_paid > balance:
-            principal_paid = balance
-            payment = interest + principal_paid
-        balance = balance - principal_paid
-        rows.append({
-            "month": m,
-            "payment": float(payment),
-            "interest": float(interest),
-            "principal": float(principal_paid),
-            "balance": float(max(balance, 0.0))
-        })
-    df = pd.DataFrame(rows)
-    return df
+        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+    if method == "annuity" and not grace_months and not rate_resets:
+        arrays = amortization_arrays(principal, annual_rate_percent or 0, months)
+    else:
+        rates = step_rates(annual_rate_percent or 0, months, rate_resets)
+        arrays = structured_arrays(principal, months, rates, method, grace_months)
+    return pd.DataFrame({
+        "month": arrays["month"],
+        "payment": arrays["payment"][0],
+        "interest": arrays["interest"][0],
+        "principal": arrays["principal"][0],
+        "balance": arrays["balance"][0],
+    })
 
-def recalc_all(session_state):
+# ======================================================
+# Lãi suất thả nổi, trả gốc đều (dư nợ giảm dần), ân hạn gốc
+# ======================================================
+# Lịch được chia thành các đoạn có lãi suất không đổi; trong mỗi đoạn dùng công thức đóng
+# từ dư nợ đầu đoạn (annuity: tính lại khoản trả cho số kỳ còn lại; gốc đều: gốc mỗi kỳ =
+# dư nợ đầu đoạn / số kỳ còn lại; ân hạn: chỉ trả lãi). Điều chỉnh lãi suất từ kỳ m chỉ
+# tính lại các kỳ >= m, nên chi phí tỉ lệ với số kỳ còn lại chứ không phải cả kỳ hạn.
+METHOD_ANNUITY = "annuity"
+METHOD_EQUAL_PRINCIPAL = "equal_principal"
+
+def step_rates(initial_rate_percent, months, resets=(), n_loans=None):
     """
-    session_state: st.session_state-like dict/object with key 'data'
-    Return: schedule DataFrame and populate session_state['summary']
+    Ma trận lãi suất (n_loans, max_months) %/năm theo từng kỳ.
+    resets: các cặp (kỳ, lãi suất mới) áp dụng từ kỳ đó trở đi, cho mọi khoản vay.
     """
-    data = session_state.get("data", {}) if isinstance(session_state, dict) else session_state.data
-    finance = data.get("finance", {}) or {}
-    income = data.get("income", {}) or {}
-    collateral = data.get("collateral", []) or []
+    init = np.atleast_1d(np.asarray(initial_rate_percent, dtype=float))
+    N = np.atleast_1d(np.asarray(months, dtype=np.int64))
+    n = n_loans or max(len(init), len(N))
+    M = int(N.max()) if N.size else 0
+    rates = np.empty((n, M))
+    rates[:] = np.broadcast_to(init, (n,))[:, None]
+    for month, rate in sorted(resets):
+        if 1 <= month <= M:
+            rates[:, int(month) - 1:] = rate
+    return rates
+
+def _segment_bounds(rates, start, grace, s0, M):
+    """Các kỳ bắt đầu đoạn >= s0: nơi lãi suất của bất kỳ khoản nào đổi, kỳ bắt đầu tính lại, kỳ hết ân hạn."""
+    tail = rates[:, s0 - 1:]
+    bounds = set((np.flatnonzero((tail[:, 1:] != tail[:, :-1]).any(axis=0)) + s0 + 1).tolist())
+    bounds |= set(np.unique(start[start >= s0]).tolist())
+    g = grace + 1
+    bounds |= set(np.unique(g[(g > s0) & (g <= M)]).tolist())
+    bounds.add(s0)
+    # kỳ bắt đầu/điều chỉnh sau kỳ hạn dài nhất không mở đoạn nào
+    return sorted(int(b) for b in bounds if b <= M) + [M + 1]
 
+def _amortize_tail(out, start):
+    """Tính lại tại chỗ các kỳ >= start (scalar hoặc theo từng khoản) của out từ dư nợ trước kỳ đó."""
+    P, N, G = out["loan_principal"], out["months"], out["grace"]
+    eq, rates = out["equal_principal"], out["rate"]
+    n, M = rates.shape
+    # khoản đã hết kỳ hạn trước start: giữ nguyên (start = N+1)
+    start = np.clip(np.broadcast_to(np.asarray(start, dtype=np.int64), (n,)), 1, N + 1)
+    s0 = int(start.min()) if n else M + 1
+    if s0 > M:
+        return out
+
+    bounds = _segment_bounds(rates, start, G, s0, M)
+    bal = np.zeros(n)   # dư nợ đầu đoạn hiện tại
+    for s, e in zip(bounds[:-1], bounds[1:]):
+        opening = start == s
+        if opening.any():
+            bal[opening] = P[opening] if s == 1 else out["balance"][opening, s - 2]
+        live = (start <= s) & (N >= s) & (P > 0)
+        if not live.any():
+            continue
+        k = np.arange(s, e)
+        j = (k - s)[None, :]
+        r = (rates[:, s - 1] / 100.0 / 12.0)[:, None]
+        B0 = bal[:, None]
+        remaining = np.maximum(N - s + 1, 1)[:, None]
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            # annuity trên số kỳ còn lại, từ dư nợ đầu đoạn
+            A = annuity_payment(bal, rates[:, s - 1], remaining[:, 0])[:, None]
+            growth = np.power(1.0 + r, j)
+            safe_r = np.where(r == 0, 1.0, r)
+            ann_prev = np.where(r == 0, B0 - A * j, B0 * growth - A * (growth - 1.0) / safe_r)
+            # gốc đều
+            eq_prev = B0 - j * (B0 / remaining)
+        # ân hạn: đoạn không vắt qua kỳ G+1 (là biên đoạn) nên cả đoạn hoặc ân hạn hoặc không
+        grace = (s <= G)[:, None]
+        bal_prev = np.where(grace, B0, np.where(eq[:, None], eq_prev, ann_prev))
+        bal_prev = np.maximum(bal_prev, 0.0)
+        interest = bal_prev * r
+        principal_paid = np.where(eq[:, None], B0 / remaining, A - interest)
+        principal_paid = np.where(grace, 0.0, np.minimum(principal_paid, bal_prev))
+
+        valid = live[:, None] & (k[None, :] <= N[:, None])
+        cols = slice(s - 1, e - 1)
+        out["interest"][:, cols] = np.where(valid, interest, out["interest"][:, cols])
+        out["principal"][:, cols] = np.where(valid, principal_paid, out["principal"][:, cols])
+        out["payment"][:, cols] = np.where(valid, interest + principal_paid, out["payment"][:, cols])
+        out["balance"][:, cols] = np.where(valid, np.maximum(bal_prev - principal_paid, 0.0), out["balance"][:, cols])
+        last = np.minimum(N, e - 1) - s   # chỉ số kỳ cuối của đoạn còn trong kỳ hạn
+        end_bal = out["balance"][np.arange(n), s - 1 + np.clip(last, 0, None)]
+        bal = np.where(live & (last >= 0), end_bal, bal)
+    return out
+
+@metrics.timed("structured_arrays", size=lambda r, *a, **k: {"loans": len(r["months"]), "months": int(r["months"].sum())})
+def structured_arrays(principal, months, rates, method=METHOD_ANNUITY, grace_months=0):
+    """
+    Lịch trả nợ nhiều khoản vay với lãi suất theo kỳ, phương thức trả và ân hạn gốc.
+      rates: %/năm — scalar, (n_loans,) hoặc ma trận (n_loans, max_months) theo kỳ (xem step_rates)
+      method: "annuity" | "equal_principal" hoặc mảng bool (n_loans,) True = trả gốc đều
+      grace_months: số kỳ đầu chỉ trả lãi (scalar hoặc theo khoản)
+    Trả về dict như amortization_arrays, thêm loan_principal, grace, equal_principal, rate
+    để reprice_tail/reprice_book tính lại phần đuôi tại chỗ.
+    """
+    P, _, N = _loan_arrays(principal, 0, months)
+    n = len(P)
+    M = int(N.max()) if n else 0
+    rates = np.asarray(rates, dtype=float)
+    if rates.ndim < 2:
+        rates = step_rates(np.broadcast_to(rates, (n,)), N, n_loans=n)
+    else:
+        rates = np.array(np.broadcast_to(rates[:, :M], (n, M)))
+    if isinstance(method, str):
+        eq = np.full(n, method == METHOD_EQUAL_PRINCIPAL)
+    else:
+        eq = np.broadcast_to(np.asarray(method, dtype=bool), (n,)).copy()
+    G = np.clip(np.broadcast_to(np.asarray(grace_months, dtype=np.int64), (n,)), 0, np.maximum(N - 1, 0))
+    out = {
+        "month": np.arange(1, M + 1),
+        "payment": np.zeros((n, M)),
+        "interest": np.zeros((n, M)),
+        "principal": np.zeros((n, M)),
+        "balance": np.zeros((n, M)),
+        "months": N,
+        "loan_principal": P,
+        "grace": G,
+        "equal_principal": eq,
+        "rate": rates,
+    }
+    return _amortize_tail(out, 1)
+
+def reprice_tail(arrays, start_month, new_rate_percent=None):
+    """
+    Điều chỉnh lãi suất từ kỳ start_month (scalar hoặc theo khoản) và tính lại chỉ các kỳ từ đó.
+    new_rate_percent: lãi suất mới áp dụng đến hết kỳ hạn (scalar/(n_loans,)); None = giữ ma trận
+    arrays["rate"] hiện có (đã được sửa trước đó). Sửa arrays tại chỗ và trả về chính nó.
+    """
+    rates = arrays["rate"]
+    n, M = rates.shape
+    start = np.maximum(np.broadcast_to(np.asarray(start_month, dtype=np.int64), (n,)), 1)
+    if new_rate_percent is not None and n:
+        s0 = int(start.min())
+        if s0 <= M:
+            k = np.arange(s0, M + 1)[None, :]
+            new = np.broadcast_to(np.asarray(new_rate_percent, dtype=float), (n,))[:, None]
+            rates[:, s0 - 1:] = np.where(k >= start[:, None], new, rates[:, s0 - 1:])
+    return _amortize_tail(arrays, start)
+
+def next_reset_month(as_of_month, reset_every, first_reset=1):
+    """Kỳ điều chỉnh lãi suất đầu tiên >= as_of_month, với chu kỳ reset_every tháng kể từ first_reset."""
+    as_of = np.asarray(as_of_month, dtype=np.int64)
+    every = np.maximum(np.asarray(reset_every, dtype=np.int64), 1)
+    first = np.asarray(first_reset, dtype=np.int64)
+    return first + -(-np.maximum(as_of - first, 0) // every) * every
+
+@metrics.timed("reprice_book", size=lambda r, *a, **k: {"loans": len(r["months"])})
+def reprice_book(arrays, rate_delta, as_of_month, reset_every, first_reset=1):
+    """
+    Lãi suất cơ sở đổi rate_delta điểm % tại kỳ as_of_month: mỗi khoản thả nổi nhận mức mới
+    từ kỳ điều chỉnh kế tiếp của nó (next_reset_month), các kỳ trước đó giữ nguyên.
+    Sửa arrays (kết quả structured_arrays) tại chỗ.
+    """
+    rates = arrays["rate"]
+    n, M = rates.shape
+    start = np.broadcast_to(next_reset_month(as_of_month, reset_every, first_reset), (n,))
+    s0 = int(start.min()) if n else M + 1
+    if s0 <= M:
+        k = np.arange(s0, M + 1)[None, :]
+        rates[:, s0 - 1:] += np.where(k >= start[:, None], rate_delta, 0.0)
+    return _amortize_tail(arrays, start)
+
+# ======================================================
+# Kiểm tra sức chịu đựng (stress test): DSR/LTV trên cả lưới kịch bản, một lượt vectorized
+# ======================================================
+DEFAULT_DSR_CAP = 60.0
+DEFAULT_LTV_CAP = 70.0
+DEFAULT_RATE_SHOCKS = np.arange(0.0, 5.01, 0.25)              # +0 .. +5 điểm %
+DEFAULT_TERMS = np.array([12, 24, 36, 60, 84, 120, 180, 240, 300, 360])
+DEFAULT_INCOME_SHOCKS = np.arange(0.0, 0.46, 0.05)            # thu nhập giảm 0% .. 45%
+DEFAULT_HAIRCUTS = np.array([0.0, 0.1, 0.2, 0.3, 0.4])        # giảm giá trị TSĐB
+
+def stress_grid(principal, base_rate_percent, monthly_income, collateral_value,
+                rate_shocks=None, terms=None, income_shocks=None, haircuts=None,
+                dsr_cap=DEFAULT_DSR_CAP, ltv_cap=DEFAULT_LTV_CAP):
+    """
+    Tính DSR/LTV cho mọi tổ hợp (cú sốc lãi suất x thời hạn x giảm thu nhập x haircut TSĐB).
+    Trả về dict:
+      - rate_shocks, terms, income_shocks, haircuts: các trục của lưới
+      - payment: (R, T) khoản trả hàng tháng
+      - dsr: (R, T, I) %, inf nếu thu nhập sau sốc <= 0
+      - ltv: (H,) %, inf nếu giá trị TSĐB sau haircut <= 0
+      - passes: (R, T, I, H) bool, đạt cả hai ngưỡng dsr_cap và ltv_cap
+      - max_rate_shock: (T, I, H) cú sốc lãi suất lớn nhất vẫn đạt (NaN nếu không kịch bản nào đạt)
+    """
+    R = np.asarray(DEFAULT_RATE_SHOCKS if rate_shocks is None else rate_shocks, dtype=float)
+    T = np.asarray(DEFAULT_TERMS if terms is None else terms, dtype=np.int64)
+    I = np.asarray(DEFAULT_INCOME_SHOCKS if income_shocks is None else income_shocks, dtype=float)
+    H = np.asarray(DEFAULT_HAIRCUTS if haircuts is None else haircuts, dtype=float)
+    principal = float(principal or 0)
+
+    payment = annuity_payment(principal, float(base_rate_percent or 0) + R[:, None], T[None, :]).reshape(len(R), len(T))
+    income = float(monthly_income or 0) * (1.0 - I)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dsr = np.where(income > 0, payment[:, :, None] / income * 100.0, np.inf)
+        coll = float(collateral_value or 0) * (1.0 - H)
+        ltv = np.where(coll > 0, principal / coll * 100.0, np.inf)
+    if principal <= 0:
+        dsr = np.zeros_like(dsr)
+        ltv = np.zeros_like(ltv)
+
+    passes = (dsr <= dsr_cap)[:, :, :, None] & (ltv <= ltv_cap)[None, None, None, :]
+    # DSR tăng theo lãi suất: kịch bản đạt cuối cùng dọc trục lãi suất là ranh giới đạt/không đạt
+    any_pass = passes.any(axis=0)
+    last = len(R) - 1 - np.argmax(passes[::-1], axis=0)
+    max_rate_shock = np.where(any_pass, R[last], np.nan)
+
+    return {
+        "rate_shocks": R,
+        "terms": T,
+        "income_shocks": I,
+        "haircuts": H,
+        "payment": payment,
+        "dsr": dsr,
+        "ltv": ltv,
+        "passes": passes,
+        "max_rate_shock": max_rate_shock,
+        "dsr_cap": dsr_cap,
+        "ltv_cap": ltv_cap,
+    }
+
+# ======================================================
+# Giải ngược: số tiền vay tối đa theo DSR / thu nhập còn lại / LTV / nhu cầu
+# ======================================================
+# Khoản trả lớn nhất của khoản vay P là tuyến tính theo P, nên mỗi ràng buộc về khoản trả
+# (A_max) cho ngay P_max = A_max / f(r, N):
+#   annuity (sau ân hạn G kỳ):   f = r / (1 - (1+r)^-(N-G))      (r = 0: 1/(N-G))
+#   gốc đều (kỳ đầu sau ân hạn): f = 1/(N-G) + r
+# Trong ân hạn chỉ trả lãi P*r <= f nên không phải ràng buộc chặt.
+MAX_LOAN_CONSTRAINTS = ("dsr", "surplus", "ltv", "need")
+
+def payment_factor(annual_rate_percent, months, method=METHOD_ANNUITY, grace_months=0):
+    """
+    Khoản trả lớn nhất trên mỗi đồng tiền vay (vectorized theo lãi suất/kỳ hạn).
+    Kỳ hạn không còn kỳ trả gốc nào (grace_months >= months) -> inf: không cho vay được.
+    """
+    grace = np.asarray(grace_months, dtype=float)
+    if np.any(grace < 0):
+        raise ValueError(f"grace_months phải >= 0: {grace_months}")
+    r = np.asarray(annual_rate_percent, dtype=float) / 100.0 / 12.0
+    n = np.maximum(np.asarray(months, dtype=float) - grace, 0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if method == METHOD_EQUAL_PRINCIPAL:
+            f = 1.0 / n + r
+        else:
+            f = np.where(r == 0, 1.0 / n, r / (1.0 - np.power(1.0 + r, -n)))
+    return np.where(n > 0, f, np.inf)
+
+def max_loan(monthly_income, monthly_costs, collateral_value, annual_rate_percent, terms=None,
+             method=METHOD_ANNUITY, grace_months=0, dsr_cap=DEFAULT_DSR_CAP, ltv_cap=DEFAULT_LTV_CAP,
+             need=None):
+    """
+    Số tiền vay tối đa cho từng kỳ hạn trong một lượt, không lặp.
+      - dsr: khoản trả <= dsr_cap% thu nhập hàng tháng (cùng định nghĩa DSR với summary)
+      - surplus: khoản trả <= thu nhập - chi phí hàng tháng
+      - ltv: tiền vay <= ltv_cap% giá trị TSĐB (không phụ thuộc kỳ hạn)
+      - need: tiền vay <= nhu cầu vốn (nếu truyền vào)
+    collateral_value=None: khoản vay tín chấp, không xét LTV.
+    annual_rate_percent có thể là mảng broadcast được với terms.
+    Trả về dict: terms, limits {ràng buộc: (T,)}, max_amount (T,), binding (T,) tên ràng buộc chặt
+    nhất, payment (T,) khoản trả lớn nhất ở mức tối đa. Kỳ hạn không dài hơn thời gian ân hạn
+    có max_amount = payment = 0.
+    """
+    T = np.asarray(DEFAULT_TERMS if terms is None else terms, dtype=np.int64)
+    f = payment_factor(annual_rate_percent, T, method, grace_months)
+    income = max(float(monthly_income or 0), 0.0)
+    surplus = max(income - float(monthly_costs or 0), 0.0)
+    shape = np.broadcast(f, T).shape
+
+    limits = {
+        "dsr": np.broadcast_to(income * dsr_cap / 100.0 / f, shape),
+        "surplus": np.broadcast_to(surplus / f, shape),
+        "ltv": np.full(shape, np.inf if collateral_value is None else max(float(collateral_value), 0.0) * ltv_cap / 100.0),
+        "need": np.full(shape, np.inf if need is None else max(float(need), 0.0)),
+    }
+    stacked = np.stack([limits[c] for c in MAX_LOAN_CONSTRAINTS])
+    idx = np.argmin(stacked, axis=0)
+    max_amount = np.take_along_axis(stacked, idx[None], axis=0)[0]
+    return {
+        "terms": T,
+        "limits": limits,
+        "max_amount": max_amount,
+        "binding": np.asarray(MAX_LOAN_CONSTRAINTS)[idx],
+        "payment": max_amount * np.where(np.isfinite(f), f, 0.0),   # 0 * inf -> nan
+        "method": method,
+    }
+
+# ======================================================
+# Tính lại tăng dần: lịch trả nợ chỉ phụ thuộc (tiền vay, lãi suất, thời hạn);
+# summary DSR/LTV phụ thuộc thêm thu nhập và giá trị TSĐB.
+# ======================================================
+def schedule_inputs(data):
+    finance = data.get("finance", {}) or {}
     principal = finance.get("so_tien_vay") or finance.get("tong_nhu_cau") or 0
     rate = finance.get("lai_suat_p_a") if finance.get("lai_suat_p_a") is not None else 8.5
     months = int(finance.get("thoi_han_thang") or 0)
+    return (principal, rate, months)
 
-    schedule = amortization_schedule(principal, rate, months)
+def summary_inputs(data):
+    income = data.get("income", {}) or {}
+    collateral = data.get("collateral", []) or []
+    return schedule_inputs(data) + (
+        income.get("thu_nhap_hang_thang") or 0,
+        tuple(c.get("gia_tri") or 0 for c in collateral),
+    )
 
+def loan_summary(schedule, principal, monthly_income, coll_values):
+    """DSR/LTV của một hồ sơ từ lịch trả nợ (khoản trả = kỳ đầu); dùng chung cho app và API."""
     monthly_debt_service = float(schedule["payment"].iloc[0]) if (not schedule.empty) else 0.0
     annual_ds = monthly_debt_service * 12.0
-    annual_income = float(income.get("thu_nhap_hang_thang") or 0) * 12.0
+    annual_income = float(monthly_income) * 12.0
     dsr = (annual_ds / annual_income * 100.0) if annual_income > 0 else None
 
-    coll_value = sum([c.get("gia_tri") or 0 for c in collateral])
+    coll_value = sum(coll_values)
     ltv = (principal / coll_value * 100.0) if coll_value > 0 else None
 
-    summary = {
+    return {
         "monthly_payment": monthly_debt_service,
         "dsr_percent": dsr,
         "ltv_percent": ltv,
@@ -82,13 +467,46 @@ def recalc_all(session_state):
         "annual_income": annual_income
     }
 
-    # populate into session_state consistently (works for both dict and streamlit's session_state)
+class RecalcModel:
+    """Giữ schedule/summary đã tính; lưu trong session_state để sống qua các lần rerun."""
+
+    def __init__(self):
+        self.schedule = Derived("schedule", schedule_inputs, amortization_schedule)
+        self.summary = Derived("summary", summary_inputs, self._compute_summary)
+
+    def _compute_summary(self, principal, rate, months, monthly_income, coll_values):
+        schedule = self.schedule.get_for((principal, rate, months))
+        return loan_summary(schedule, principal, monthly_income, coll_values)
+
+def _state_get(session_state, key):
+    if isinstance(session_state, dict):
+        return session_state.get(key)
+    return getattr(session_state, key, None)
+
+def _state_set(session_state, key, value):
+    # works for both dict and streamlit's session_state
     try:
-        session_state["summary"] = summary
+        session_state[key] = value
     except Exception:
         try:
-            session_state.summary = summary
+            setattr(session_state, key, value)
         except:
             pass
 
+@metrics.timed("recalc_all")
+def recalc_all(session_state):
+    """
+    session_state: st.session_state-like dict/object with key 'data'
+    Return: schedule DataFrame and populate session_state['summary']
+    Lịch trả nợ và summary được nhớ trong session_state['recalc_model'] và chỉ tính lại
+    khi input của chúng đổi; DataFrame trả về được dùng chung, không sửa tại chỗ.
+    """
+    data = _state_get(session_state, "data") or {}
+    model = _state_get(session_state, "recalc_model")
+    if model is None:
+        model = RecalcModel()
+        _state_set(session_state, "recalc_model", model)
+
+    schedule = model.schedule.get(data)
+    _state_set(session_state, "summary", model.summary.get(data))
     return schedule
@@ -0,0 +1,114 @@
+# src/logic/parse_cache.py
+"""
+Cache kết quả parse hồ sơ theo nội dung file (content-addressed).
+
+Khoá = SHA-256(phiên bản parser + bytes của file), nên cùng một file tải lên lại
+(ở bất kỳ session nào) trả kết quả ngay; đổi parser thì tăng version để bỏ cache cũ.
+Giữ trong bộ nhớ với LRU, tuỳ chọn ghi thêm ra đĩa (mỗi khoá một file JSON).
+
+App Streamlit và HTTP API cùng dùng shared_parse_cache(): cùng parser, cùng version,
+nên cùng khoá — file đã parse ở một bên được bên kia lấy lại từ CADAP_PARSE_CACHE_DIR.
+"""
+import copy
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+class ParseCache:
+    def __init__(self, parse_fn, version, max_entries=256, disk_dir=None):
+        """
+        parse_fn: hàm nhận file-like (.docx) và trả về dict dữ liệu hồ sơ
+        version: chuỗi phiên bản parser, là một phần của khoá
+        disk_dir: thư mục cache trên đĩa (None = chỉ dùng bộ nhớ)
+        """
+        self.parse_fn = parse_fn
+        self.version = str(version)
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, content):
+        h = hashlib.sha256(self.version.encode("utf-8") + b"\0")
+        h.update(content)
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".json")
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key]
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._put_mem(key, data)
+            return data
+        return None
+
+    def _put_mem(self, key, data):
+        with self._lock:
+            self._mem[key] = data
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def _put(self, key, data):
+        self._put_mem(key, data)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # ghi file tạm rồi rename: nhiều worker cùng ghi một khoá vẫn an toàn
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, path)
+
+    def get_or_parse(self, content, key=None):
+        """
+        content: bytes của file .docx. Trả về (key, data); data là bản sao,
+        người gọi được phép sửa mà không làm bẩn cache.
+        """
+        key = key or self.key(content)
+        data = self._get(key)
+        if data is None:
+            self.misses += 1
+            data = self.parse_fn(io.BytesIO(content))
+            self._put(key, data)
+        else:
+            self.hits += 1
+        return key, copy.deepcopy(data)
+
+    def lookup(self, key):
+        """Bản sao kết quả đã cache cho khoá (không parse); None nếu chưa có. Dùng khi parse chạy ở nơi khác (process pool)."""
+        data = self._get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(data)
+
+    def store(self, key, data):
+        self._put(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+
+def shared_parse_cache(disk_dir=None, **kwargs):
+    """ParseCache của parser_docx.parse_docx_streamlit với PARSER_VERSION của nó (app và API dùng chung)."""
+    from src.logic.parser_docx import PARSER_VERSION, parse_docx_streamlit
+    return ParseCache(parse_docx_streamlit, PARSER_VERSION, disk_dir=disk_dir, **kwargs)
@@ -1,6 +1,11 @@
 # src/logic/parser_docx.py
 import re
-from docx import Document
+
+from src.logic.docx_stream import blocks_to_lines, iter_docx_blocks
+from src.monitoring import metrics
+
+# tăng mỗi khi đổi logic parse: là một phần khoá của ParseCache
+PARSER_VERSION = "8"
 
 def parse_vnd_number(s):
     """Chuyển chuỗi có dấu '.' hoặc ',' thành int (VND)."""
@@ -17,20 +22,320 @@ def first_group(pattern, text, flags=0):
     m = re.search(pattern, text, flags)
     return m.group(1).strip() if m else None
 
+# ======================================================
+# Tách TSĐB: một lượt qua các khối (đoạn văn + hàng bảng), O(kích thước tài liệu).
+# Mỗi tài sản là một đoạn KHÔNG chồng lấn: bắt đầu ở dòng nhãn "Tài sản bảo đảm 1: ..."
+# (hoặc dòng liệt kê "1. Quyền sử dụng đất ..." trong mục TSĐB), kết thúc ở tài sản kế tiếp /
+# đề mục mới (La Mã, số "3. ...", chữ "b) ...") / bảng. Nhiều dòng giá trị dưới cùng một tài sản
+# (định giá, thị trường, ...) chỉ giữ một giá trị: dòng "định giá", nếu không có thì dòng đầu.
+# Bảng có cột giá trị (+ cột tài sản/mô tả, hoặc nằm trong mục TSĐB) được đọc từng hàng, mỗi hàng một tài sản. Cuối cùng gộp trùng theo số giấy chứng nhận, hoặc
+# (địa chỉ, giá trị), để một tài sản khai ở cả văn bản lẫn bảng chỉ được tính một lần.
+# ======================================================
+_SECTION_RE = re.compile(r"^\s*[IVXLC]+[\.\)]\s+\S")
+# đề mục đánh số/chữ không có dấu ":" ("3. Tài sản bảo đảm", "3.1. Nguồn trả nợ", "b) Đánh giá")
+_NUMBERED_HEADING_RE = re.compile(r"^\s*(?:\d+(?:\.\d+)*|[a-zđ])[\.\)]\s+([^:]{2,80})$", re.IGNORECASE)
+# chi tiết của một tài sản được liệt kê đánh số trong mục TSĐB, không phải đề mục
+_ASSET_DETAIL_RE = re.compile(
+    r"giá trị|định giá|địa chỉ|vị trí|tọa lạc|toạ lạc|giấy|gcn|sổ đỏ|sổ hồng|diện tích|thửa|biển số|số khung",
+    re.IGNORECASE,
+)
+_COLL_SECTION_RE = re.compile(r"tài sản (?:bảo đảm|thế chấp|cầm cố)|\btsđb\b", re.IGNORECASE)
+_ASSET_START_RE = re.compile(
+    r"^\s*(?:[\-\+•]\s*|\d+[\.\)]\s*|[a-z][\.\)]\s*)?"
+    r"(?:tài sản(?: bảo đảm| thế chấp| cầm cố)?|tsđb|bất động sản)\s*(?:(?:số|thứ)\s*)?\d*\s*[:\-–]",
+    re.IGNORECASE,
+)
+_VALUE_RE = re.compile(r"(\d{1,3}(?:[\.,\s]\d{3})+|\d+)\s*(?:đồng|vnđ|vnd|đ\b)", re.IGNORECASE)
+# "2 tỷ đồng", "1,5 tỷ", "1 tỷ 200 triệu", "800 triệu đồng"
+_UNIT_VALUE_RE = re.compile(r"(\d+(?:[\.,]\d+)?)\s*(tỷ|triệu)", re.IGNORECASE)
+_UNITS = {"tỷ": 1_000_000_000, "triệu": 1_000_000}
+_VALUE_LABEL_RE = re.compile(r"giá trị|định giá", re.IGNORECASE)
+_APPRAISAL_RE = re.compile(r"định giá", re.IGNORECASE)
+# dòng liệt kê một tài sản trong mục TSĐB: "1. Quyền sử dụng đất ...", "b) Xe ô tô ..."
+_ASSET_ITEM_RE = re.compile(r"^\s*(?:\d+|[a-zđ])[\.\)]\s+\S", re.IGNORECASE)
+_TOTAL_RE = re.compile(r"^\s*(?:tổng|cộng)", re.IGNORECASE)
+_ADDR_RE = re.compile(r"(?:địa chỉ|vị trí|tọa lạc|toạ lạc)\s*(?:tài sản)?\s*[:\-]\s*(.+)", re.IGNORECASE)
+_DOC_RE = re.compile(r"(?:giấy chứng nhận|gcn|sổ đỏ|sổ hồng|giấy tờ|đăng ký xe)[^:]*[:\-]\s*(.+)", re.IGNORECASE)
+
+# nhận diện cột của bảng TSĐB theo tiêu đề
+_COLUMN_KEYS = (
+    ("gia_tri", re.compile(r"giá trị|định giá|thành tiền", re.IGNORECASE)),
+    ("dia_chi", re.compile(r"địa chỉ|vị trí", re.IGNORECASE)),
+    ("giay_to", re.compile(r"giấy|gcn|hồ sơ pháp lý|số hiệu", re.IGNORECASE)),
+    ("loai", re.compile(r"tài sản|loại|mô tả|tên", re.IGNORECASE)),
+)
+
+def _asset_type(text):
+    low = text.lower()
+    if any(k in low for k in ("bất động sản", "quyền sử dụng đất", "nhà", "căn hộ", "đất")):
+        return "Bất động sản"
+    if any(k in low for k in ("ô tô", "xe ", "phương tiện", "tàu")):
+        return "Phương tiện vận tải"
+    if any(k in low for k in ("sổ tiết kiệm", "giấy tờ có giá", "trái phiếu", "chứng chỉ tiền gửi")):
+        return "Giấy tờ có giá"
+    return "Tài sản"
+
+def _is_heading(line):
+    """Đề mục mở/đóng một mục: La Mã, hoặc đánh số/chữ không phải dòng mô tả tài sản."""
+    if _SECTION_RE.match(line):
+        return True
+    m = _NUMBERED_HEADING_RE.match(line)
+    if m is None:
+        return False
+    title = m.group(1)
+    if _COLL_SECTION_RE.search(title):
+        return True
+    # "1. Quyền sử dụng đất tại ..." trong mục TSĐB là một tài sản, không phải đề mục mới
+    return not _VALUE_RE.search(title) and not _ASSET_DETAIL_RE.search(title) and _asset_type(title) == "Tài sản"
+
+def _unit_number(s):
+    # "1.500" = 1500 (phân cách nghìn), "1,5" / "2.5" = số thập phân
+    head, _sep, tail = s.replace(",", ".").partition(".")
+    return float(head + tail) if len(tail) == 3 else float(head + "." + (tail or "0"))
+
+def _parse_value(text):
+    """Giá trị VND trong dòng: "2.000.000.000 đồng" hoặc "2 tỷ", "1 tỷ 200 triệu đồng"; 0 nếu không có."""
+    units = _UNIT_VALUE_RE.findall(text)
+    if units:
+        return int(round(sum(_unit_number(n) * _UNITS[u.lower()] for n, u in units)))
+    m = _VALUE_RE.search(text)
+    return parse_vnd_number(m.group(1)) if m else 0
+
+def _new_asset(loai=""):
+    return {"loai": loai, "gia_tri": 0, "dia_chi": "", "ltv_percent": 0.0, "giay_to": ""}
+
+def _table_columns(cells):
+    """Ánh xạ chỉ số cột -> trường nếu hàng này là tiêu đề bảng TSĐB, ngược lại None."""
+    cols = {}
+    for i, cell in enumerate(cells):
+        for key, rx in _COLUMN_KEYS:
+            if key not in cols.values() and rx.search(cell):
+                cols[i] = key
+                break
+    return cols if "gia_tri" in cols.values() else None
+
+def _norm_key(text):
+    return re.sub(r"[\W_]+", "", (text or "").lower())
+
+def dedupe_collateral(assets):
+    """Gộp tài sản trùng (cùng số giấy tờ, hoặc cùng địa chỉ + giá trị); bản đầu giữ vị trí, điền trường còn thiếu."""
+    out, index = [], {}
+    for a in assets:
+        keys = []
+        if a["giay_to"]:
+            keys.append(("doc", _norm_key(a["giay_to"])))
+        if a["dia_chi"] and a["gia_tri"]:
+            keys.append(("addr", _norm_key(a["dia_chi"]), a["gia_tri"]))
+        hit = next((index[k] for k in keys if k in index), None)
+        if hit is None:
+            hit = len(out)
+            out.append(dict(a))
+        else:
+            for field, value in a.items():
+                if value and not out[hit][field]:
+                    out[hit][field] = value
+        for k in keys:
+            index.setdefault(k, hit)
+    return out
+
+def segment_collateral(blocks):
+    """
+    blocks: iterable các ("p", text) / ("row", [cells]) như iter_docx_blocks.
+    Trả về list TSĐB {loai, gia_tri, dia_chi, ltv_percent, giay_to}, mỗi tài sản một lần.
+    """
+    assets = []
+    current = None        # tài sản đang mở (từ văn bản)
+    in_section = False    # đang trong mục "TÀI SẢN BẢO ĐẢM"
+    columns = None        # ánh xạ cột của bảng TSĐB đang đọc
+    in_table = False
+    valued = None         # None / "other" / "appraisal": dòng giá trị đã gặp của tài sản đang mở
+
+    def close():
+        nonlocal current, valued
+        # tài sản có dòng giá trị nhưng không đọc được số vẫn được ghi (gia_tri = 0)
+        if current is not None and (valued or current["dia_chi"] or current["giay_to"]):
+            assets.append(current)
+        current, valued = None, None
+
+    def open_asset(line):
+        nonlocal current
+        close()
+        current = _new_asset(_asset_type(line))
+
+    def set_value(line):
+        nonlocal valued
+        kind = "appraisal" if _APPRAISAL_RE.search(line) else "other"
+        # giữ giá trị đầu tiên; dòng "định giá" thay được giá trị không phải định giá
+        if valued is None or (kind == "appraisal" and valued != "appraisal"):
+            current["gia_tri"] = _parse_value(line)
+            valued = kind
+
+    for kind, payload in blocks:
+        if kind == "row":
+            close()
+            cells = [c.strip() for c in payload]
+            if not in_table:
+                in_table, columns = True, None
+            header = _table_columns(cells)
+            if header is not None and not any(_VALUE_RE.search(c) for c in cells):
+                # bảng TSĐB: có cột giá trị và cột mô tả tài sản, hoặc nằm trong mục TSĐB
+                columns = header if ("loai" in header.values() or in_section) else None
+                continue
+            if columns is None or any(_TOTAL_RE.match(c) for c in cells):
+                continue
+            asset = _new_asset(_asset_type(" ".join(cells)))
+            for i, key in columns.items():
+                if i >= len(cells) or key == "loai":
+                    continue
+                if key == "gia_tri":
+                    # ô giá trị thường chỉ có số, đơn vị nằm ở tiêu đề cột
+                    asset[key] = _parse_value(cells[i]) or parse_vnd_number(cells[i])
+                else:
+                    asset[key] = cells[i]
+            if asset["gia_tri"]:
+                assets.append(asset)
+            continue
+
+        in_table, columns = False, None
+        for line in payload.split("\n"):
+            if not line.strip():
+                continue
+            if _is_heading(line):
+                close()
+                in_section = bool(_COLL_SECTION_RE.search(line))
+                continue
+            if _ASSET_START_RE.match(line):
+                open_asset(line)
+                in_section = True
+                # "Tài sản 1: nhà đất tại ..., giá trị 2 tỷ" trên cùng một dòng
+                if _VALUE_LABEL_RE.search(line):
+                    set_value(line)
+                continue
+            if not in_section:
+                continue
+            is_value = _VALUE_LABEL_RE.search(line) and not _TOTAL_RE.match(line)
+            if _ASSET_ITEM_RE.match(line) and _asset_type(line) != "Tài sản":
+                # "1. Quyền sử dụng đất tại ..." liệt kê một tài sản mới
+                open_asset(line)
+                if is_value:
+                    set_value(line)
+                continue
+            if is_value:
+                if current is None:
+                    # mục TSĐB không có dòng nhãn: dòng giá trị đầu tiên mở tài sản
+                    open_asset(line)
+                set_value(line)
+                continue
+            if current is None:
+                continue
+            m = _ADDR_RE.search(line)
+            if m and not current["dia_chi"]:
+                current["dia_chi"] = m.group(1).strip()
+                continue
+            m = _DOC_RE.search(line)
+            if m and not current["giay_to"]:
+                current["giay_to"] = m.group(1).strip()
+    close()
+    return dedupe_collateral(assets)
+
 def find_collateral_blocks(lines):
     """
-    Trả về list các dòng hoặc block chứa thông tin TSĐB.
-    Heuristic: tìm các dòng có 'Tài sản' / 'Bất động sản' / 'Giá trị' / 'Tài sản bảo đảm'
+    Trả về list text các đoạn TSĐB không chồng lấn (mỗi tài sản một đoạn), theo cùng quy tắc
+    tách đoạn với segment_collateral. Giữ cho code cũ; parser dùng segment_collateral.
+    """
+    sections, current = [], None
+    for line in lines:
+        if _SECTION_RE.match(line) or _ASSET_START_RE.match(line):
+            if current:
+                sections.append(" ".join(current))
+            current = [line] if _ASSET_START_RE.match(line) else None
+        elif current is not None:
+            current.append(line)
+    if current:
+        sections.append(" ".join(current))
+    return sections
+
+# ======================================================
+# Bảng khai báo trường: mỗi trường có chuỗi pattern fallback (ưu tiên từ trái sang phải),
+# tất cả được compile một lần ở module level và chỉ áp dụng trên từng dòng.
+# Thêm trường mới = thêm một dòng vào FIELD_SPECS, không thêm lượt quét toàn văn bản.
+# ======================================================
+def _rate(s):
+    return float(s.replace(",", "."))
+
+def _months(s):
+    return int(s)
+
+def _text(s):
+    return s.strip()
+
+FIELD_SPECS = [
+    # (key, labels kích hoạt, patterns fallback, hàm chuyển đổi)
+    ("ten", ["Họ và tên"], [
+        r"Họ và tên[:\s]*([A-Za-zÀ-ỹ0-9\.\-\s]+)",
+        r"^Họ và tên\s*[:\-]\s*(.+)",
+        r"\d+\.\s*Họ và tên[:\s]*(.+)",
+    ], _text),
+    ("cccd", ["CCCD", "CMND"], [r"(?:CCCD|CMND|Số CMND|Số CCCD)[:\s]*([0-9]{9,12})"], _text),
+    ("phone", ["Điện thoại", "ĐT", "Phone"], [r"(?:Số điện thoại|Điện thoại|ĐT|Phone)[:\s]*([\d\+\-\s]{7,20})"], _text),
+    ("dia_chi", ["Nơi cư trú", "Địa chỉ", "Đ/c"], [r"(?:Nơi cư trú|Địa chỉ|Đ/c|Địa chỉ hiện tại)[:\s]*(.+)"], _text),
+    ("email", ["Email"], [r"Email[:\s]*([^\s,;]+@[^\s,;]+)"], _text),
+    ("muc_dich", ["Mục đích"], [r"Mục đích[:\s]*(.+)"], _text),
+    ("tong_nhu_cau", ["Tổng nhu cầu"], [
+        r"Tổng nhu cầu vốn[:\s]*([0-9\.,\s]+)\s*đồng",
+        r"Tổng nhu cầu[:\s]*([0-9\.,\s]+)\s*đ",
+    ], parse_vnd_number),
+    ("von_doi_ung", ["Vốn đối ứng"], [r"Vốn đối ứng[:\s]*([0-9\.,\s]+)\s*đồng"], parse_vnd_number),
+    ("so_tien_vay", ["Số tiền vay", "Vốn vay"], [
+        r"(?:Số tiền vay|Vốn vay|Vốn vay Agribank)[:\s]*([0-9\.,\s]+)\s*đồng",
+    ], parse_vnd_number),
+    ("lai_suat_p_a", ["Lãi suất"], [r"Lãi suất[:\s]*([0-9\.,]+)\s*%?"], _rate),
+    ("thoi_han_thang", ["Thời hạn"], [r"Thời hạn(?: vay)?[:\s]*([0-9]+)\s*tháng"], _months),
+    ("thu_nhap_hang_thang", ["Thu nhập"], [r"(?:Thu nhập|Tổng thu nhập).*?([0-9\.,\s]+)\s*đồng"], parse_vnd_number),
+    ("chi_phi_hang_thang", ["Chi phí"], [r"(?:Tổng chi phí|Chi phí).*?([0-9\.,\s]+)\s*đồng"], parse_vnd_number),
+]
+
+_COMPILED_SPECS = [
+    (key, [re.compile(p, re.IGNORECASE) for p in patterns], convert)
+    for key, _labels, patterns, convert in FIELD_SPECS
+]
+# một regex duy nhất để loại nhanh các dòng không chứa nhãn nào
+_TRIGGER_RE = re.compile(
+    "|".join(re.escape(l) for _k, labels, _p, _c in FIELD_SPECS for l in labels),
+    re.IGNORECASE,
+)
+
+def extract_fields(lines):
+    """
+    Quét các dòng đúng một lượt, điền mọi trường trong FIELD_SPECS.
+    Với mỗi trường, pattern đứng trước thắng pattern đứng sau; cùng pattern thì dòng đầu tiên thắng.
+    Trả về dict key -> giá trị đã chuyển đổi (chỉ gồm các trường tìm thấy).
     """
-    blocks = []
-    for i, L in enumerate(lines):
-        low = L.lower()
-        if any(k in low for k in ("tài sản", "tài sản bảo đảm", "bất động sản", "giá trị")):
-            # collect a small window of lines to form a block
-            window = " ".join(lines[i:i+6])
-            blocks.append(window)
-    return blocks
+    best = {}  # key -> (priority, value)
+    n_specs = len(_COMPILED_SPECS)
+    for line in lines:
+        if not _TRIGGER_RE.search(line):
+            continue
+        for key, patterns, convert in _COMPILED_SPECS:
+            limit = best[key][0] if key in best else len(patterns)
+            for prio in range(limit):
+                m = patterns[prio].search(line)
+                if not m:
+                    continue
+                raw = m.group(1).strip()
+                if not raw:
+                    # khớp nhãn nhưng không bắt được giá trị: thử pattern sau như parser cũ
+                    continue
+                try:
+                    best[key] = (prio, convert(raw))
+                except ValueError:
+                    continue
+                break
+        if len(best) == n_specs and all(p == 0 for p, _v in best.values()):
+            break
+    return {key: value for key, (_p, value) in best.items()}
 
+@metrics.timed("parse_docx", size=lambda r, *a, **k: {"collateral": len(r["collateral"])})
 def parse_docx_streamlit(uploaded_file):
     """
     Parse docx into a dict with keys:
@@ -40,111 +345,44 @@ def parse_docx_streamlit(uploaded_file):
       - income: {thu_nhap_hang_thang, chi_phi_hang_thang}
     Uses heuristics tuned for PASDV-like documents.
     """
-    doc = Document(uploaded_file)
-    paragraphs = [p.text.strip() for p in doc.paragraphs if p.text and p.text.strip() != ""]
-    text = "\n".join(paragraphs)
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    # đọc streaming word/document.xml: gồm cả đoạn văn và hàng bảng, bỏ qua ảnh/styles
+    with metrics.stage("parse_docx.read") as m:
+        blocks = list(iter_docx_blocks(uploaded_file))
+        lines = blocks_to_lines(blocks)
+        m["blocks"] = len(blocks)
+        m["lines"] = len(lines)
 
-    # Identification
-    identification = {"ten": "", "cccd": "", "dia_chi": "", "phone": "", "email": ""}
+    with metrics.stage("parse_docx.extract_fields", lines=len(lines)):
+        fields = extract_fields(lines)
 
-    # Try several patterns to find name
-    name = first_group(r"Họ và tên[:\s]*([A-Za-zÀ-ỹ0-9\.\-\s]+)", text, flags=re.IGNORECASE)
-    if not name:
-        name = first_group(r"^Họ và tên\s*[:\-]\s*([^\n\r]+)", text, flags=re.IGNORECASE)
-    if not name:
-        # fallback: look for line starting with "1. Họ và tên"
-        name = first_group(r"\d+\.\s*Họ và tên[:\s]*([^\n\r]+)", text, flags=re.IGNORECASE)
-    identification["ten"] = name or ""
-
-    # CCCD / CMND
-    cccd = first_group(r"(?:CCCD|CMND|Số CMND|Số CCCD)[:\s]*([0-9]{9,12})", text, flags=re.IGNORECASE)
-    identification["cccd"] = cccd or ""
-
-    # Phone
-    phone = first_group(r"(?:Số điện thoại|Điện thoại|ĐT|Phone)[:\s]*([\d\+\-\s]{7,20})", text, flags=re.IGNORECASE)
-    identification["phone"] = phone or ""
-
-    # Address
-    addr = first_group(r"(?:Nơi cư trú|Địa chỉ|Đ/c|Địa chỉ hiện tại)[:\s]*([^\n\r]+)", text, flags=re.IGNORECASE)
-    identification["dia_chi"] = addr or ""
-
-    # Email (optional)
-    email = first_group(r"Email[:\s]*([^\s,;]+@[^\s,;]+)", text, flags=re.IGNORECASE)
-    identification["email"] = email or ""
+    # Identification
+    identification = {k: fields.get(k) or "" for k in ("ten", "cccd", "dia_chi", "phone", "email")}
 
     # Finance
     finance = {
-        "muc_dich": "",
-        "tong_nhu_cau": 0,
-        "von_doi_ung": 0,
-        "so_tien_vay": 0,
-        "lai_suat_p_a": 8.5,
-        "thoi_han_thang": 60
+        "muc_dich": fields.get("muc_dich") or "",
+        "tong_nhu_cau": fields.get("tong_nhu_cau") or 0,
+        "von_doi_ung": fields.get("von_doi_ung") or 0,
+        "so_tien_vay": fields.get("so_tien_vay") or 0,
+        "lai_suat_p_a": fields.get("lai_suat_p_a", 8.5),
+        "thoi_han_thang": fields.get("thoi_han_thang", 60)
     }
-
-    # Purpose
-    purpose = first_group(r"Mục đích[:\s]*([^\n\r]+)", text, flags=re.IGNORECASE)
-    finance["muc_dich"] = purpose or finance["muc_dich"]
-
-    # Numbers (attempt several phrasings)
-    tn = first_group(r"Tổng nhu cầu vốn[:\s]*([0-9\.,\s]+)\s*đồng", text, flags=re.IGNORECASE)
-    if not tn:
-        tn = first_group(r"Tổng nhu cầu[:\s]*([0-9\.,\s]+)\s*đ", text, flags=re.IGNORECASE)
-    if tn:
-        finance["tong_nhu_cau"] = parse_vnd_number(tn)
-
-    vo = first_group(r"Vốn đối ứng[:\s]*([0-9\.,\s]+)\s*đồng", text, flags=re.IGNORECASE)
-    if vo:
-        finance["von_doi_ung"] = parse_vnd_number(vo)
-
-    sv = first_group(r"(?:Số tiền vay|Vốn vay|Vốn vay Agribank)[:\s]*([0-9\.,\s]+)\s*đồng", text, flags=re.IGNORECASE)
-    if sv:
-        finance["so_tien_vay"] = parse_vnd_number(sv)
-    else:
+    if "so_tien_vay" not in fields:
         # fallback: if not explicit, use tổng nhu cầu - vốn đối ứng
         if finance["tong_nhu_cau"] and finance["von_doi_ung"]:
             finance["so_tien_vay"] = max(0, finance["tong_nhu_cau"] - finance["von_doi_ung"])
         elif finance["tong_nhu_cau"]:
             finance["so_tien_vay"] = finance["tong_nhu_cau"]
 
-    # Interest rate
-    lai = first_group(r"Lãi suất[:\s]*([0-9\.,]+)\s*%?", text, flags=re.IGNORECASE)
-    if lai:
-        try:
-            finance["lai_suat_p_a"] = float(lai.replace(",", "."))
-        except:
-            finance["lai_suat_p_a"] = finance["lai_suat_p_a"]
-
-    # Term (months)
-    th = first_group(r"Thời hạn(?: vay)?[:\s]*([0-9]+)\s*tháng", text, flags=re.IGNORECASE)
-    if th:
-        try:
-            finance["thoi_han_thang"] = int(th)
-        except:
-            finance["thoi_han_thang"] = finance["thoi_han_thang"]
-
     # Income & cost
-    income = {"thu_nhap_hang_thang": 0, "chi_phi_hang_thang": 0}
-    thu = first_group(r"(?:Thu nhập|Tổng thu nhập).*?([0-9\.,\s]+)\s*đồng", text, flags=re.IGNORECASE)
-    if thu:
-        income["thu_nhap_hang_thang"] = parse_vnd_number(thu)
-    chi = first_group(r"(?:Tổng chi phí|Chi phí).*?([0-9\.,\s]+)\s*đồng", text, flags=re.IGNORECASE)
-    if chi:
-        income["chi_phi_hang_thang"] = parse_vnd_number(chi)
-
-    # Collateral detection (take blocks)
-    collateral = []
-    coll_blocks = find_collateral_blocks(lines)
-    for blk in coll_blocks:
-        # find first numeric value in block
-        val = first_group(r"([0-9\.,\s]+)\s*đồng", blk, flags=re.IGNORECASE)
-        valn = parse_vnd_number(val) if val else 0
-        # try address in block
-        addr_b = first_group(r"Địa chỉ[:\s]*([^\n\r]+)", blk, flags=re.IGNORECASE)
-        # find type mention
-        loai = "Bất động sản" if ("bất động sản" in blk.lower() or "nhà" in blk.lower()) else "Tài sản"
-        collateral.append({"loai": loai, "gia_tri": valn, "dia_chi": addr_b or "", "ltv_percent": 0.0, "giay_to": ""})
+    income = {
+        "thu_nhap_hang_thang": fields.get("thu_nhap_hang_thang") or 0,
+        "chi_phi_hang_thang": fields.get("chi_phi_hang_thang") or 0
+    }
+
+    # Collateral: tách đoạn một lượt, đọc cả bảng TSĐB, mỗi tài sản một bản ghi
+    with metrics.stage("parse_docx.collateral", blocks=len(blocks)):
+        collateral = segment_collateral(blocks)
 
     # ensure at least one collateral record exists
     if not collateral:
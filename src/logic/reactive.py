@@ -0,0 +1,37 @@
+# src/logic/reactive.py
+"""
+Mô hình phụ thuộc tối giản cho các giá trị dẫn xuất trong UI.
+
+Mỗi Derived khai báo hàm lấy input (từ dict dữ liệu hồ sơ) và hàm tính. Giá trị chỉ
+được tính lại khi tuple input khác lần trước, nên gọi nhiều lần trong cùng một rerun
+hoặc sau khi sửa các trường không liên quan đều không tốn chi phí tính toán.
+"""
+
+_UNSET = object()
+
+class Derived:
+    def __init__(self, name, inputs_fn, compute_fn):
+        """
+        inputs_fn(data) -> tuple hashable/so sánh được các input
+        compute_fn(*inputs) -> giá trị dẫn xuất
+        """
+        self.name = name
+        self.inputs_fn = inputs_fn
+        self.compute_fn = compute_fn
+        self.computations = 0
+        self._inputs = _UNSET
+        self._value = None
+
+    def get_for(self, inputs):
+        if inputs != self._inputs:
+            self._value = self.compute_fn(*inputs)
+            self._inputs = inputs
+            self.computations += 1
+        return self._value
+
+    def get(self, data):
+        return self.get_for(self.inputs_fn(data))
+
+    def invalidate(self):
+        self._inputs = _UNSET
+        self._value = None
@@ -0,0 +1,283 @@
+# src/monitoring/metrics.py
+"""
+Đo thời gian/số lần gọi/kích thước đầu vào/chênh lệch bộ nhớ theo từng bước xử lý.
+
+Mặc định TẮT: timed()/stage() chỉ kiểm tra một biến bool rồi gọi thẳng hàm gốc.
+Bật bằng enable() hoặc biến môi trường (xem init_from_env):
+    CADAP_METRICS=1            bật đo
+    CADAP_METRICS_LOG=path     ghi mỗi bước một dòng JSON (mặc định: stderr qua logging)
+    CADAP_METRICS_PORT=9464    phục vụ /metrics dạng Prometheus text
+    CADAP_METRICS_FILE=path    ghi file Prometheus text (textfile collector), mỗi process một file
+    CADAP_METRICS_FILE_INTERVAL=15  số giây tối thiểu giữa hai lần ghi file (luôn ghi thêm lần cuối khi thoát)
+
+    @timed("parse_docx", size=lambda result, *a, **k: {"collateral": len(result["collateral"])})
+    def parse(...): ...
+
+    with stage("render_chart") as m:
+        m["rows"] = len(df)
+
+Worker của ProcessPool (batch report_engine/appraise_cli, HTTP API) đo riêng trong process của nó:
+file textfile được tách theo PID (cadap.prom -> cadap.<pid>.prom, hoặc thay "{pid}" trong đường dẫn)
+và mọi series mang nhãn pid, để node_exporter gộp nhiều file mà không process nào ghi đè process khác.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("cadap.metrics")
+
+_ENABLED = False
+_LOCK = threading.Lock()
+_STATS = {}          # stage -> {"calls", "seconds", "max_seconds", "mem_delta", "sizes": {kind: total}}
+_TEXTFILE = None
+_TEXTFILE_INTERVAL = 15.0
+_NEXT_WRITE = 0.0
+_FLUSH_PID = None    # process đã đăng ký ghi file lần cuối khi thoát
+_SERVER = None
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def enabled():
+    return _ENABLED
+
+def enable(json_log=None, textfile=None, textfile_interval=None):
+    """
+    Bật đo. json_log: đường dẫn file log JSON; textfile: file Prometheus text (tách theo PID,
+    xem textfile_path); textfile_interval: số giây tối thiểu giữa hai lần ghi file.
+    """
+    global _ENABLED, _TEXTFILE, _TEXTFILE_INTERVAL
+    if json_log:
+        handler = logging.FileHandler(json_log, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(logging.INFO)
+    _TEXTFILE = textfile or _TEXTFILE
+    if textfile_interval is not None:
+        _TEXTFILE_INTERVAL = float(textfile_interval)
+    _ENABLED = True
+
+def disable():
+    global _ENABLED
+    _ENABLED = False
+
+def reset():
+    with _LOCK:
+        _STATS.clear()
+
+def init_from_env():
+    """Đọc cấu hình CADAP_METRICS*; gọi nhiều lần vẫn chỉ khởi tạo một lần."""
+    if _ENABLED or os.environ.get("CADAP_METRICS", "").lower() not in ("1", "true", "yes", "on"):
+        return _ENABLED
+    if not os.environ.get("CADAP_METRICS_LOG") and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    interval = os.environ.get("CADAP_METRICS_FILE_INTERVAL")
+    enable(json_log=os.environ.get("CADAP_METRICS_LOG"), textfile=os.environ.get("CADAP_METRICS_FILE"),
+           textfile_interval=float(interval) if interval else None)
+    port = os.environ.get("CADAP_METRICS_PORT")
+    if port:
+        start_http_server(int(port))
+    return True
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def record(name, seconds, mem_delta=0, sizes=None):
+    """Cộng dồn một lần đo và ghi log JSON; file textfile chỉ ghi lại khi đã quá _TEXTFILE_INTERVAL."""
+    global _NEXT_WRITE
+    write = False
+    with _LOCK:
+        st = _STATS.get(name)
+        if st is None:
+            st = _STATS[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "mem_delta": 0, "sizes": {}}
+        st["calls"] += 1
+        st["seconds"] += seconds
+        st["max_seconds"] = max(st["max_seconds"], seconds)
+        st["mem_delta"] += mem_delta
+        for k, v in (sizes or {}).items():
+            st["sizes"][k] = st["sizes"].get(k, 0) + v
+        if _TEXTFILE:
+            now = time.monotonic()
+            if now >= _NEXT_WRITE:
+                _NEXT_WRITE = now + _TEXTFILE_INTERVAL
+                write = True
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"ts": round(time.time(), 3), "stage": name, "seconds": round(seconds, 6),
+                                "mem_delta_bytes": mem_delta, **(sizes or {})}, ensure_ascii=False))
+    if _TEXTFILE:
+        if _FLUSH_PID != os.getpid():
+            _register_flush()
+        if write:
+            flush()
+
+class _NullStage(dict):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class stage(dict):
+    """Context manager đo một bước; gán kích thước đầu vào qua m["rows"] = ..."""
+
+    def __new__(cls, name, **sizes):
+        if not _ENABLED:
+            return _NullStage()
+        return super().__new__(cls)
+
+    def __init__(self, name, **sizes):
+        super().__init__(sizes)
+        self.name = name
+
+    def __enter__(self):
+        self._rss = _rss_bytes()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._t0
+        record(self.name, seconds, _rss_bytes() - self._rss, dict(self))
+        return False
+
+def timed(name, size=None):
+    """
+    Decorator đo hàm. size(result, *args, **kwargs) -> dict kích thước đầu vào/đầu ra (tuỳ chọn).
+    Khi tắt, chi phí chỉ là một lần kiểm tra biến bool.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            rss = _rss_bytes()
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            seconds = time.perf_counter() - t0
+            sizes = None
+            if size is not None:
+                try:
+                    sizes = size(result, *args, **kwargs)
+                except Exception:
+                    sizes = None
+            record(name, seconds, _rss_bytes() - rss, sizes)
+            return result
+        return wrapper
+    return deco
+
+def snapshot():
+    with _LOCK:
+        return {k: {**v, "sizes": dict(v["sizes"])} for k, v in _STATS.items()}
+
+# ======================================================
+# Prometheus text exposition
+# ======================================================
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus(labels=None):
+    """labels: nhãn thêm vào mọi series (vd {"pid": ...} cho file textfile của từng process)."""
+    snap = snapshot()
+    extra = "".join(f'{k}="{_label(v)}",' for k, v in (labels or {}).items())
+    out = [
+        "# HELP cadap_stage_calls_total Số lần chạy mỗi bước xử lý.",
+        "# TYPE cadap_stage_calls_total counter",
+    ]
+    out += [f'cadap_stage_calls_total{{{extra}stage="{_label(k)}"}} {v["calls"]}' for k, v in snap.items()]
+    out += ["# HELP cadap_stage_seconds_total Tổng thời gian (giây) mỗi bước.",
+            "# TYPE cadap_stage_seconds_total counter"]
+    out += [f'cadap_stage_seconds_total{{{extra}stage="{_label(k)}"}} {v["seconds"]:.6f}' for k, v in snap.items()]
+    out += ["# HELP cadap_stage_seconds_max Thời gian lớn nhất (giây) của một lần chạy.",
+            "# TYPE cadap_stage_seconds_max gauge"]
+    out += [f'cadap_stage_seconds_max{{{extra}stage="{_label(k)}"}} {v["max_seconds"]:.6f}' for k, v in snap.items()]
+    out += ["# HELP cadap_stage_memory_delta_bytes_total Tổng chênh lệch RSS (byte) qua các lần chạy.",
+            "# TYPE cadap_stage_memory_delta_bytes_total counter"]
+    out += [f'cadap_stage_memory_delta_bytes_total{{{extra}stage="{_label(k)}"}} {v["mem_delta"]}' for k, v in snap.items()]
+    out += ["# HELP cadap_stage_input_size_total Tổng kích thước đầu vào (đoạn, tháng, dòng...) theo bước.",
+            "# TYPE cadap_stage_input_size_total counter"]
+    out += [
+        f'cadap_stage_input_size_total{{{extra}stage="{_label(k)}",kind="{_label(kind)}"}} {total}'
+        for k, v in snap.items() for kind, total in v["sizes"].items()
+    ]
+    return "\n".join(out) + "\n"
+
+def write_textfile(path, labels=None):
+    """Ghi nguyên tử cho node_exporter textfile collector hoặc scraper đọc file."""
+    d = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(render_prometheus(labels))
+    os.replace(tmp, path)
+
+def textfile_path(pid=None):
+    """File textfile của process: thay "{pid}" trong CADAP_METRICS_FILE, không có thì chèn PID trước đuôi file."""
+    pid = os.getpid() if pid is None else pid
+    if "{pid}" in _TEXTFILE:
+        return _TEXTFILE.replace("{pid}", str(pid))
+    root, ext = os.path.splitext(_TEXTFILE)
+    return f"{root}.{pid}{ext}"
+
+def flush():
+    """Ghi ngay file textfile của process này (gọi tự động theo chu kỳ và khi process thoát)."""
+    if not _TEXTFILE:
+        return
+    try:
+        write_textfile(textfile_path(), {"pid": os.getpid()})
+    except OSError as e:
+        logger.warning("không ghi được metrics textfile: %s", e)
+
+def _register_flush():
+    # worker multiprocessing thoát bằng os._exit nên atexit không chạy: dùng Finalize của multiprocessing
+    global _FLUSH_PID
+    _FLUSH_PID = os.getpid()
+    import multiprocessing
+    if multiprocessing.parent_process() is not None:
+        from multiprocessing import util
+        util.Finalize(None, flush, exitpriority=0)
+    else:
+        atexit.register(flush)
+
+def _after_fork_in_child():
+    # process con đếm từ 0: số liệu của process cha đã nằm trong file của process cha
+    global _LOCK, _NEXT_WRITE
+    _LOCK = threading.Lock()
+    _STATS.clear()
+    _NEXT_WRITE = 0.0
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_http_server(port, addr="127.0.0.1"):
+    """Phục vụ /metrics trong thread nền; gọi lại khi đã chạy thì trả về server hiện có."""
+    global _SERVER
+    with _LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            threading.Thread(target=_SERVER.serve_forever, name="metrics-http", daemon=True).start()
+    return _SERVER
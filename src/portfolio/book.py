@@ -0,0 +1,459 @@
+# src/portfolio/book.py
+"""
+Sổ danh mục cho vay: chỉ số tóm tắt từng khoản vay trong một dataset Arrow chỉ ghi thêm.
+
+recalc_all chỉ cho DSR/LTV của một hồ sơ; ở đây mỗi khoản vay đã thẩm định là một dòng
+(chi nhánh, sản phẩm, ngày thẩm định, tiền vay, lãi suất, thời hạn, thu nhập, giá trị
+TSĐB, khoản trả, DSR, LTV) để xem theo chi nhánh/sản phẩm trên cả danh mục.
+
+Lưu trữ: thư mục các file part-*.arrow (Arrow IPC, không nén). Mỗi lần append ghi một
+part mới (file tạm rồi rename) nên nhiều tiến trình cùng ghi được và không part nào bị
+sửa lại. Khi đọc, các part được memory-map (pa.memory_map): cột là view trên page cache,
+không copy và không qua pandas; part đã mở được giữ lại giữa các truy vấn. Khi số part nhỏ
+(< COMPACT_MAX_ROWS dòng) đạt AUTO_COMPACT_PARTS, append tự gộp chúng thành một part
+(compact(), có file khoá để chỉ một tiến trình gộp tại một thời điểm), nên lưu từng hồ sơ
+một không làm số file tăng mãi.
+
+Truy vấn group-by/phân vị chạy bằng pyarrow.compute, kết quả (vài dòng mỗi nhóm) mới đổi
+sang DataFrame:
+
+    book = PortfolioBook("portfolio/")
+    book.append_dossier(data, branch="HN01", product="mua nhà", loan_id="...")
+    book.summary(by=("branch",))                       # số khoản, tổng tiền vay, DSR/LTV p50/p90
+    book.buckets("ltv_percent", by=("product",))       # phân bố theo nhóm LTV
+    book.runoff(where={"branch": "HN01"}, as_of=date.today())   # dư nợ dự kiến theo tháng
+
+Benchmark 1 triệu khoản vay: python -m benchmarks.portfolio_bench
+"""
+import os
+import threading
+import time
+import uuid
+import warnings
+
+import numpy as np
+
+from src.logic.finance import annuity_payment, summary_inputs
+
+# cột -> kiểu Arrow (alias của pa.type_for_alias); pyarrow chỉ được import khi dùng
+COLUMNS = (
+    ("loan_id", "string"),
+    ("branch", "string"),
+    ("product", "string"),
+    ("appraised_at", "timestamp[s]"),
+    ("so_tien_vay", "double"),
+    ("lai_suat_p_a", "double"),
+    ("thoi_han_thang", "int32"),
+    ("thu_nhap_hang_thang", "double"),
+    ("gia_tri_tsdb", "double"),
+    ("monthly_payment", "double"),
+    ("dsr_percent", "double"),
+    ("ltv_percent", "double"),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+# cận trên (%) của các nhóm; nhóm cuối là ">= cận cuối", khoản không có chỉ số vào "n/a"
+LTV_BUCKETS = (50, 60, 70, 80, 90, 100)
+DSR_BUCKETS = (20, 30, 40, 50, 60, 70)
+
+AUTO_COMPACT_PARTS = 32
+COMPACT_MAX_ROWS = 100_000
+_LOCK_NAME = ".compact.lock"
+_LOCK_STALE_SECONDS = 600   # khoá của compact bị crash giữa chừng
+
+_PART_PREFIX = "part-"
+_PART_SUFFIX = ".arrow"
+_REPLACES_KEY = b"cadap.replaces"
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([(name, pa.type_for_alias(alias)) for name, alias in COLUMNS])
+
+def _to_table(rows):
+    """list[dict] / dict cột / pa.Table -> bảng đúng schema; cột thiếu là null, appraised_at thiếu là lúc ghi."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    schema = _schema()
+    if isinstance(rows, pa.Table):
+        table = rows
+    elif isinstance(rows, dict):
+        table = pa.table(rows)
+    else:
+        table = pa.Table.from_pylist(list(rows))
+    n = table.num_rows
+    arrays = []
+    for field in schema:
+        if field.name in table.column_names:
+            arrays.append(table.column(field.name).cast(field.type, safe=False))
+        else:
+            arrays.append(pa.nulls(n, field.type))
+    i = schema.get_field_index("appraised_at")
+    now = pa.scalar(int(time.time()), schema.field(i).type)
+    arrays[i] = pc.fill_null(arrays[i], now)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def _filter_expression(where):
+    """{cột: giá trị | list/tuple/set giá trị} -> biểu thức AND; pc.Expression được dùng nguyên."""
+    import pyarrow.compute as pc
+    if where is None or isinstance(where, pc.Expression):
+        return where
+    expr = None
+    for col, value in where.items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            cond = pc.field(col).isin(list(value))
+        else:
+            cond = pc.field(col) == value
+        expr = cond if expr is None else expr & cond
+    return expr
+
+def _expression_columns(where):
+    if where is None:
+        return []
+    if isinstance(where, dict):
+        return list(where)
+    return list(COLUMN_NAMES)  # Expression: không biết cột nào được dùng
+
+def _count_all():
+    import pyarrow.compute as pc
+    return pc.CountOptions("all")
+
+def _month_index(d):
+    return d.year * 12 + d.month - 1
+
+def bucket_labels(edges):
+    labels = [f"<{edges[0]}%"]
+    labels += [f"{lo}-{hi}%" for lo, hi in zip(edges[:-1], edges[1:])]
+    labels += [f">={edges[-1]}%", "n/a"]
+    return labels
+
+def _remaining_balance(P, R, N, E, horizon):
+    """
+    Dư nợ sau kỳ E+1..E+horizon của từng khoản (closed-form, chỉ các kỳ còn lại);
+    NaN khi khoản đã tất toán. B_k = P*(1+r)^k - A*((1+r)^k - 1)/r  (r = 0: P - A*k)
+    """
+    r = (R / 1200.0)[:, None]
+    A = annuity_payment(P, R, N)[:, None]
+    k = E[:, None] + np.arange(1, horizon + 1)[None, :]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = np.power(1.0 + r, k)
+        bal = np.where(r == 0, P[:, None] - A * k, P[:, None] * growth - A * (growth - 1.0) / np.where(r == 0, 1.0, r))
+    return np.where(k <= N[:, None], np.maximum(bal, 0.0), np.nan)
+
+def _runoff_totals(P, R, N, E, horizon, rate_chunk=2048):
+    """
+    Tổng dư nợ, tổng thanh toán và số khoản còn dư nợ ở các tháng tới 1..horizon, cho các
+    khoản annuity (P, R %/năm, N kỳ) đã trả E kỳ.
+
+    Với x = 1 + r, A = khoản trả: B(m) = (P - A/r)*x^m + A/r, nên dư nợ sau kỳ E+1+k là
+    C*x^k + D (C = (P - A/r)*x^(E+1), D = A/r). Khoản còn trả ở tháng k+1 khi k < L = N - E:
+    tổng A, D và số khoản là cumsum ngược theo L; tổng C*x^k gom theo từng mức lãi suất,
+    x^k * (tổng C của các khoản có L > k). Chi phí O(số khoản + số mức lãi suất * horizon).
+    """
+    L = N - E
+    k = np.arange(horizon)
+
+    def tail(weights=None, index=L, rows=1):
+        # out[i, k] = tổng weights của các khoản thuộc hàng i có L > k
+        counts = np.bincount(index, weights=weights, minlength=rows * (horizon + 1)).reshape(rows, horizon + 1)
+        return np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:]
+
+    A = annuity_payment(P, R, N)
+    active = np.rint(tail()[0]).astype(np.int64)
+    total_payment = tail(A)[0]
+    r = R / 1200.0
+    zero = r == 0
+    # r = 0: B(E+1+k) = P - A*(E+1) - A*k
+    total_balance = tail(np.where(zero, P - A * (E + 1), 0.0))[0] - k * tail(np.where(zero, A, 0.0))[0]
+
+    nz = ~zero
+    P, A, E, L, r = P[nz], A[nz], E[nz], L[nz], r[nz]
+    D = A / r
+    C = (P - D) * np.power(1.0 + r, E + 1)
+    total_balance += tail(D, L)[0]
+    rates, inverse = np.unique(r, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(0, len(rates) + rate_chunk, rate_chunk))
+    for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if lo == hi:
+            continue
+        sel = order[lo:hi]
+        q = rates[i * rate_chunk:(i + 1) * rate_chunk]
+        per_rate = tail(C[sel], (inverse[sel] - i * rate_chunk) * (horizon + 1) + L[sel], len(q))
+        total_balance += (np.power(1.0 + q[:, None], k[None, :]) * per_rate).sum(axis=0)
+    return np.maximum(total_balance, 0.0), total_payment, active
+
+# ======================================================
+# 1) DATASET
+# ======================================================
+class PortfolioBook:
+    def __init__(self, path, auto_compact=AUTO_COMPACT_PARTS):
+        """auto_compact: số part nhỏ để append tự compact (0/None = không tự gộp)."""
+        self.path = path
+        self.auto_compact = auto_compact
+        self._tables = {}   # tên part -> pa.Table memory-mapped (part không bao giờ bị sửa)
+        self._lock = threading.Lock()
+
+    def _parts(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(f for f in os.listdir(self.path) if f.startswith(_PART_PREFIX) and f.endswith(_PART_SUFFIX))
+
+    def _open(self, name):
+        import pyarrow as pa
+        with self._lock:
+            table = self._tables.get(name)
+        if table is None:
+            source = pa.memory_map(os.path.join(self.path, name), "r")
+            table = pa.ipc.open_file(source).read_all()
+            with self._lock:
+                self._tables[name] = table
+        return table
+
+    @staticmethod
+    def _replaces(table):
+        meta = table.schema.metadata or {}
+        return set(meta[_REPLACES_KEY].decode().split(",")) if _REPLACES_KEY in meta else set()
+
+    def _live_tables(self):
+        """Các part đang hiệu lực (bỏ part đã được một part compact thay thế)."""
+        for _ in range(3):
+            names = self._parts()
+            try:
+                tables = {n: self._open(n) for n in names}
+                break
+            except FileNotFoundError:
+                continue  # compact() vừa xoá part giữa lúc liệt kê và mở: liệt kê lại
+        else:
+            raise RuntimeError(f"không đọc được danh mục (đang compact?): {self.path}")
+        replaced = set()
+        for t in tables.values():
+            replaced |= self._replaces(t)
+        with self._lock:
+            for n in set(self._tables) - set(names):
+                del self._tables[n]
+        return [(n, t) for n, t in tables.items() if n not in replaced]
+
+    def _write_part(self, table, metadata=None):
+        import pyarrow as pa
+        os.makedirs(self.path, exist_ok=True)
+        name = f"{_PART_PREFIX}{time.time_ns():020d}-{os.getpid()}{_PART_SUFFIX}"
+        final = os.path.join(self.path, name)
+        schema = table.schema.with_metadata(metadata) if metadata else table.schema
+        with pa.OSFile(final + ".tmp", "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table.replace_schema_metadata(schema.metadata), max_chunksize=1 << 20)
+        os.replace(final + ".tmp", final)
+        return name
+
+    def append(self, rows):
+        """Ghi thêm một lô khoản vay (list dict, dict cột hoặc pa.Table) thành một part mới; trả về số dòng."""
+        table = _to_table(rows)
+        if table.num_rows:
+            self._write_part(table)
+            if self.auto_compact and len(self._parts()) >= self.auto_compact:
+                small = [n for n, t in self._live_tables() if t.num_rows < COMPACT_MAX_ROWS]
+                if len(small) >= self.auto_compact:
+                    self.compact(COMPACT_MAX_ROWS)
+        return table.num_rows
+
+    def append_dossier(self, data, summary=None, branch="", product="", loan_id=None, appraised_at=None):
+        """Ghi một hồ sơ đã thẩm định (cùng chỉ số với DossierStore)."""
+        from src.storage.dossier_store import dossier_metrics
+        _, _, _, income, coll_values = summary_inputs(data)
+        row = dossier_metrics(data, summary)
+        row.update({"loan_id": loan_id, "branch": branch, "product": product, "appraised_at": appraised_at,
+                    "thu_nhap_hang_thang": float(income or 0), "gia_tri_tsdb": float(sum(coll_values))})
+        return self.append([row])
+
+    @staticmethod
+    def _lock_token(lock):
+        try:
+            with open(lock, encoding="ascii") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _release_lock(self, lock, token):
+        """Xoá khoá chỉ khi nó vẫn mang token này (không xoá khoá tiến trình khác vừa lấy)."""
+        if self._lock_token(lock) == token:
+            try:
+                os.remove(lock)
+            except FileNotFoundError:
+                pass
+
+    def _acquire_lock(self):
+        """Trả về (đường dẫn khoá, token) hoặc None nếu tiến trình khác đang giữ khoá."""
+        lock = os.path.join(self.path, _LOCK_NAME)
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            seen = self._lock_token(lock)
+            try:
+                if seen is not None and time.time() - os.path.getmtime(lock) > _LOCK_STALE_SECONDS:
+                    self._release_lock(lock, seen)   # lần append sau sẽ gộp
+            except FileNotFoundError:
+                pass
+            return None
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write(token)
+        return lock, token
+
+    def compact(self, max_rows=None):
+        """
+        Gộp các part (chỉ các part < max_rows dòng nếu có) thành một part; trả về số part đã gộp.
+        Tiến trình khác đang compact thì bỏ qua (trả về 0).
+        """
+        import pyarrow as pa
+        held = self._acquire_lock() if os.path.isdir(self.path) else None
+        if held is None:
+            return 0
+        try:
+            live = [(n, t) for n, t in self._live_tables() if max_rows is None or t.num_rows < max_rows]
+            if len(live) <= 1:
+                return 0
+            merged = pa.concat_tables([t for _, t in live]).combine_chunks()
+            # part mới ghi kèm danh sách part nó thay thế: reader bỏ qua chúng ngay cả khi chưa xoá xong.
+            # Danh sách gồm cả các part mà part được gộp còn che (compact trước crash trước khi xoá),
+            # nếu không chúng sẽ sống lại và bị đếm hai lần.
+            names = [n for n, _ in live]
+            on_disk = set(self._parts())
+            inherited = set().union(*(self._replaces(t) for _, t in live)) & on_disk
+            replaces = sorted(set(names) | inherited)
+            self._write_part(merged, {_REPLACES_KEY: ",".join(replaces).encode()})
+            for n in replaces:
+                try:
+                    os.remove(os.path.join(self.path, n))
+                except FileNotFoundError:
+                    pass
+            return len(names)
+        finally:
+            self._release_lock(*held)
+
+    def table(self, columns=None, where=None):
+        """pa.Table (memory-mapped, không copy khi không lọc) các cột `columns` của khoản vay khớp `where`."""
+        import pyarrow as pa
+        tables = [t for _, t in self._live_tables()]
+        table = pa.concat_tables(tables) if tables else _schema().empty_table()
+        columns = list(columns) if columns else list(COLUMN_NAMES)
+        if where is not None:
+            needed = list(dict.fromkeys(columns + _expression_columns(where)))
+            table = table.select(needed).filter(_filter_expression(where))
+        return table.select(columns)
+
+    def __len__(self):
+        return sum(t.num_rows for _, t in self._live_tables())
+
+    # ======================================================
+    # 2) TRUY VẤN
+    # ======================================================
+    def summary(self, by=("branch",), where=None, percentiles=(50, 90)):
+        """
+        Mỗi nhóm `by`: số khoản, tổng tiền vay, DSR/LTV trung bình và phân vị (xấp xỉ t-digest).
+        by=() -> một dòng cho cả danh mục. Trả về DataFrame sắp theo `by`.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        by = list(by)
+        table = self.table(by + ["so_tien_vay", "dsr_percent", "ltv_percent"], where)
+        keys = by or ["_all"]
+        if not by:
+            table = table.append_column("_all", pa.array(np.zeros(table.num_rows, dtype=np.int8)))
+        q = [p / 100.0 for p in percentiles]
+        aggs = [("so_tien_vay", "count", _count_all()), ("so_tien_vay", "sum"),
+                ("dsr_percent", "mean"), ("ltv_percent", "mean")]
+        if q:
+            aggs += [("dsr_percent", "tdigest", pc.TDigestOptions(q=q)),
+                     ("ltv_percent", "tdigest", pc.TDigestOptions(q=q))]
+        grouped = table.group_by(keys).aggregate(aggs)
+
+        out = {k: grouped.column(k).to_pylist() for k in by}
+        out["so_khoan"] = grouped.column("so_tien_vay_count").to_numpy()
+        out["tong_tien_vay"] = grouped.column("so_tien_vay_sum").to_numpy(zero_copy_only=False)
+        for col in ("dsr_percent", "ltv_percent"):
+            name = col.split("_")[0]
+            out[f"{name}_mean"] = grouped.column(f"{col}_mean").to_numpy(zero_copy_only=False)
+            if q:
+                digest = [v if v else [np.nan] * len(q) for v in grouped.column(f"{col}_tdigest").to_pylist()]
+                values = np.array(digest, dtype=float).reshape(-1, len(q))
+                for j, p in enumerate(percentiles):
+                    out[f"{name}_p{p}"] = values[:, j]
+        df = pd.DataFrame(out)
+        return df.sort_values(by, ignore_index=True) if by else df
+
+    def buckets(self, column="ltv_percent", edges=LTV_BUCKETS, by=(), where=None):
+        """
+        Phân bố khoản vay theo nhóm giá trị `column` (cận `edges`, %): số khoản, tổng tiền vay
+        và tỉ trọng số khoản trong nhóm `by`. Dùng DSR_BUCKETS cho dsr_percent.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        by = list(by)
+        table = self.table(by + [column, "so_tien_vay"], where)
+        values = table.column(column).to_numpy(zero_copy_only=False).astype(float)
+        codes = np.searchsorted(np.asarray(edges, dtype=float), values, side="right")
+        codes[np.isnan(values)] = len(edges) + 1
+        table = table.append_column("_bucket", pa.array(codes.astype(np.int8)))
+        grouped = table.group_by(by + ["_bucket"]).aggregate([("so_tien_vay", "count", _count_all()),
+                                                              ("so_tien_vay", "sum")])
+        labels = bucket_labels(edges)
+        df = pd.DataFrame({k: grouped.column(k).to_pylist() for k in by})
+        df["bucket"] = pd.Categorical.from_codes(grouped.column("_bucket").to_numpy(), categories=labels,
+                                                 ordered=True)
+        df["so_khoan"] = grouped.column("so_tien_vay_count").to_numpy()
+        df["tong_tien_vay"] = grouped.column("so_tien_vay_sum").to_numpy(zero_copy_only=False)
+        df = df.sort_values(by + ["bucket"], ignore_index=True)
+        total = df.groupby(by, observed=True)["so_khoan"].transform("sum") if by else df["so_khoan"].sum()
+        df["ty_trong"] = df["so_khoan"] / total
+        return df
+
+    def runoff(self, where=None, as_of=None, percentiles=(10, 50, 90), max_sample=20000, seed=0):
+        """
+        Dư nợ dự kiến của danh mục theo tháng (month, total_balance, total_payment, active_loans,
+        p<q>_balance; vẽ bằng src.ui.charts.runoff_chart). as_of (date/datetime): các khoản đã trả từ tháng thẩm định
+        (appraised_at, coi như ngày giải ngân) đến as_of nên chỉ còn phần đuôi lịch;
+        None -> tính từ kỳ 1 của mọi khoản.
+
+        Tổng tính closed-form (xem _runoff_totals), phân vị tính trên mẫu tối đa
+        `max_sample` khoản.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = self.table(["so_tien_vay", "lai_suat_p_a", "thoi_han_thang", "appraised_at"], where)
+        table = table.filter(pc.and_(pc.and_(pc.greater(table.column("so_tien_vay"), 0),
+                                             pc.greater(table.column("thoi_han_thang"), 0)),
+                                     pc.is_valid(table.column("lai_suat_p_a"))))
+        if as_of is not None:
+            at = table.column("appraised_at")
+            start = pc.add(pc.multiply(pc.year(at), 12), pc.subtract(pc.month(at), 1))
+            elapsed = np.maximum(_month_index(as_of) - start.to_numpy(zero_copy_only=False), 0)
+            elapsed = np.nan_to_num(elapsed, nan=0).astype(np.int32)
+        else:
+            elapsed = np.zeros(table.num_rows, dtype=np.int32)
+        table = table.append_column("_elapsed", pa.array(elapsed))
+        table = table.filter(pc.less(table.column("_elapsed"), table.column("thoi_han_thang")))
+
+        P = table.column("so_tien_vay").to_numpy()
+        R = table.column("lai_suat_p_a").to_numpy()
+        N = table.column("thoi_han_thang").to_numpy().astype(np.int64)
+        E = table.column("_elapsed").to_numpy().astype(np.int64)
+        horizon = int((N - E).max()) if len(N) else 0
+        total_balance, total_payment, active = _runoff_totals(P, R, N, E, horizon)
+
+        out = {"month": np.arange(1, horizon + 1), "total_balance": total_balance,
+               "total_payment": total_payment, "active_loans": active}
+        if percentiles and table.num_rows:
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(table.num_rows, size=min(table.num_rows, max_sample), replace=False))
+            t = table.take(pa.array(sample))
+            bal = _remaining_balance(t.column("so_tien_vay").to_numpy(), t.column("lai_suat_p_a").to_numpy(),
+                                     t.column("thoi_han_thang").to_numpy().astype(np.int64),
+                                     t.column("_elapsed").to_numpy().astype(np.int64), horizon)
+            with warnings.catch_warnings():
+                # tháng không còn khoản nào trong mẫu -> NaN
+                warnings.simplefilter("ignore", RuntimeWarning)
+                qs = np.nanpercentile(bal, percentiles, axis=0)
+            for p, row in zip(percentiles, qs):
+                out[f"p{p}_balance"] = row
+        return pd.DataFrame(out)
@@ -0,0 +1,332 @@
+# src/service/api.py
+"""
+HTTP API headless cho LOS: parse hồ sơ, tính lịch trả nợ, xuất xlsx/docx.
+
+    python -m src.service.api --port 8090 --workers 4 --max-pending 64
+    curl --data-binary @ho_so.docx http://127.0.0.1:8090/parse
+    curl -d '{"principal": 1500000000, "rate": 8.5, "months": 120}' http://127.0.0.1:8090/schedule
+
+Front end asyncio (aiohttp); việc nặng CPU (parse .docx, dựng xlsx/docx) chạy trong
+ProcessPoolExecutor. Số việc đang chờ/chạy trong pool bị giới hạn bởi --max-pending:
+vượt thì trả 503 + Retry-After ngay thay vì xếp hàng vô hạn (backpressure). Tính lịch
+trả nợ là closed-form (vài ms) nên chạy thẳng trong event loop.
+
+Parse qua shared_parse_cache (khoá = hash nội dung file + PARSER_VERSION của parser_docx),
+cùng parser và khoá với app Streamlit: đặt CADAP_PARSE_CACHE_DIR để cache trên đĩa dùng
+chung giữa app, các lần chạy và các instance của API. Cùng một file gửi đồng thời chỉ
+được parse một lần.
+
+Endpoint:
+  POST /parse          body = bytes .docx (hoặc multipart, trường "file") -> {key, cached, data}
+  POST /schedule       JSON tham số hoặc {"data": hồ sơ} -> {summary, columns, rows}
+  POST /export/xlsx    JSON như /schedule -> file .xlsx (cùng lịch với /schedule)
+  POST /export/docx    JSON như /schedule -> file .docx
+  GET  /health, GET /metrics (Prometheus text, kèm số liệu hàng đợi)
+"""
+import argparse
+import asyncio
+import io
+import math
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from aiohttp import web
+
+from src.logic.parse_cache import shared_parse_cache
+from src.logic.parser_docx import parse_docx_streamlit
+from src.monitoring import metrics
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_MONTHS = 1200   # 100 năm: /schedule chạy trong event loop nên kích thước lịch phải có trần
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+class Overloaded(Exception):
+    pass
+
+# ======================================================
+# 1) VIỆC CHẠY TRONG PROCESS POOL (hàm module-level để pickle được)
+# ======================================================
+_WORKER_TEMPLATE = None
+
+def _init_worker(template_path):
+    global _WORKER_TEMPLATE
+    # worker spawn/forkserver không thừa hưởng trạng thái metrics của process cha
+    metrics.init_from_env()
+    from src.export.report_engine import ReportTemplate
+    _WORKER_TEMPLATE = ReportTemplate.load(template_path)
+
+def _parse_job(content):
+    return parse_docx_streamlit(io.BytesIO(content))
+
+def _export_xlsx_job(data, plan):
+    from src.export.export_excel import export_schedule_excel
+    schedule, _summary = dossier_schedule(data, *plan)
+    return export_schedule_excel(schedule)
+
+def _export_docx_job(data, plan):
+    schedule, summary = dossier_schedule(data, *plan)
+    return _WORKER_TEMPLATE.render(data, schedule, summary)
+
+# ======================================================
+# 2) LỊCH TRẢ NỢ (trong event loop)
+# ======================================================
+def _number(v, name, cast=float, lo=None, hi=None):
+    try:
+        x = cast(v)
+    except (TypeError, ValueError, OverflowError):
+        raise web.HTTPBadRequest(reason=f"{name} không hợp lệ: {v!r}")
+    if isinstance(x, float) and not math.isfinite(x):
+        raise web.HTTPBadRequest(reason=f"{name} không hợp lệ: {v!r}")
+    if lo is not None and x < lo:
+        raise web.HTTPBadRequest(reason=f"{name} phải >= {lo}: {v!r}")
+    if hi is not None and x > hi:
+        raise web.HTTPBadRequest(reason=f"{name} phải <= {hi}: {v!r}")
+    return x
+
+def dossier_from_params(body):
+    """
+    Hồ sơ từ {"data": hồ sơ} hoặc tham số phẳng (principal, rate, months, monthly_income,
+    collateral_value). Các trường số dùng để tính được kiểm tra (sai -> 400), months <= MAX_MONTHS.
+    """
+    src = body.get("data")
+    if src is None:
+        src = {
+            "finance": {"so_tien_vay": body.get("principal", 0), "lai_suat_p_a": body.get("rate", 8.5),
+                        "thoi_han_thang": body.get("months", 0)},
+            "income": {"thu_nhap_hang_thang": body.get("monthly_income", 0)},
+            "collateral": [{"gia_tri": body.get("collateral_value", 0)}],
+        }
+    fin = src.get("finance") or {} if isinstance(src, dict) else None
+    inc = src.get("income") or {} if isinstance(src, dict) else None
+    coll = src.get("collateral") or [] if isinstance(src, dict) else None
+    if not (isinstance(fin, dict) and isinstance(inc, dict) and isinstance(coll, list)
+            and all(isinstance(c, dict) for c in coll)):
+        raise web.HTTPBadRequest(reason="data không đúng cấu trúc hồ sơ")
+    data = dict(src)
+    data["finance"] = {
+        **fin,
+        "so_tien_vay": _number(fin.get("so_tien_vay") or 0, "principal", lo=0),
+        "tong_nhu_cau": _number(fin.get("tong_nhu_cau") or 0, "tong_nhu_cau", lo=0),
+        # như schedule_inputs: thiếu lãi suất -> 8.5
+        "lai_suat_p_a": _number(8.5 if fin.get("lai_suat_p_a") is None else fin["lai_suat_p_a"], "rate", lo=0, hi=100),
+        "thoi_han_thang": _number(fin.get("thoi_han_thang") or 0, "months", int, lo=0, hi=MAX_MONTHS),
+    }
+    data["income"] = {
+        **inc,
+        "thu_nhap_hang_thang": _number(inc.get("thu_nhap_hang_thang") or 0, "monthly_income", lo=0),
+        "chi_phi_hang_thang": _number(inc.get("chi_phi_hang_thang") or 0, "monthly_costs", lo=0),
+    }
+    data["collateral"] = [{**c, "gia_tri": _number(c.get("gia_tri") or 0, "collateral_value", lo=0)} for c in coll]
+    return data
+
+def schedule_plan(body, months):
+    """(method, grace_months, rate_resets) đã kiểm tra từ body; dùng chung cho /schedule và /export/*."""
+    method = body.get("method", "annuity")
+    if method not in ("annuity", "equal_principal"):
+        raise web.HTTPBadRequest(reason=f"method không hợp lệ: {method!r}")
+    grace = _number(body.get("grace_months") or 0, "grace_months", int, lo=0, hi=months)
+    resets = body.get("rate_resets") or []
+    if not isinstance(resets, list) or not all(isinstance(x, list) and len(x) == 2 for x in resets):
+        raise web.HTTPBadRequest(reason="rate_resets phải là danh sách các cặp [kỳ, lãi suất]")
+    resets = [(_number(m, "rate_resets.month", int, lo=1, hi=MAX_MONTHS), _number(r, "rate_resets.rate", lo=0, hi=100))
+              for m, r in resets]
+    return method, grace, resets
+
+def dossier_schedule(data, method="annuity", grace_months=0, rate_resets=()):
+    """Lịch trả nợ và summary (cùng công thức với recalc_all của app: khoản trả = kỳ đầu)."""
+    from src.logic.finance import amortization_schedule, loan_summary, summary_inputs
+    principal, rate, months, income, coll_values = summary_inputs(data)
+    schedule = amortization_schedule(principal, rate, months, method, grace_months, rate_resets)
+    return schedule, loan_summary(schedule, principal, income, coll_values)
+
+def schedule_response(body):
+    """Lịch trả nợ + chỉ số; method/grace_months/rate_resets như amortization_schedule."""
+    from src.storage.dossier_store import dossier_metrics
+    data = dossier_from_params(body)
+    plan = schedule_plan(body, data["finance"]["thoi_han_thang"])
+    offset = _number(body.get("offset") or 0, "offset", int, lo=0)
+    limit = body.get("limit")
+    limit = None if limit is None else _number(limit, "limit", int, lo=0)
+    df, summary = dossier_schedule(data, *plan)
+    summary = dossier_metrics(data, summary)
+    summary["total_interest"] = float(df["interest"].sum()) if len(df) else 0.0
+    part = df.iloc[offset:None if limit is None else offset + limit]
+    # dựng dòng theo từng cột: to_numpy() ép cả frame về float64, tháng sẽ thành 1.0, 2.0...
+    rows = [list(r) for r in zip(*(part[c].tolist() for c in part.columns))]
+    return {"summary": summary, "columns": list(df.columns), "rows": rows, "total_rows": len(df)}
+
+# ======================================================
+# 3) SERVICE
+# ======================================================
+class ApiService:
+    def __init__(self, workers=None, max_pending=None, parse_cache=None, template_path=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 8
+        self.cache = parse_cache or shared_parse_cache(disk_dir=os.environ.get("CADAP_PARSE_CACHE_DIR"))
+        self.template_path = template_path or os.environ.get("CADAP_REPORT_TEMPLATE")
+        self.pool = None
+        self.pending = 0
+        self.stats = {"rejected": 0, "jobs": 0, "failed": 0}
+        self._inflight = {}   # khoá parse -> Future, gộp các request trùng file
+
+    async def start(self, _app=None):
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.template_path,))
+
+    async def stop(self, _app=None):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    async def submit(self, fn, *args):
+        """Chạy fn trong process pool; đầy hàng đợi thì raise Overloaded (-> 503)."""
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise Overloaded()
+        self.pending += 1
+        self.stats["jobs"] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    async def parse(self, content):
+        key = self.cache.key(content)
+        data = self.cache.lookup(key)
+        if data is not None:
+            return key, True, data
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return key, True, await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            with metrics.stage("api.parse", bytes=len(content)):
+                data = await self.submit(_parse_job, content)
+            self.cache.store(key, data)
+            fut.set_result(data)
+            return key, False, data
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # đã xử lý, tránh cảnh báo "exception never retrieved"
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+def _overloaded_response():
+    return web.json_response({"error": "Máy chủ đang quá tải, thử lại sau"}, status=503, headers={"Retry-After": "1"})
+
+@web.middleware
+async def error_middleware(request, handler):
+    try:
+        return await handler(request)
+    except Overloaded:
+        return _overloaded_response()
+    except web.HTTPException as e:
+        if e.status >= 400 and e.content_type != "application/json":
+            return web.json_response({"error": e.reason}, status=e.status)
+        raise
+    except Exception as e:
+        return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=500)
+
+async def _read_docx(request):
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == "file":
+                return await part.read(decode=False)
+        raise web.HTTPBadRequest(reason="thiếu trường 'file'")
+    content = await request.read()
+    if not content:
+        raise web.HTTPBadRequest(reason="body rỗng")
+    return content
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="body không phải JSON hợp lệ")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="body JSON phải là object")
+    return body
+
+async def handle_parse(request):
+    service = request.app["service"]
+    content = await _read_docx(request)
+    try:
+        key, cached, data = await service.parse(content)
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        # không phải zip / thiếu word/document.xml / XML hỏng: lỗi của file gửi lên, không phải của server
+        raise web.HTTPBadRequest(reason=f"file không phải .docx hợp lệ ({type(e).__name__})")
+    return web.json_response({"key": key, "cached": cached, "data": data})
+
+async def handle_schedule(request):
+    body = await _json_body(request)
+    with metrics.stage("api.schedule"):
+        return web.json_response(schedule_response(body))
+
+def _export_handler(job, content_type, file_name):
+    async def handle(request):
+        body = await _json_body(request)
+        data = dossier_from_params(body)
+        plan = schedule_plan(body, data["finance"]["thoi_han_thang"])
+        content = await request.app["service"].submit(job, data, plan)
+        return web.Response(body=content, content_type=content_type,
+                            headers={"Content-Disposition": f'attachment; filename="{file_name}"'})
+    return handle
+
+async def handle_health(request):
+    service = request.app["service"]
+    return web.json_response({"status": "ok", "workers": service.workers, "pending": service.pending,
+                              "max_pending": service.max_pending})
+
+async def handle_metrics(request):
+    service = request.app["service"]
+    extra = [
+        "# HELP cadap_api_pending Số việc đang chờ/chạy trong process pool.",
+        "# TYPE cadap_api_pending gauge",
+        f"cadap_api_pending {service.pending}",
+        "# HELP cadap_api_rejected_total Số request bị từ chối do quá tải (503).",
+        "# TYPE cadap_api_rejected_total counter",
+        f"cadap_api_rejected_total {service.stats['rejected']}",
+        "# HELP cadap_api_parse_cache_hits_total Số lần parse lấy từ cache.",
+        "# TYPE cadap_api_parse_cache_hits_total counter",
+        f"cadap_api_parse_cache_hits_total {service.cache.hits}",
+    ]
+    return web.Response(text=metrics.render_prometheus() + "\n".join(extra) + "\n",
+                        content_type="text/plain", charset="utf-8")
+
+def make_app(workers=None, max_pending=None, parse_cache=None, template_path=None):
+    service = ApiService(workers, max_pending, parse_cache, template_path)
+    app = web.Application(client_max_size=MAX_BODY_BYTES, middlewares=[error_middleware])
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_post("/parse", handle_parse)
+    app.router.add_post("/schedule", handle_schedule)
+    app.router.add_post("/export/xlsx", _export_handler(_export_xlsx_job, XLSX_TYPE, "ke_hoach.xlsx"))
+    app.router.add_post("/export/docx", _export_handler(_export_docx_job, DOCX_TYPE, "bao_cao.docx"))
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HTTP API thẩm định hồ sơ (parse, lịch trả nợ, xuất file)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--workers", type=int, default=None, help="số process cho parse/xuất file (mặc định: số CPU)")
+    ap.add_argument("--max-pending", type=int, default=None,
+                    help="số việc tối đa chờ/chạy trong pool, vượt thì trả 503 (mặc định: 8 x workers)")
+    ap.add_argument("--template", default=None, help="mẫu .docx báo cáo (mặc định: CADAP_REPORT_TEMPLATE)")
+    args = ap.parse_args(argv)
+    metrics.init_from_env()
+    web.run_app(make_app(args.workers, args.max_pending, template_path=args.template),
+                host=args.host, port=args.port, access_log=None)
+
+if __name__ == "__main__":
+    main()
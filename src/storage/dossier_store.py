@@ -0,0 +1,284 @@
+# src/storage/dossier_store.py
+"""
+Lưu hồ sơ thẩm định vào SQLite (WAL) để mở lại/tra cứu mà không phải tải và parse lại .docx.
+
+Mỗi hồ sơ lưu: dữ liệu đã parse kèm chỉnh sửa của cán bộ (JSON), tham số lịch trả nợ
+(tiền vay, lãi suất, thời hạn) và các chỉ số tóm tắt (khoản trả, DSR, LTV). Lịch trả nợ
+KHÔNG được lưu: dựng lại khi cần bằng schedule(id) (closed-form, vài ms).
+
+Tra cứu theo CCCD, SĐT (chuẩn hoá về chữ số), tên (không dấu, theo tiền tố của họ tên
+hoặc tên gọi) và ngày cập nhật đều đi qua index nên vẫn tính bằng ms với hàng trăm nghìn
+hồ sơ. Nhiều worker/tiến trình cùng ghi: WAL cho phép đọc song song với ghi, ghi dùng
+BEGIN IMMEDIATE + busy_timeout; mỗi thread một kết nối riêng.
+
+    store = DossierStore("dossiers.sqlite3")
+    dossier_id = store.save(data, upload_key=key)
+    store.search(cccd="0790...")  /  store.search(name="nguyen van")
+    rec = store.get(dossier_id); df = store.schedule(dossier_id).to_pandas()
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from src.logic.finance import annuity_payment, schedule_inputs, summary_inputs
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dossiers (
+    id              INTEGER PRIMARY KEY,
+    upload_key      TEXT UNIQUE,
+    ten             TEXT NOT NULL DEFAULT '',
+    ten_norm        TEXT NOT NULL DEFAULT '',
+    ten_goi         TEXT NOT NULL DEFAULT '',
+    cccd            TEXT NOT NULL DEFAULT '',
+    phone           TEXT NOT NULL DEFAULT '',
+    so_tien_vay     REAL NOT NULL DEFAULT 0,
+    lai_suat_p_a    REAL NOT NULL DEFAULT 0,
+    thoi_han_thang  INTEGER NOT NULL DEFAULT 0,
+    monthly_payment REAL,
+    dsr_percent     REAL,
+    ltv_percent     REAL,
+    data_json       TEXT NOT NULL,
+    version         INTEGER NOT NULL DEFAULT 1,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_dossiers_cccd ON dossiers(cccd);
+CREATE INDEX IF NOT EXISTS ix_dossiers_phone ON dossiers(phone);
+CREATE INDEX IF NOT EXISTS ix_dossiers_ten_norm ON dossiers(ten_norm);
+CREATE INDEX IF NOT EXISTS ix_dossiers_ten_goi ON dossiers(ten_goi);
+CREATE INDEX IF NOT EXISTS ix_dossiers_updated_at ON dossiers(updated_at);
+"""
+
+# cột trả về khi tìm kiếm (không kèm data_json cho nhẹ)
+_LIST_COLUMNS = ("id", "ten", "cccd", "phone", "so_tien_vay", "lai_suat_p_a", "thoi_han_thang",
+                 "monthly_payment", "dsr_percent", "ltv_percent", "version", "created_at", "updated_at")
+
+class StoreConflict(Exception):
+    """Hồ sơ đã bị worker/cán bộ khác sửa sau phiên bản mà người gọi đang giữ."""
+
+def normalize_name(name):
+    """Chữ thường, bỏ dấu tiếng Việt (đ -> d), gộp khoảng trắng."""
+    s = unicodedata.normalize("NFD", str(name or "").replace("đ", "d").replace("Đ", "D"))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(s.lower().split())
+
+def normalize_phone(phone):
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if digits.startswith("84") and len(digits) >= 11:
+        digits = "0" + digits[2:]
+    return digits
+
+def _prefix_range(prefix):
+    # tiền tố -> khoảng [prefix, prefix + U+10FFFF): dùng được index, khác LIKE
+    return prefix, prefix + "\U0010ffff"
+
+def dossier_metrics(data, summary=None):
+    """Tham số lịch trả nợ và chỉ số tóm tắt để lưu vào các cột có index/lọc được."""
+    principal, rate, months = schedule_inputs(data)
+    summary = summary or {}
+    payment = summary.get("monthly_payment")
+    if payment is None:
+        payment = float(annuity_payment(principal, rate, months)[0])
+    _, _, _, income, coll_values = summary_inputs(data)
+    dsr = summary.get("dsr_percent")
+    if dsr is None and income:
+        dsr = payment / float(income) * 100.0
+    ltv = summary.get("ltv_percent")
+    coll = sum(coll_values)
+    if ltv is None and coll:
+        ltv = float(principal) / coll * 100.0
+    return {"so_tien_vay": float(principal or 0), "lai_suat_p_a": float(rate or 0),
+            "thoi_han_thang": int(months or 0), "monthly_payment": payment,
+            "dsr_percent": dsr, "ltv_percent": ltv}
+
+def _row_values(data, summary):
+    idf = data.get("identification", {}) or {}
+    ten_norm = normalize_name(idf.get("ten"))
+    return {
+        "ten": idf.get("ten") or "",
+        "ten_norm": ten_norm,
+        "ten_goi": ten_norm.rsplit(" ", 1)[-1] if ten_norm else "",
+        "cccd": re.sub(r"\D", "", str(idf.get("cccd") or "")),
+        "phone": normalize_phone(idf.get("phone")),
+        **dossier_metrics(data, summary),
+        "data_json": json.dumps(data, ensure_ascii=False, default=str),
+    }
+
+class DossierStore:
+    def __init__(self, path, timeout=30.0):
+        """path: file SQLite (":memory:" chỉ dùng được trong một thread); timeout: giây chờ khoá ghi."""
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; giao dịch ghi mở tường minh bằng BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with self._write(conn):
+                for stmt in _SCHEMA.split(";"):
+                    if stmt.strip():
+                        conn.execute(stmt)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    class _write:
+        """Giao dịch ghi: BEGIN IMMEDIATE lấy khoá ghi ngay, tránh deadlock nâng cấp khoá giữa các worker."""
+
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+
+        def __exit__(self, exc_type, *exc):
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+            return False
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ----------------------------------------------------------
+    # ghi
+    # ----------------------------------------------------------
+    def save(self, data, summary=None, dossier_id=None, upload_key=None, expected_version=None):
+        """
+        Thêm mới (dossier_id=None) hoặc cập nhật hồ sơ; trả về id.
+        Hồ sơ mới có upload_key trùng hồ sơ cũ thì cập nhật hồ sơ cũ.
+        expected_version: phiên bản người gọi đã đọc; khác phiên bản hiện tại thì raise StoreConflict.
+        """
+        values = _row_values(data, summary)
+        now = time.time()
+        conn = self._conn()
+        with self._write(conn):
+            if dossier_id is None and upload_key is not None:
+                row = conn.execute("SELECT id FROM dossiers WHERE upload_key = ?", (upload_key,)).fetchone()
+                dossier_id = row["id"] if row else None
+            if dossier_id is None:
+                cols = list(values) + ["upload_key", "created_at", "updated_at"]
+                cur = conn.execute(
+                    f"INSERT INTO dossiers ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                    [*values.values(), upload_key, now, now])
+                return cur.lastrowid
+            row = conn.execute("SELECT version FROM dossiers WHERE id = ?", (dossier_id,)).fetchone()
+            if row is None:
+                raise KeyError(dossier_id)
+            if expected_version is not None and row["version"] != expected_version:
+                raise StoreConflict(f"Hồ sơ {dossier_id} đã ở phiên bản {row['version']}, khác {expected_version}")
+            sets = ", ".join(f"{c} = ?" for c in values)
+            conn.execute(f"UPDATE dossiers SET {sets}, version = version + 1, updated_at = ?"
+                         + (", upload_key = COALESCE(upload_key, ?)" if upload_key else "") + " WHERE id = ?",
+                         [*values.values(), now, *([upload_key] if upload_key else []), dossier_id])
+            return dossier_id
+
+    def save_many(self, items):
+        """
+        Thêm nhiều hồ sơ mới trong một giao dịch. items: iterable (data, summary, upload_key).
+        Trả về số dòng đã thêm; hồ sơ trùng upload_key đã có bị bỏ qua và không được đếm.
+        """
+        now = time.time()
+        rows = []
+        for data, summary, upload_key in items:
+            values = _row_values(data, summary)
+            rows.append([*values.values(), upload_key, now, now])
+        if not rows:
+            return 0
+        cols = list(_row_values({}, None)) + ["upload_key", "created_at", "updated_at"]
+        conn = self._conn()
+        with self._write(conn):
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO dossiers ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                             rows)
+            return conn.total_changes - before
+
+    def delete(self, dossier_id):
+        conn = self._conn()
+        with self._write(conn):
+            return conn.execute("DELETE FROM dossiers WHERE id = ?", (dossier_id,)).rowcount > 0
+
+    # ----------------------------------------------------------
+    # đọc
+    # ----------------------------------------------------------
+    @staticmethod
+    def _record(row):
+        rec = {c: row[c] for c in _LIST_COLUMNS}
+        rec["upload_key"] = row["upload_key"]
+        rec["data"] = json.loads(row["data_json"])
+        rec["summary"] = {k: row[k] for k in ("monthly_payment", "dsr_percent", "ltv_percent")}
+        return rec
+
+    def get(self, dossier_id):
+        row = self._conn().execute("SELECT * FROM dossiers WHERE id = ?", (dossier_id,)).fetchone()
+        return None if row is None else self._record(row)
+
+    def find_by_upload_key(self, upload_key):
+        """Hồ sơ đã lưu từ đúng file này (cùng khoá ParseCache) để mở lại mà không parse."""
+        row = self._conn().execute("SELECT * FROM dossiers WHERE upload_key = ?", (upload_key,)).fetchone()
+        return None if row is None else self._record(row)
+
+    def search(self, cccd=None, phone=None, name=None, since=None, until=None, limit=50):
+        """
+        Tìm theo CCCD/SĐT (khớp chính xác sau chuẩn hoá), tên (tiền tố họ tên hoặc tên gọi,
+        không dấu) và khoảng ngày cập nhật (epoch giây). Mới cập nhật trước. Tiêu chí đã truyền
+        nhưng chuẩn hoá ra rỗng (không có chữ/số) thì không khớp hồ sơ nào.
+        """
+        where, args = [], []
+        cccd = re.sub(r"\D", "", str(cccd)) if cccd else None
+        phone = normalize_phone(phone) if phone else None
+        name = normalize_name(name) if name else None
+        # "." hay "-" chuẩn hoá thành rỗng: không được khớp mọi hồ sơ (hay mọi hồ sơ thiếu CCCD)
+        if "" in (cccd, phone) or (name is not None and not re.search(r"\w", name)):
+            return []
+        if cccd is not None:
+            where.append("cccd = ?")
+            args.append(cccd)
+        if phone is not None:
+            where.append("phone = ?")
+            args.append(phone)
+        if name is not None:
+            lo, hi = _prefix_range(name)
+            where.append("((ten_norm >= ? AND ten_norm < ?) OR (ten_goi >= ? AND ten_goi < ?))")
+            args += [lo, hi, lo, hi]
+        if since is not None:
+            where.append("updated_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("updated_at < ?")
+            args.append(until)
+        sql = f"SELECT {', '.join(_LIST_COLUMNS)} FROM dossiers"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY updated_at DESC LIMIT ?"
+        return [dict(r) for r in self._conn().execute(sql, [*args, int(limit)])]
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM dossiers").fetchone()[0]
+
+    def schedule(self, dossier_id, dtype="int64"):
+        """Dựng lại lịch trả nợ từ tham số đã lưu (không lưu lịch trong DB)."""
+        from src.logic.schedule import Schedule
+        row = self._conn().execute("SELECT so_tien_vay, lai_suat_p_a, thoi_han_thang FROM dossiers WHERE id = ?",
+                                   (dossier_id,)).fetchone()
+        if row is None:
+            raise KeyError(dossier_id)
+        return Schedule(row["so_tien_vay"], row["lai_suat_p_a"], row["thoi_han_thang"], dtype=dtype)
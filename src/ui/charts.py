@@ -0,0 +1,97 @@
+# src/ui/charts.py
+"""
+Dữ liệu biểu đồ được gộp/giảm mẫu phía server trước khi đưa vào Altair.
+
+alt.Chart(df) nhúng mọi dòng của df vào spec Vega gửi xuống trình duyệt; với
+danh mục hàng chục nghìn khoản vay thì payload và thời gian render tăng theo.
+Dư nợ danh mục được gộp theo tháng ở PortfolioBook.runoff (tổng, phân vị); ở đây
+chuỗi được giảm mẫu bằng LTTB (Largest-Triangle-Three-Buckets) về một "ngân sách điểm" cố định
+theo độ rộng biểu đồ, nên payload không phụ thuộc kích thước danh mục.
+"""
+import numpy as np
+
+DEFAULT_MAX_POINTS = 800
+
+def lttb(x, y, n_out):
+    """
+    Chỉ số các điểm giữ lại theo Largest-Triangle-Three-Buckets.
+    Luôn giữ điểm đầu và cuối; trả về toàn bộ chỉ số nếu chuỗi đã ngắn hơn n_out.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # biên các bucket cho n - 2 điểm giữa
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # trung bình bucket kế tiếp (bucket cuối dùng điểm cuối)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean() if nhi > nlo else x[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area)) if len(area) else lo
+        out[i + 1] = a
+    return out
+
+def downsample_frame(df, x, y, max_points=DEFAULT_MAX_POINTS):
+    """
+    Giảm df về tối đa max_points dòng bằng LTTB trên cột y (nhiều cột y: hợp các chỉ số
+    của từng cột, mỗi cột một phần ngân sách).
+    """
+    if df is None or len(df) <= max_points:
+        return df
+    ys = [y] if isinstance(y, str) else list(y)
+    per_col = max(3, max_points // len(ys))
+    idx = np.unique(np.concatenate([lttb(df[x].to_numpy(), df[c].to_numpy(), per_col) for c in ys]))
+    return df.iloc[idx]
+
+def schedule_chart_frame(schedule, y="payment", max_points=DEFAULT_MAX_POINTS):
+    """
+    DataFrame tối đa max_points dòng (month + cột y) cho biểu đồ của một Schedule: LTTB chạy
+    trên mảng của Schedule nên không dựng DataFrame đủ kỳ.
+    """
+    import pandas as pd
+    ys = [y] if isinstance(y, str) else list(y)
+    month, cols = schedule.month, schedule.columns()
+    idx = slice(None)
+    if len(month) > max_points:
+        per_col = max(3, max_points // len(ys))
+        idx = np.unique(np.concatenate([lttb(month, cols[c], per_col) for c in ys]))
+    return pd.DataFrame({"month": month[idx], **{c: cols[c][idx] for c in ys}})
+
+# ======================================================
+# Altair (import lười: chỉ nạp khi thật sự vẽ)
+# ======================================================
+def line_chart(df, x="month", y="payment", max_points=DEFAULT_MAX_POINTS, width=None):
+    """Biểu đồ đường với dữ liệu đã giảm mẫu; y có thể là một cột hoặc list cột."""
+    import altair as alt
+    ys = [y] if isinstance(y, str) else list(y)
+    data = downsample_frame(df[[x] + ys], x, ys, max_points)
+    if len(ys) == 1:
+        chart = alt.Chart(data).mark_line().encode(x=x, y=ys[0])
+    else:
+        chart = alt.Chart(data).transform_fold(ys, as_=["series", "value"]).mark_line().encode(
+            x=x, y="value:Q", color="series:N")
+    return chart.properties(width=width) if width else chart
+
+def runoff_chart(runoff_df, max_points=DEFAULT_MAX_POINTS, width=None):
+    """Tổng dư nợ danh mục theo tháng, kèm dải phân vị dư nợ từng khoản nếu có (runoff_df từ PortfolioBook.runoff)."""
+    import altair as alt
+    total = line_chart(runoff_df, "month", "total_balance", max_points, width)
+    bands = [c for c in runoff_df.columns if c.startswith("p") and c.endswith("_balance")]
+    if len(bands) < 2:
+        return total
+    lo, hi = bands[0], bands[-1]
+    data = downsample_frame(runoff_df[["month", lo, hi]], "month", [lo, hi], max_points)
+    band = alt.Chart(data).mark_area(opacity=0.3).encode(x="month", y=lo, y2=hi)
+    layers = [band]
+    if len(bands) > 2:
+        layers.append(line_chart(runoff_df, "month", bands[len(bands) // 2], max_points, width))
+    per_loan = alt.layer(*layers).properties(title="Phân vị dư nợ mỗi khoản vay")
+    return alt.vconcat(total.properties(title="Tổng dư nợ danh mục"), per_loan)
@@ -1,11 +1,36 @@
 import streamlit as st
-from src.logic.finance import recalc_all
+from src.logic.finance import (recalc_all, stress_grid, max_loan, DEFAULT_DSR_CAP, DEFAULT_LTV_CAP, DEFAULT_TERMS,
+                               METHOD_ANNUITY, METHOD_EQUAL_PRINCIPAL)
+from src.ui.charts import line_chart
 
 def sidebar_api_input():
-    return st.sidebar.text_input("Gemini API Key", type="password")
+    key=st.sidebar.text_input("Gemini API Key", type="password")
+    st.session_state["gemini_api_key"]=key
+    return key
+
+@st.cache_resource
+def _gemini_client(key):
+    """Một GeminiClient cho mỗi key, dùng chung giữa các lần rerun để cache phản hồi có tác dụng."""
+    from src.ai.gemini_client import GeminiClient
+    return GeminiClient(key)
+
+def ai_commentary_panel(data):
+    """Nhận xét thẩm định do Gemini viết, dùng key nhập ở sidebar; chỉ gọi API khi bấm nút."""
+    from src.ai.gemini_client import GeminiError, appraisal_prompt
+    if st.button("Nhận xét AI", key="ai_commentary_btn"):
+        # DSR/LTV đưa vào prompt tính như recalc_all, chỉ khi thực sự gọi API
+        state={"data":data}
+        recalc_all(state)
+        try:
+            client=_gemini_client(st.session_state.get("gemini_api_key") or None)
+            st.session_state["ai_commentary"]=client.chat(appraisal_prompt(data, state["summary"]))
+        except GeminiError as e:
+            st.error(f"Gemini lỗi: {e}")
+    if st.session_state.get("ai_commentary"):
+        st.write(st.session_state["ai_commentary"])
 
 def layout_tabs(data, recalc_callback):
-    tabs=st.tabs(["Định danh","Tài chính","TSĐB","Tính toán","Biểu đồ"])
+    tabs=st.tabs(["Định danh","Tài chính","TSĐB","Tính toán","Biểu đồ","Kịch bản"])
     with tabs[0]:
         idf=data["identification"]
         idf["ten"]=st.text_input("Tên",idf["ten"])
@@ -21,6 +46,7 @@ def layout_tabs(data, recalc_callback):
         fin["so_tien_vay"]=st.number_input("Tiền vay",value=fin["so_tien_vay"])
         fin["lai_suat_p_a"]=st.number_input("Lãi suất",value=fin["lai_suat_p_a"])
         fin["thoi_han_thang"]=st.number_input("Thời hạn",value=fin["thoi_han_thang"])
+        max_loan_panel(data)
 
     with tabs[2]:
         col=data["collateral"]
@@ -30,12 +56,101 @@ def layout_tabs(data, recalc_callback):
             c["dia_chi"]=st.text_input(f"Địa chỉ {i+1}",c["dia_chi"])
             c["ltv_percent"]=st.number_input(f"LTV {i+1}",value=c["ltv_percent"])
 
+    # tính một lần cho cả hai tab; recalc_all chỉ dựng lại lịch khi tiền vay/lãi suất/thời hạn đổi
+    df=recalc_callback()
     with tabs[3]:
-        df=recalc_callback()
         st.dataframe(df.head())
+        ai_commentary_panel(data)
 
     with tabs[4]:
-        import altair as alt
-        df=recalc_callback()
-        chart=alt.Chart(df).mark_line().encode(x="month",y="payment")
-        st.altair_chart(chart, use_container_width=True)
+        st.altair_chart(line_chart(df,"month",["payment","interest","principal"]), use_container_width=True)
+        st.altair_chart(line_chart(df,"month","balance"), use_container_width=True)
+
+    with tabs[5]:
+        stress_test_panel(data)
+
+_CONSTRAINT_LABELS={"dsr":"DSR","surplus":"Thu nhập còn lại","ltv":"LTV","need":"Nhu cầu vốn"}
+
+def max_loan_panel(data):
+    """Số tiền vay tối đa theo từng thời hạn (giải ngược công thức, không phải sửa tiền vay để thử)."""
+    import pandas as pd
+    fin=data["finance"]; inc=data["income"]
+    coll_value=sum((c.get("gia_tri") or 0) for c in data.get("collateral",[]))
+    need=(fin.get("tong_nhu_cau") or 0)-(fin.get("von_doi_ung") or 0)
+    terms=sorted(set(DEFAULT_TERMS.tolist())|{int(fin.get("thoi_han_thang") or 0)}-{0})
+    kw=dict(monthly_income=inc.get("thu_nhap_hang_thang") or 0,monthly_costs=inc.get("chi_phi_hang_thang") or 0,
+            collateral_value=coll_value or None,annual_rate_percent=fin.get("lai_suat_p_a") or 0,terms=terms,
+            need=need if need>0 else None)
+    ann=max_loan(method=METHOD_ANNUITY,**kw)
+    eq=max_loan(method=METHOD_EQUAL_PRINCIPAL,**kw)
+    df=pd.DataFrame({
+        "Thời hạn (tháng)":ann["terms"],
+        "Tối đa - trả góp đều":ann["max_amount"].round(),
+        "Ràng buộc":[_CONSTRAINT_LABELS[b] for b in ann["binding"]],
+        "Tối đa - gốc đều":eq["max_amount"].round(),
+        "Ràng buộc (gốc đều)":[_CONSTRAINT_LABELS[b] for b in eq["binding"]],
+    })
+    st.markdown(f"**Số tiền vay tối đa** (DSR ≤ {DEFAULT_DSR_CAP:.0f}%, LTV ≤ {DEFAULT_LTV_CAP:.0f}%)")
+    st.dataframe(df,hide_index=True)
+    current=int(fin.get("thoi_han_thang") or 0)
+    if current in terms:
+        i=terms.index(current)
+        st.caption(f"Thời hạn {current} tháng: tối đa {ann['max_amount'][i]:,.0f} đ "
+                   f"(ràng buộc: {_CONSTRAINT_LABELS[ann['binding'][i]]})")
+
+def stress_test_panel(data):
+    """Heatmap DSR theo (cú sốc lãi suất x thời hạn); cả lưới được tính lại mỗi lần kéo slider."""
+    import altair as alt
+    import pandas as pd
+    fin=data["finance"]; inc=data["income"]
+    c1,c2,c3,c4=st.columns(4)
+    dsr_cap=c1.slider("Ngưỡng DSR (%)",10.0,100.0,DEFAULT_DSR_CAP,5.0)
+    ltv_cap=c2.slider("Ngưỡng LTV (%)",10.0,100.0,DEFAULT_LTV_CAP,5.0)
+    income_drop=c3.slider("Thu nhập giảm (%)",0,45,0,5)
+    haircut=c4.slider("Giảm giá trị TSĐB (%)",0,40,0,10)
+
+    principal=fin.get("so_tien_vay") or fin.get("tong_nhu_cau") or 0
+    coll_value=sum((c.get("gia_tri") or 0) for c in data.get("collateral",[]))
+    grid=stress_grid(principal,fin.get("lai_suat_p_a") or 0,inc.get("thu_nhap_hang_thang") or 0,coll_value,
+                     income_shocks=[income_drop/100.0],haircuts=[haircut/100.0],dsr_cap=dsr_cap,ltv_cap=ltv_cap)
+
+    R,T=grid["rate_shocks"],grid["terms"]
+    dsr=grid["dsr"][:,:,0]
+    df=pd.DataFrame({
+        "rate_shock":R.repeat(len(T)),
+        "term":list(T)*len(R),
+        "dsr":dsr.ravel().round(1),
+        "dat":["Đạt" if p else "Không đạt" for p in grid["passes"][:,:,0,0].ravel()],
+    }).replace([float("inf")],None)
+    ltv=grid["ltv"][0]
+    st.caption(f"LTV sau haircut: {ltv:.1f}%" if ltv!=float("inf") else "LTV: chưa có giá trị TSĐB")
+    heat=alt.Chart(df).mark_rect().encode(
+        x=alt.X("term:O",title="Thời hạn (tháng)"),
+        y=alt.Y("rate_shock:O",title="Lãi suất + (điểm %)",sort="descending"),
+        color=alt.Color("dsr:Q",title="DSR (%)",scale=alt.Scale(scheme="redyellowgreen",reverse=True)),
+        stroke=alt.condition(alt.datum.dat=="Đạt",alt.value(None),alt.value("black")),
+        tooltip=["rate_shock","term","dsr","dat"],
+    )
+    st.altair_chart(heat, use_container_width=True)
+
+def portfolio_panel(book):
+    """Danh mục theo chi nhánh/sản phẩm: DSR/LTV, phân bố LTV và dư nợ dự kiến (truy vấn trên dataset Arrow)."""
+    import datetime as dt
+    import altair as alt
+    from src.portfolio.book import DSR_BUCKETS, LTV_BUCKETS
+    from src.ui.charts import runoff_chart
+    c1,c2=st.columns(2)
+    dim=c1.selectbox("Nhóm theo",["branch","product"],format_func={"branch":"Chi nhánh","product":"Sản phẩm"}.get,
+                     key="portfolio_by")
+    values=sorted(v for v in book.table([dim]).column(dim).unique().to_pylist() if v is not None)
+    picked=c2.multiselect("Lọc",values,key="portfolio_filter")
+    where={dim:picked} if picked else None
+
+    st.dataframe(book.summary(by=(dim,),where=where),hide_index=True)
+    metric=st.radio("Phân bố",["ltv_percent","dsr_percent"],horizontal=True,key="portfolio_metric",
+                    format_func={"ltv_percent":"LTV","dsr_percent":"DSR"}.get)
+    dist=book.buckets(metric,LTV_BUCKETS if metric=="ltv_percent" else DSR_BUCKETS,where=where)
+    bars=alt.Chart(dist).mark_bar().encode(x=alt.X("bucket:N",sort=list(dist["bucket"].cat.categories),title=None),
+                                           y=alt.Y("so_khoan:Q",title="Số khoản"),tooltip=["bucket","so_khoan","ty_trong"])
+    st.altair_chart(bars, use_container_width=True)
+    st.altair_chart(runoff_chart(book.runoff(where=where,as_of=dt.date.today())), use_container_width=True)
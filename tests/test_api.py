@@ -0,0 +1,150 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.service.api import MAX_MONTHS, make_app, schedule_response
+
+def _with_client(scenario, **app_options):
+    async def main():
+        async with TestClient(TestServer(make_app(**{"workers": 1, **app_options}))) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+@pytest.mark.parametrize("body", [
+    {"principal": 1e9, "months": MAX_MONTHS + 1},
+    {"principal": 1e9, "months": 10 ** 8},
+    {"principal": 1e9, "months": 12, "grace_months": "a"},
+    {"principal": 1e9, "months": 12, "grace_months": 13},
+    {"principal": 1e9, "months": 12, "limit": "z"},
+    {"principal": 1e9, "months": 12, "offset": -1},
+    {"principal": 1e9, "months": 12, "rate_resets": [[1]]},
+    {"principal": 1e9, "months": 12, "rate_resets": "x"},
+    {"principal": 1e9, "months": 12, "rate_resets": [["a", 9]]},
+    {"principal": "abc", "months": 12},
+    {"data": {"finance": {"so_tien_vay": 1e9, "thoi_han_thang": 24}, "income": {"thu_nhap_hang_thang": "x"}}},
+    {"data": {"finance": {"so_tien_vay": 1e9, "thoi_han_thang": 24}, "collateral": "x"}},
+])
+def test_schedule_rejects_invalid_input(body):
+    with pytest.raises(web.HTTPBadRequest):
+        schedule_response(body)
+
+def test_schedule_offset_limit():
+    out = schedule_response({"principal": 1e9, "rate": 9, "months": 24, "grace_months": 3,
+                             "rate_resets": [[13, 10]], "offset": 12, "limit": 2})
+    assert out["total_rows"] == 24
+    assert [r[0] for r in out["rows"]] == [13, 14]
+    assert out["columns"][0] == "month" and all(type(r[0]) is int for r in out["rows"])
+    assert all(isinstance(v, float) for r in out["rows"] for v in r[1:])
+
+def _dossier():
+    return {"finance": {"so_tien_vay": 1.5e9, "lai_suat_p_a": 9.0, "thoi_han_thang": 120},
+            "income": {"thu_nhap_hang_thang": 50e6}, "collateral": [{"gia_tri": 3e9}]}
+
+def test_schedule_summary_matches_app_recalc():
+    from src.logic.finance import recalc_all
+    state = {"data": _dossier()}
+    recalc_all(state)
+    out = schedule_response({"data": _dossier(), "rate_resets": [[13, 12.0]]})
+    # khoản trả của app = kỳ đầu, không phải kỳ lớn nhất sau khi lãi suất tăng
+    assert out["summary"]["monthly_payment"] == state["summary"]["monthly_payment"]
+    assert out["summary"]["dsr_percent"] == state["summary"]["dsr_percent"]
+    assert out["summary"]["ltv_percent"] == state["summary"]["ltv_percent"]
+
+def _sheet_rows(xlsx):
+    import io
+    import re
+    import zipfile
+    sheet = zipfile.ZipFile(io.BytesIO(xlsx)).read("xl/worksheets/sheet1.xml").decode()
+    return [[float(v) for v in re.findall(r"<v>([^<]*)</v>", row)] for row in re.findall(r"<row r=\"\d+\">(.*?)</row>", sheet)[1:]]
+
+def test_export_uses_same_schedule_plan_as_schedule_endpoint():
+    from src.service.api import _export_xlsx_job, dossier_from_params, schedule_plan
+    body = {"data": _dossier(), "method": "equal_principal", "grace_months": 3, "rate_resets": [[13, 10]]}
+    data = dossier_from_params(body)
+    rows = _sheet_rows(_export_xlsx_job(data, schedule_plan(body, data["finance"]["thoi_han_thang"])))
+    assert rows == schedule_response(body)["rows"]
+
+@pytest.mark.parametrize("content", [b"not a zip", b"PK\x05\x06" + b"\0" * 18])
+def test_parse_rejects_non_docx_upload(content):
+    async def scenario(client):
+        resp = await client.post("/parse", data=content)
+        return resp.status, await resp.json()
+
+    status, body = _with_client(scenario)
+    assert status == 400 and "docx" in body["error"]
+
+def test_parse_cache_shared_with_app(tmp_path, monkeypatch):
+    from benchmarks.synthetic import make_dossier
+    from src.logic.parse_cache import shared_parse_cache
+    monkeypatch.setenv("CADAP_PARSE_CACHE_DIR", str(tmp_path))
+    content = make_dossier(0)[0]
+
+    async def scenario(client):
+        resp = await client.post("/parse", data=content)
+        return await resp.json()
+
+    out = _with_client(scenario)
+    # app (main.get_parse_cache) mở cache cùng thư mục: cùng khoá, không parse lại
+    app_cache = shared_parse_cache(disk_dir=str(tmp_path))
+    assert app_cache.key(content) == out["key"]
+    assert app_cache.get_or_parse(content) == (out["key"], out["data"])
+    assert (app_cache.hits, app_cache.misses) == (1, 0)
+
+def test_parse_route_and_cache_hit():
+    from benchmarks.synthetic import make_dossier
+    content = make_dossier(1)[0]
+
+    async def scenario(client):
+        first = await (await client.post("/parse", data=content)).json()
+        form = aiohttp.FormData()
+        form.add_field("file", content, filename="ho_so.docx")
+        second = await (await client.post("/parse", data=form)).json()
+        metrics_text = await (await client.get("/metrics")).text()
+        return first, second, metrics_text
+
+    first, second, metrics_text = _with_client(scenario)
+    assert first["cached"] is False and second["cached"] is True
+    assert first["key"] == second["key"] and first["data"] == second["data"]
+    assert first["data"]["finance"]["so_tien_vay"] > 0
+    assert "cadap_api_parse_cache_hits_total 1" in metrics_text
+
+@pytest.mark.parametrize("kind, content_type, name", [
+    ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "ke_hoach.xlsx"),
+    ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "bao_cao.docx"),
+])
+def test_export_routes(kind, content_type, name):
+    import io
+    import zipfile
+
+    async def scenario(client):
+        resp = await client.post(f"/export/{kind}", json={"data": _dossier(), "grace_months": 2})
+        bad = await client.post(f"/export/{kind}", data=b"{", headers={"Content-Type": "application/json"})
+        return resp.status, resp.headers, await resp.read(), bad.status
+
+    status, headers, body, bad_status = _with_client(scenario)
+    assert status == 200 and headers["Content-Type"] == content_type
+    assert name in headers["Content-Disposition"]
+    part = "xl/worksheets/sheet1.xml" if kind == "xlsx" else "word/document.xml"
+    assert part in zipfile.ZipFile(io.BytesIO(body)).namelist()
+    assert bad_status == 400
+
+def test_backpressure_returns_503_when_pool_is_full():
+    import time
+
+    async def scenario(client):
+        service = client.server.app["service"]
+        busy = asyncio.create_task(service.submit(time.sleep, 0.5))
+        await asyncio.sleep(0)   # chiếm chỗ duy nhất trong hàng đợi
+        rejected = await client.post("/export/xlsx", json={"data": _dossier()})
+        health = await (await client.get("/health")).json()
+        await busy
+        accepted = await client.post("/export/xlsx", json={"data": _dossier()})
+        return rejected.status, rejected.headers.get("Retry-After"), health, accepted.status, service.stats
+
+    status, retry_after, health, accepted, stats = _with_client(scenario, max_pending=1)
+    assert (status, retry_after) == (503, "1")
+    assert health["pending"] == 1 and health["max_pending"] == 1
+    assert accepted == 200 and stats["rejected"] == 1
@@ -0,0 +1,98 @@
+import csv
+import io
+import shutil
+import zipfile
+
+from src.batch.appraise_cli import PortfolioSink, _ZIPS, appraise_one, iter_sources, run
+from src.portfolio.book import PortfolioBook
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+def _docx(lines):
+    # gói .docx tối thiểu: content types, quan hệ gốc và document.xml
+    body = "".join(f'<w:p><w:r><w:t xml:space="preserve">{l}</w:t></w:r></w:p>' for l in lines)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("[Content_Types].xml",
+                   '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.'
+                   'wordprocessingml.document.main+xml"/></Types>')
+        z.writestr("_rels/.rels",
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+                   'officeDocument" Target="word/document.xml"/></Relationships>')
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{_W}"><w:body>{body}</w:body></w:document>')
+    return buf.getvalue()
+
+def _dossier(i):
+    return _docx([f"Họ và tên: Khách {i}", f"Số tiền vay: {(i + 1) * 100}.000.000 đồng", "Lãi suất: 8,5%",
+                  "Thời hạn vay: 60 tháng", "Thu nhập hàng tháng: 40.000.000 đồng"])
+
+def _dossiers(path, n):
+    path.mkdir()
+    for i in range(n):
+        (path / f"hs{i}.docx").write_bytes(_dossier(i))
+    return path
+
+def test_portfolio_rows_recovered_after_crash(tmp_path):
+    src = _dossiers(tmp_path / "in", 6)
+    out, book_dir = tmp_path / "out.csv", tmp_path / "book"
+    run(str(src), str(out), workers=1, progress=False, portfolio=PortfolioSink(str(book_dir), "HN01", "x"))
+    assert len(PortfolioBook(str(book_dir))) == 6
+
+    # crash trước khi lô danh mục được ghi: output đã có, sổ thì chưa
+    shutil.rmtree(book_dir)
+    run(str(src), str(out), workers=1, progress=False, portfolio=PortfolioSink(str(book_dir), "HN01", "x"))
+    ids = PortfolioBook(str(book_dir)).table(["loan_id"]).column(0).to_pylist()
+    assert sorted(ids) == [f"hs{i}.docx" for i in range(6)]
+    with open(out, newline="", encoding="utf-8") as f:
+        assert len(list(csv.DictReader(f))) == 6   # output không bị ghi trùng
+
+def test_portfolio_sink_flush_without_rows(tmp_path):
+    sink = PortfolioSink(str(tmp_path / "book"))
+    with sink:
+        sink.write({"source": "a.docx", "error": "BadZipFile"})
+    assert not (tmp_path / "book").exists()
+
+def test_zip_members_read_from_one_open_archive(tmp_path):
+    src = _dossiers(tmp_path / "in", 4)
+    archive = tmp_path / "ho_so.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        for f in sorted(src.iterdir()):
+            z.write(f, f"ho_so/{f.name}")
+    _ZIPS.clear()
+    rows = [appraise_one(t) for t in iter_sources(str(archive))]
+    assert [r["error"] for r in rows] == [None] * 4 and list(_ZIPS) == [str(archive)]
+    out = tmp_path / "out.csv"
+    assert run(str(archive), str(out), workers=1, progress=False) == 4
+    with open(out, newline="", encoding="utf-8") as f:
+        assert sorted(r["ten"] for r in csv.DictReader(f)) == sorted(r["ten"] for r in rows)
+
+def test_resume_drops_crash_truncated_last_line(tmp_path):
+    src = _dossiers(tmp_path / "in", 4)
+    out = tmp_path / "out.csv"
+    run(str(src), str(out), workers=1, progress=False)
+    lines = out.read_bytes().split(b"\r\n")
+    # crash khi đang ghi dòng cuối: cả dòng chỉ thiếu dấu xuống dòng cũng chưa tính là xong
+    for partial in (lines[-2][:10], lines[-2]):
+        out.write_bytes(b"\r\n".join(lines[:-2]) + b"\r\n" + partial)
+        assert run(str(src), str(out), workers=1, progress=False) == 1
+        with open(out, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert sorted(r["source"] for r in rows) == [f"hs{i}.docx" for i in range(4)]
+        assert all(r["error"] == "" for r in rows)
+
+def test_bad_files_become_error_rows_and_resume_skips_done(tmp_path):
+    src = _dossiers(tmp_path / "in", 3)
+    (src / "hong.docx").write_bytes(b"not a zip")
+    (src / "~$hs0.docx").write_bytes(b"lock file")
+    out = tmp_path / "out.csv"
+    assert run(str(src), str(out), workers=2, progress=False) == 4
+    with open(out, newline="", encoding="utf-8") as f:
+        rows = {r["source"]: r for r in csv.DictReader(f)}
+    assert sorted(rows) == ["hong.docx", "hs0.docx", "hs1.docx", "hs2.docx"]
+    assert rows["hong.docx"]["error"] and rows["hs1.docx"]["error"] == ""
+    assert float(rows["hs1.docx"]["monthly_payment"]) > 0
+    (src / "hs3.docx").write_bytes(_dossiers(tmp_path / "more", 4).joinpath("hs3.docx").read_bytes())
+    assert run(str(src), str(out), workers=2, progress=False) == 1
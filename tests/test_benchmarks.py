@@ -0,0 +1,36 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from benchmarks import run as bench
+from benchmarks.synthetic import make_dossier
+from src.logic.parser_docx import parse_docx_streamlit
+
+@pytest.mark.parametrize("seed", range(5))
+def test_synthetic_dossier_parses_to_expected_fields(seed):
+    content, expected = make_dossier(seed, pages=3, collateral_blocks=2, images=1, image_kb=16)
+    assert zipfile.ZipFile(io.BytesIO(content)).getinfo("word/media/scan1.png").file_size > 16 * 1024
+    data = parse_docx_streamlit(io.BytesIO(content))
+    assert data["identification"]["ten"] == expected["ten"]
+    assert data["identification"]["cccd"] == expected["cccd"]
+    assert data["income"]["thu_nhap_hang_thang"] == expected["thu_nhap_hang_thang"]
+    assert {k: data["finance"][k] for k in ("so_tien_vay", "lai_suat_p_a", "thoi_han_thang")} == \
+        {k: expected[k] for k in ("so_tien_vay", "lai_suat_p_a", "thoi_han_thang")}
+    assert len(data["collateral"]) == 2 and all(c["gia_tri"] > 0 for c in data["collateral"])
+
+def test_compare_flags_throughput_and_memory_regressions():
+    baseline = {"parse@100": {"throughput_per_s": 100.0, "peak_mem_mb": 10.0}}
+    ok = {"parse@100": {"throughput_per_s": 85.0, "peak_mem_mb": 12.5}, "excel@100": {"throughput_per_s": 1.0,
+                                                                                      "peak_mem_mb": 1.0}}
+    assert bench.compare(ok, baseline, 0.2) == []
+    slow = {"parse@100": {"throughput_per_s": 70.0, "peak_mem_mb": 14.0}}
+    assert [p.split(":")[0] for p in bench.compare(slow, baseline, 0.2)] == ["parse@100", "parse@100"]
+
+def test_main_writes_report(tmp_path):
+    out = tmp_path / "bench.json"
+    bench.main(["--sizes", "2", "--unique", "2", "--mem-sample", "1", "--pages", "1", "--json", str(out)])
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert sorted(report["results"]) == sorted(f"{s}@2" for s in bench.STAGES)
+    assert all(r["n"] == 2 and r["seconds"] > 0 for r in report["results"].values())
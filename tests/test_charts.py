@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from src.ui.charts import downsample_frame, line_chart, lttb
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    idx = lttb(x, y, 200)
+    assert len(idx) == 200 and idx[0] == 0 and idx[-1] == 9_999
+    assert (np.diff(idx) > 0).all() and 4321 in idx
+    assert lttb(x[:50], y[:50], 200).tolist() == list(range(50))
+    assert lttb(x, y, 2).tolist() == list(range(10_000))
+
+def test_downsample_frame_budget_split_between_columns():
+    n = 5_000
+    df = pd.DataFrame({"month": np.arange(1, n + 1), "a": np.random.default_rng(0).normal(size=n),
+                       "b": np.linspace(0, 1, n)})
+    out = downsample_frame(df, "month", ["a", "b"], max_points=300)
+    assert len(out) <= 300 and out["month"].is_monotonic_increasing
+    assert len(downsample_frame(df.iloc[:100], "month", "a", max_points=300)) == 100
+
+def test_chart_payload_does_not_grow_with_series_length():
+    df = pd.DataFrame({"month": np.arange(1, 100_001), "payment": np.linspace(1e7, 0, 100_000)})
+    spec = line_chart(df, max_points=400).to_dict()
+    assert sum(len(v) for v in spec["datasets"].values()) <= 400
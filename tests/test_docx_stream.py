@@ -0,0 +1,76 @@
+import io
+import zipfile
+
+from src.logic.docx_stream import blocks_to_lines, iter_docx_blocks, read_docx_lines
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+def _docx(body, media=None):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{_W}" xmlns:mc="{_MC}"><w:body>{body}</w:body></w:document>')
+        if media is not None:
+            z.writestr("word/media/scan1.png", media)
+    return buf.getvalue()
+
+def _p(*runs):
+    return "<w:p>" + "".join(f"<w:r>{r}</w:r>" for r in runs) + "</w:p>"
+
+def _t(text):
+    return f'<w:t xml:space="preserve">{text}</w:t>'
+
+def _tc(*paras):
+    return "<w:tc>" + "".join(paras) + "</w:tc>"
+
+def test_paragraphs_rows_and_nested_tables():
+    inner = "<w:tbl><w:tr>" + _tc(_p(_t("a"))) + _tc(_p(_t("b"))) + "</w:tr></w:tbl>"
+    body = (
+        _p(_t("Họ và tên:"), "<w:tab/>", _t("Nguyễn Văn An"))
+        + _p()
+        + _p(_t("dòng 1"), "<w:br/>", _t("dòng 2"))
+        + "<w:tbl><w:tr>" + _tc(_p(_t("Tài sản")), _p(_t("Nhà đất"))) + _tc(_p(_t("x")), inner) + "</w:tr>"
+        + "<w:tr>" + _tc(_p()) + _tc(_p()) + "</w:tr></w:tbl>"
+        + _p(_t("Cuối"))
+    )
+    blocks = list(iter_docx_blocks(_docx(body)))
+    assert blocks == [
+        ("p", "Họ và tên:\tNguyễn Văn An"),
+        ("p", "dòng 1\ndòng 2"),
+        ("row", ["Tài sản\nNhà đất", "x\na | b"]),
+        ("p", "Cuối"),
+    ]
+    assert blocks_to_lines(blocks) == ["Họ và tên:\tNguyễn Văn An", "dòng 1", "dòng 2",
+                                       "Tài sản Nhà đất\tx a | b", "Cuối"]
+
+def _textbox(*paras):
+    # Word ghi textbox hai lần: bản DrawingML trong mc:Choice và bản VML dự phòng trong mc:Fallback
+    content = "<w:txbxContent>" + "".join(paras) + "</w:txbxContent>"
+    return (f"<mc:AlternateContent><mc:Choice>{content}</mc:Choice>"
+            f"<mc:Fallback>{content}</mc:Fallback></mc:AlternateContent>")
+
+def test_textbox_paragraphs_keep_the_enclosing_paragraph_text():
+    body = (
+        _p(_t("Họ và tên:"), _textbox(_p(_t("Ghi chú")), _p(), _p(_t("đã xác minh"))), _t(" Nguyễn Văn An"))
+        + "<w:tbl><w:tr>" + _tc(_p(_t("Nhà đất"), _textbox(_p(_t("sổ hồng")))), _p(_t("2 tỷ"))) + "</w:tr></w:tbl>"
+    )
+    blocks = list(iter_docx_blocks(_docx(body)))
+    assert blocks == [
+        ("p", "Họ và tên:\nGhi chú\nđã xác minh\n Nguyễn Văn An"),
+        ("row", ["Nhà đất\nsổ hồng\n2 tỷ"]),
+    ]
+    assert blocks_to_lines(blocks) == ["Họ và tên:", "Ghi chú", "đã xác minh", "Nguyễn Văn An",
+                                       "Nhà đất sổ hồng 2 tỷ"]
+
+def test_media_parts_are_never_read():
+    # part ảnh hỏng (CRC sai) sẽ làm lỗi nếu bị giải nén
+    content = bytearray(_docx(_p(_t("Số CCCD: 012345678901")), media=b"\x89PNG" + b"\0" * 4096))
+    i = content.index(b"\x89PNG")
+    content[i + 10] = 1
+    assert read_docx_lines(bytes(content)) == ["Số CCCD: 012345678901"]
+
+def test_reads_from_file_like_at_any_position():
+    f = io.BytesIO(_docx(_p(_t("1. Họ và tên: Nguyễn Văn An")) + "<w:tbl><w:tr>" + _tc(_p(_t("Thu nhập")))
+                         + _tc(_p(_t("30.000.000"))) + "</w:tr></w:tbl>"))
+    f.read()
+    assert read_docx_lines(f) == ["1. Họ và tên: Nguyễn Văn An", "Thu nhập\t30.000.000"]
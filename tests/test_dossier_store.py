@@ -0,0 +1,58 @@
+import pytest
+
+from src.storage.dossier_store import DossierStore, StoreConflict
+
+def _dossier(ten, cccd, phone):
+    return {"identification": {"ten": ten, "cccd": cccd, "phone": phone},
+            "finance": {"so_tien_vay": 1e9, "lai_suat_p_a": 8.5, "thoi_han_thang": 120}}
+
+@pytest.fixture
+def store(tmp_path):
+    store = DossierStore(str(tmp_path / "hs.sqlite3"))
+    store.save(_dossier("Nguyễn Văn An", "079123456789", "0901234567"))
+    store.save(_dossier("Trần Thị Bình", "", ""))
+    return store
+
+@pytest.mark.parametrize("query", [{"cccd": "."}, {"cccd": "-"}, {"phone": "+"}, {"name": "."}, {"name": "-"},
+                                   {"name": " "}, {"cccd": "079123456789", "name": "?"}])
+def test_search_rejects_queries_that_normalise_to_nothing(store, query):
+    assert store.search(**query) == []
+
+def test_search_matches_normalised_queries(store):
+    assert [r["ten"] for r in store.search(cccd="079.123.456.789")] == ["Nguyễn Văn An"]
+    assert [r["ten"] for r in store.search(phone="+84 901 234 567")] == ["Nguyễn Văn An"]
+    assert [r["ten"] for r in store.search(name="tran thi")] == ["Trần Thị Bình"]
+    assert len(store.search()) == len(store.search(cccd="", name=None)) == 2
+
+def test_save_reopen_and_optimistic_versioning(tmp_path):
+    path = str(tmp_path / "hs.sqlite3")
+    a, b = DossierStore(path), DossierStore(path)      # hai worker cùng một file
+    data = _dossier("Lê Văn Cường", "012345678901", "0912345678")
+    dossier_id = a.save(data, summary={"monthly_payment": 12.0, "dsr_percent": 30.0}, upload_key="k1")
+    rec = b.get(dossier_id)
+    assert rec["data"] == data and rec["version"] == 1 and rec["summary"]["dsr_percent"] == 30.0
+    assert b.find_by_upload_key("k1")["id"] == dossier_id and b.find_by_upload_key("k2") is None
+
+    data["finance"]["so_tien_vay"] = 2e9
+    assert b.save(data, dossier_id=dossier_id, expected_version=1) == dossier_id
+    with pytest.raises(StoreConflict):
+        a.save(data, dossier_id=dossier_id, expected_version=1)
+    assert a.save(data, upload_key="k1") == dossier_id     # cùng file tải lên: cập nhật, không thêm mới
+    assert a.get(dossier_id)["version"] == 3 and a.count() == 1
+    assert len(a.schedule(dossier_id)) == 120 and a.schedule(dossier_id).principal == 2e9
+    assert a.delete(dossier_id) and a.get(dossier_id) is None and not a.delete(dossier_id)
+    with pytest.raises(KeyError):
+        a.save(data, dossier_id=dossier_id)
+
+def test_bulk_insert_and_indexed_lookups(tmp_path):
+    store = DossierStore(str(tmp_path / "hs.sqlite3"))
+    n = store.save_many((_dossier(f"Khách {i}", f"0791{i:08d}", f"09{i:08d}"), None, f"k{i}") for i in range(500))
+    assert n == 500 and store.count() == 500
+    assert store.save_many([(_dossier("Trùng", "1", "1"), None, "k7")]) == 0 and store.count() == 500
+    assert [r["ten"] for r in store.search(cccd="079100000123")] == ["Khách 123"]
+    assert {r["ten"] for r in store.search(name="khach 12", limit=20)} == {"Khách 12"} | {f"Khách 12{i}" for i in range(10)}
+    for sql, args in (("SELECT id FROM dossiers WHERE cccd = ?", ("1",)),
+                      ("SELECT id FROM dossiers WHERE phone = ?", ("1",)),
+                      ("SELECT id FROM dossiers WHERE upload_key = ?", ("k1",))):
+        plan = " ".join(r[-1] for r in store._conn().execute("EXPLAIN QUERY PLAN " + sql, args))
+        assert "USING" in plan and "INDEX" in plan
@@ -0,0 +1,75 @@
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+
+import numpy as np
+import pytest
+
+from src.export.excel_stream import write_schedule_xlsx, write_schedules_xlsx
+from src.logic.finance import amortization_arrays, amortization_schedule
+
+_NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+       "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+       "p": "http://schemas.openxmlformats.org/package/2006/relationships"}
+
+def _read_xlsx(content):
+    """{tên sheet: các dòng} theo thứ tự sheet trong workbook; ô trống -> None."""
+    z = zipfile.ZipFile(io.BytesIO(content))
+    rels = {r.get("Id"): r.get("Target") for r in ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))}
+    out = {}
+    for s in ET.fromstring(z.read("xl/workbook.xml")).iterfind("m:sheets/m:sheet", _NS):
+        target = rels[s.get(f"{{{_NS['r']}}}id")]
+        rows = []
+        for row in ET.fromstring(z.read("xl/" + target)).iterfind("m:sheetData/m:row", _NS):
+            cells = []
+            for c in row:
+                t, v = c.find("m:is/m:t", _NS), c.find("m:v", _NS)
+                cells.append(t.text if t is not None else float(v.text) if v is not None else None)
+            rows.append(cells)
+        out[s.get("name")] = rows
+    return out
+
+class _NoSeek(io.RawIOBase):
+    def __init__(self):
+        self.buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buf += b
+        return len(b)
+
+def test_long_layout_rolls_over_sheets_and_summary_comes_first():
+    a = amortization_arrays([1e9, 2e8, 5e8], [8.5, 0.0, 10.0], [24, 12, 6])
+    schedules = [(f"HD{i}", {c: a[c][i, :a["months"][i]] for c in ("payment", "interest", "principal", "balance")}
+                  | {"month": a["month"][:a["months"][i]]}) for i in range(3)]
+    target = _NoSeek()
+    assert write_schedules_xlsx(target, schedules, max_rows=20) == 42
+    book = _read_xlsx(bytes(target.buf))
+    assert list(book) == ["Tổng hợp", "Lịch trả nợ", "Lịch trả nợ (2)", "Lịch trả nợ (3)"]
+    data = [r for name in list(book)[1:] for r in book[name][1:]]
+    # max_rows tính cả dòng tiêu đề, như giới hạn dòng của Excel
+    assert [len(book[n]) for n in list(book)[1:]] == [20, 20, 5]
+    assert [r[0] for r in data] == ["HD0"] * 24 + ["HD1"] * 12 + ["HD2"] * 6
+    np.testing.assert_allclose([r[5] for r in data[:24]], a["balance"][0, :24])
+    summary = book["Tổng hợp"]
+    assert summary[0][0] == "Mã khoản vay" and [r[:2] for r in summary[1:]] == [["HD0", 24], ["HD1", 12], ["HD2", 6]]
+    assert summary[2][3] == pytest.approx(2e8)
+
+def test_per_loan_sheets_get_unique_valid_titles():
+    df = amortization_schedule(1e9, 8.5, 12)
+    buf = io.BytesIO()
+    write_schedules_xlsx(buf, [("HĐ 1/2024", df), ("hđ 1/2024", df.iloc[:0])], layout="per_loan", summary=False)
+    book = _read_xlsx(buf.getvalue())
+    assert list(book) == ["HĐ 1_2024", "hđ 1_2024 (2)"]
+    assert len(book["HĐ 1_2024"]) == 13 and book["hđ 1_2024 (2)"] == [["Tháng", "Thanh toán", "Lãi", "Gốc", "Dư nợ"]]
+    with pytest.raises(ValueError):
+        write_schedules_xlsx(io.BytesIO(), [], layout="wide")
+
+def test_single_schedule_round_trips():
+    df = amortization_schedule(1e9, 8.5, 60)
+    buf = io.BytesIO()
+    assert write_schedule_xlsx(buf, df) == 60
+    rows = _read_xlsx(buf.getvalue())["Lịch trả nợ"]
+    np.testing.assert_allclose([r[1] for r in rows[1:]], df["payment"])
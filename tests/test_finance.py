@@ -0,0 +1,159 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from src.logic.finance import (METHOD_ANNUITY, METHOD_EQUAL_PRINCIPAL, amortization_arrays, amortization_schedule,
+                               annuity_payment, max_loan, monthly_payment, payment_factor, reprice_book, reprice_tail,
+                               schedules_to_frame, step_rates, stress_grid, structured_arrays)
+
+def _loop_schedule(P, rate, n):
+    # lịch tính từng tháng, dùng làm chuẩn so sánh cho engine closed-form
+    r = rate / 100 / 12
+    A = P / n if r == 0 else P * r / (1 - (1 + r) ** -n)
+    bal, rows = P, []
+    for _ in range(n):
+        interest = bal * r
+        principal = min(A - interest, bal)
+        bal -= principal
+        rows.append((interest + principal, interest, principal, max(bal, 0.0)))
+    return np.array(rows).T
+
+def test_amortization_arrays_match_monthly_loop():
+    P = np.array([1e9, 5e8, 2.4e8, 0.0, 3e9])
+    R = np.array([8.5, 12.0, 0.0, 9.0, 6.25])
+    N = np.array([240, 36, 24, 60, 360])
+    a = amortization_arrays(P, R, N)
+    assert a["payment"].shape == (5, 360) and a["month"].tolist() == list(range(1, 361))
+    for i in np.flatnonzero(P > 0):
+        expected = _loop_schedule(P[i], R[i], N[i])
+        for col, row in zip(("payment", "interest", "principal", "balance"), expected):
+            np.testing.assert_allclose(a[col][i, :N[i]], row, rtol=1e-9, atol=1e-3)
+            assert not a[col][i, N[i]:].any()
+    assert not a["payment"][3].any()
+    np.testing.assert_allclose(a["payment"][:, 0], annuity_payment(P, R, N))
+    assert monthly_payment(1e9, 8.5, 240) == annuity_payment(1e9, 8.5, 240)[0]
+    assert monthly_payment(None, None, None) == 0.0
+
+def test_selected_months_and_long_frame():
+    a = amortization_arrays([1e9, 2e8], [8.5, 10.0], [240, 12])
+    part = amortization_arrays([1e9, 2e8], [8.5, 10.0], [240, 12], month=[1, 12, 13, 240])
+    np.testing.assert_allclose(part["balance"], a["balance"][:, [0, 11, 12, 239]])
+    df = schedules_to_frame(a, loan_ids=["a", "b"])
+    assert (df["loan_id"] == "a").sum() == 240 and (df["loan_id"] == "b").sum() == 12
+    single = amortization_schedule(1e9, 8.5, 240)
+    np.testing.assert_allclose(single["payment"], df.loc[df["loan_id"] == "a", "payment"])
+    assert amortization_schedule(0, 8.5, 240).empty
+
+def _rebuild(principal, months, rates):
+    return structured_arrays(principal, months, rates)
+
+def test_reprice_book_loans_past_next_reset():
+    P, N = np.array([1e9, 2e9, 5e8]), np.array([240, 240, 24])
+    x = structured_arrays(P, N, 8.0)
+    # khoản 2 đã qua kỳ reset cuối trong kỳ hạn (reset kế tiếp 253 > 240), khoản 3 sắp đáo hạn
+    as_of = np.array([10, 230, 20])
+    reprice_book(x, 1.0, as_of_month=as_of, reset_every=36)
+
+    rates = step_rates(8.0, N, n_loans=3)
+    rates[0, 36:] += 1.0
+    expected = _rebuild(P, N, rates)
+    for col in ("payment", "interest", "principal", "balance"):
+        np.testing.assert_allclose(x[col], expected[col], rtol=1e-9, atol=1e-3)
+    np.testing.assert_array_equal(x["balance"][1], structured_arrays(P[1:2], N[1:2], 8.0)["balance"][0])
+
+def test_reprice_tail_start_beyond_term_passes_through():
+    P, N = np.array([1e9, 2e9]), np.array([60, 240])
+    x = structured_arrays(P, N, 8.0)
+    reprice_tail(x, np.array([61, 300]), 10.0)
+    expected = structured_arrays(P, N, 8.0)
+    for col in ("payment", "balance"):
+        np.testing.assert_allclose(x[col], expected[col])
+
+    x = structured_arrays(P, N, 8.0)
+    reprice_tail(x, np.array([61, 121]), 10.0)
+    rates = step_rates(8.0, N, n_loans=2)
+    rates[1, 120:] = 10.0
+    np.testing.assert_allclose(x["balance"], _rebuild(P, N, rates)["balance"], rtol=1e-9, atol=1e-3)
+
+@pytest.mark.parametrize("method", [METHOD_ANNUITY, METHOD_EQUAL_PRINCIPAL])
+def test_max_loan_terms_within_grace(method):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = max_loan(50_000_000, 10_000_000, 3e9, 8.5, terms=[12, 24, 60], method=method, grace_months=24)
+        assert np.isinf(payment_factor([8.5, 0.0], 12, method, grace_months=12)).all()
+    assert out["max_amount"][:2].tolist() == [0.0, 0.0] and out["payment"][:2].tolist() == [0.0, 0.0]
+    assert out["max_amount"][2] > 0 and np.isclose(out["payment"][2], 50_000_000 * 0.6)
+    with pytest.raises(ValueError):
+        payment_factor(8.5, 60, method, grace_months=-1)
+
+def test_stress_grid_matches_scenario_by_scenario():
+    g = stress_grid(2e9, 8.5, 60_000_000, 3e9, rate_shocks=[0, 1, 2, 3], terms=[60, 120, 240],
+                    income_shocks=[0, 0.2, 1.0], haircuts=[0, 0.5, 1.0])
+    for i, shock in enumerate(g["rate_shocks"]):
+        for j, n in enumerate(g["terms"]):
+            pay = monthly_payment(2e9, 8.5 + shock, n)
+            assert g["payment"][i, j] == pytest.approx(pay)
+            for k, cut in enumerate(g["income_shocks"]):
+                income = 60_000_000 * (1 - cut)
+                dsr = pay / income * 100 if income > 0 else np.inf
+                assert g["dsr"][i, j, k] == pytest.approx(dsr)
+                for h, ltv in enumerate(g["ltv"]):
+                    assert g["passes"][i, j, k, h] == (dsr <= 60 and ltv <= 70)
+    np.testing.assert_allclose(g["ltv"], [2e9 / 3e9 * 100, 2e9 / 1.5e9 * 100, np.inf])
+    ok = g["passes"][:, 2, 0, 0]
+    assert ok.any() and g["max_rate_shock"][2, 0, 0] == g["rate_shocks"][ok][-1]
+    assert np.isnan(g["max_rate_shock"][:, 2, :]).all()      # thu nhập mất hết: không kịch bản nào đạt
+    assert stress_grid(0, 8.5, 0, 0, terms=[60])["passes"].all()
+
+def _loop_structured(P, n, rates, equal_principal, grace):
+    # chuẩn so sánh: từng tháng, annuity tính lại trên số kỳ còn lại, gốc đều = P / số kỳ trả gốc
+    bal, out = P, []
+    for k in range(1, n + 1):
+        r = rates[k - 1] / 100 / 12
+        interest = bal * r
+        if k <= grace:
+            principal = 0.0
+        elif equal_principal:
+            principal = min(P / (n - grace), bal)
+        else:
+            rem = n - k + 1
+            A = bal / rem if r == 0 else bal * r / (1 - (1 + r) ** -rem)
+            principal = min(A - interest, bal)
+        bal -= principal
+        out.append((interest + principal, interest, principal, max(bal, 0.0)))
+    return np.array(out).T
+
+def test_structured_arrays_match_monthly_loop():
+    P, N = np.array([1e9, 6e8, 2e8, 5e8]), np.array([120, 60, 36, 24])
+    rates = step_rates(8.0, N, resets=[(13, 9.5), (25, 0.0), (37, 7.25)], n_loans=4)
+    eq, G = np.array([False, True, False, True]), np.array([12, 6, 0, 30])
+    x = structured_arrays(P, N, rates, method=eq, grace_months=G)
+    for i in range(4):
+        g = min(G[i], N[i] - 1)
+        expected = _loop_structured(P[i], N[i], rates[i], eq[i], g)
+        for col, row in zip(("payment", "interest", "principal", "balance"), expected):
+            np.testing.assert_allclose(x[col][i, :N[i]], row, rtol=1e-9, atol=1e-3)
+        assert x["balance"][i, N[i] - 1] == pytest.approx(0.0, abs=1e-3)
+    assert not x["principal"][0, :12].any() and x["principal"][1, 6] == pytest.approx(6e8 / 54)
+    df = amortization_schedule(1e9, 8.0, 120, method=METHOD_EQUAL_PRINCIPAL, grace_months=12,
+                               rate_resets=[(13, 9.5), (25, 0.0), (37, 7.25)])
+    np.testing.assert_allclose(df["payment"], _loop_structured(1e9, 120, rates[0], True, 12)[0], rtol=1e-9)
+
+@pytest.mark.parametrize("method", [METHOD_ANNUITY, METHOD_EQUAL_PRINCIPAL])
+def test_max_loan_round_trips_through_schedule(method):
+    terms = np.array([60, 120, 240])
+    out = max_loan(50_000_000, 5_000_000, None, 9.0, terms=terms, method=method, grace_months=6)
+    assert out["binding"].tolist() == ["dsr"] * 3 and np.isinf(out["limits"]["ltv"]).all()
+    for amount, n in zip(out["max_amount"], terms):
+        x = structured_arrays(amount, n, 9.0, method=method, grace_months=6)
+        assert x["payment"][0].max() == pytest.approx(50_000_000 * 0.6)
+    assert (np.diff(out["max_amount"]) > 0).all()
+
+def test_max_loan_binding_constraint():
+    out = max_loan(50_000_000, 40_000_000, 1.5e9, 9.0, terms=[12, 240], need=1.2e9)
+    assert out["binding"].tolist() == ["surplus", "ltv"]
+    assert out["max_amount"][1] == pytest.approx(1.5e9 * 0.7)
+    assert out["payment"][0] == pytest.approx(10_000_000)
+    assert max_loan(50_000_000, 0, 5e9, 9.0, terms=[360], need=8e8)["binding"].tolist() == ["need"]
+    assert max_loan(0, 0, 5e9, 9.0, terms=[60])["max_amount"].tolist() == [0.0]
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from src.ai.gemini_client import (AsyncGeminiClient, GeminiClient, GeminiError, ResponseCache, TokenBucket,
+                                  appraisal_prompt)
+from src.ai.mock_server import start_mock_server
+
+def test_api_key_sent_in_header_not_query():
+    seen = []
+
+    async def generate(request):
+        seen.append((dict(request.query), request.headers.get("x-goog-api-key")))
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/v1beta/models/{model}", generate)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with AsyncGeminiClient("secret", base_url=f"http://127.0.0.1:{port}", cache=False) as client:
+                return await client.generate("xin chào")
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(main()) == "ok"
+    assert seen == [({}, "secret")]
+
+def _run_against_mock(scenario, **server_options):
+    async def main():
+        options = {"latency": 0.0, "jitter": 0.0, "seed": 0, **server_options}
+        runner, base_url = await start_mock_server(**options)
+        try:
+            return await scenario(base_url), runner.app["stats"]
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+def _client(base_url, **kwargs):
+    kwargs.setdefault("rate_per_s", None)
+    kwargs.setdefault("backoff_base", 0.01)
+    return AsyncGeminiClient("k", base_url=base_url, **kwargs)
+
+def test_retries_5xx_until_success():
+    async def scenario(base_url):
+        async with _client(base_url, cache=False, max_retries=3) as client:
+            return await client.generate("p")
+
+    text, stats = _run_against_mock(scenario, fail_first=2)
+    assert text.startswith("[mock")
+    assert (stats["requests"], stats["failed"], stats["ok"]) == (3, 2, 1)
+
+def test_gives_up_after_max_retries():
+    async def scenario(base_url):
+        async with _client(base_url, cache=False, max_retries=2) as client:
+            with pytest.raises(GeminiError) as exc:
+                await client.generate("p")
+            return exc.value.status
+
+    status, stats = _run_against_mock(scenario, failure_rate=1.0)
+    assert status == 503
+    assert stats["requests"] == 3
+
+def test_429_honours_retry_after():
+    async def scenario(base_url):
+        async with _client(base_url, cache=False, max_retries=3) as client:
+            t0 = time.monotonic()
+            out = await client.generate_many([f"p{i}" for i in range(3)], return_exceptions=False)
+            return out, time.monotonic() - t0
+
+    (out, elapsed), stats = _run_against_mock(scenario, max_rps=2)
+    assert len(out) == 3 and stats["ok"] == 3
+    assert stats["throttled"] >= 1
+    # mock trả Retry-After: 1 -> request bị chặn đợi đủ 1 giây rồi mới thử lại
+    assert elapsed >= 0.9
+
+def test_token_bucket_limits_rate():
+    async def main():
+        bucket = TokenBucket(rate=20, capacity=1)
+        t0 = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - t0
+
+    assert asyncio.run(main()) >= 4 / 20 * 0.9
+
+def test_client_rate_limit_spaces_requests():
+    async def scenario(base_url):
+        async with _client(base_url, cache=False, rate_per_s=10, burst=1) as client:
+            t0 = time.monotonic()
+            await client.generate_many([f"p{i}" for i in range(6)], return_exceptions=False)
+            return time.monotonic() - t0
+
+    elapsed, stats = _run_against_mock(scenario)
+    assert stats["requests"] == 6
+    assert elapsed >= 5 / 10 * 0.9
+
+def test_cache_hit_skips_request(tmp_path):
+    async def scenario(base_url):
+        cache = ResponseCache(disk_dir=str(tmp_path))
+        async with _client(base_url, cache=cache) as client:
+            first = await client.generate("p")
+            again = await client.generate("p")
+        # cache trên đĩa: client mới vẫn không gọi lại API
+        async with _client(base_url, cache=ResponseCache(disk_dir=str(tmp_path))) as client:
+            reopened = await client.generate("p")
+        return first, again, reopened
+
+    (first, again, reopened), stats = _run_against_mock(scenario)
+    assert first == again == reopened
+    assert stats["requests"] == 1
+
+def test_identical_inflight_prompts_deduplicated():
+    async def scenario(base_url):
+        async with _client(base_url, cache=False) as client:
+            return await client.generate_many(["p"] * 5 + ["q"], return_exceptions=False)
+
+    out, stats = _run_against_mock(scenario, latency=0.1)
+    assert len(set(out[:5])) == 1 and out[5] != out[0]
+    assert stats["requests"] == 2
+
+def test_commentary_batch_keeps_order_within_concurrency_limit():
+    dossiers = [({"identification": {"cccd": "079123456789"}, "finance": {"so_tien_vay": (i + 1) * 10**8},
+                  "income": {}, "collateral": []}, {"dsr_percent": 10.0 + i}) for i in range(12)]
+
+    async def scenario(base_url):
+        async with _client(base_url, cache=False, max_concurrency=3) as client:
+            t0 = time.perf_counter()
+            out = await client.appraisal_commentary_batch(dossiers)
+            return out, time.perf_counter() - t0
+
+    (out, elapsed), stats = _run_against_mock(scenario, latency=0.05)
+    prompts = [appraisal_prompt(d, s) for d, s in dossiers]
+    assert [hashlib.sha256(p.encode("utf-8")).hexdigest()[:12] in text for p, text in zip(prompts, out)] == [True] * 12
+    assert "079123456789" not in prompts[0]
+    assert stats["requests"] == 12 and elapsed >= 12 / 3 * 0.05 * 0.9
+
+def test_sync_client_reuses_its_cache_across_chat_calls():
+    loop = asyncio.new_event_loop()
+    runner, base_url = loop.run_until_complete(start_mock_server(latency=0.0, jitter=0.0, seed=0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        client = GeminiClient("k", base_url=base_url, rate_per_s=None)
+        assert client.chat("p") == client.chat("p")
+        assert runner.app["stats"]["requests"] == 1
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
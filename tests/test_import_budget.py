@@ -0,0 +1,10 @@
+import pytest
+
+from benchmarks.import_budget import BUDGETS, measure
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_heavy_libraries_not_loaded_at_import(name):
+    # chỉ kiểm tra tập thư viện bị nạp; thời gian import phụ thuộc máy, xem benchmarks/import_budget.py
+    modules, _budget_ms, forbidden = BUDGETS[name]
+    _ms, loaded = measure(modules, repeat=1)
+    assert not loaded & set(forbidden)
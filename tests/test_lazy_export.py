@@ -0,0 +1,52 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from src.export.lazy_export import ExportManager, dossier_key
+
+def test_dossier_key_is_stable_and_sensitive_to_schedule():
+    a = {"finance": {"so_tien_vay": 1, "lai_suat_p_a": 8.5}, "income": {}}
+    b = {"income": {}, "finance": {"lai_suat_p_a": 8.5, "so_tien_vay": 1}}
+    df = pd.DataFrame({"month": [1, 2], "payment": [10.0, 10.0]})
+    assert dossier_key(a) == dossier_key(b) == dossier_key(a, df.iloc[:0])
+    assert dossier_key(a, df) != dossier_key(a) and dossier_key(a, df) == dossier_key(b, df.copy())
+    assert dossier_key(a, df) != dossier_key(a, df.assign(payment=[10.0, 11.0]))
+
+def test_builds_once_per_key_on_copied_arguments():
+    calls = []
+    gate = threading.Event()
+    def build(data):
+        gate.wait(5)
+        calls.append(data["n"])
+        return str(data["n"]).encode()
+
+    exports = ExportManager(max_workers=1)
+    data = {"n": 1}
+    fut = exports.submit("xlsx", "k1", build, data)
+    data["n"] = 2                                  # sửa tiếp trên UI khi file đang dựng
+    assert exports.submit("xlsx", "k1", build, data) is fut and exports.pending("xlsx", "k1")
+    assert exports.result("xlsx", "k1") is None
+    gate.set()
+    assert fut.result(5) == b"1" and exports.result("xlsx", "k1") == b"1"
+    assert exports.submit("xlsx", "k1", build, data) is fut and calls == [1]
+    assert exports.future("docx", "k1") is None
+
+def test_failed_build_is_retried_and_old_entries_evicted():
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("template lỗi")
+        return b"ok"
+
+    exports = ExportManager(max_entries=2)
+    first = exports.submit("docx", "k", flaky)
+    with pytest.raises(RuntimeError):
+        first.result(5)
+    with pytest.raises(RuntimeError):
+        exports.result("docx", "k")
+    assert exports.submit("docx", "k", flaky).result(5) == b"ok"
+    exports.submit("docx", "k2", bytes).result(5)
+    exports.submit("docx", "k3", bytes).result(5)
+    assert exports.future("docx", "k") is None and exports.future("docx", "k3") is not None
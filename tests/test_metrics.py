@@ -0,0 +1,73 @@
+import multiprocessing as mp
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.monitoring import metrics
+
+@pytest.fixture
+def textfile(tmp_path, monkeypatch):
+    for name, value in (("_ENABLED", False), ("_TEXTFILE", None), ("_TEXTFILE_INTERVAL", 15.0),
+                        ("_NEXT_WRITE", 0.0), ("_STATS", {})):
+        monkeypatch.setattr(metrics, name, value)
+    return str(tmp_path / "cadap.prom")
+
+def _calls(path, stage):
+    with open(path, encoding="utf-8") as f:
+        m = re.search(r'cadap_stage_calls_total\{pid="\d+",stage="%s"\} (\d+)' % stage, f.read())
+    return int(m.group(1)) if m else 0
+
+def _job(i):
+    metrics.record("job", 0.001)
+    return os.getpid()
+
+def test_textfile_is_written_on_interval_not_every_call(textfile):
+    metrics.enable(textfile=textfile, textfile_interval=3600)
+    path = metrics.textfile_path()
+    assert path.endswith(f"cadap.{os.getpid()}.prom")
+    for _ in range(5):
+        metrics.record("parse", 0.01)
+    assert _calls(path, "parse") == 1
+    metrics.flush()
+    assert _calls(path, "parse") == 5
+
+def test_pid_placeholder_in_textfile_path(textfile):
+    metrics.enable(textfile=textfile.replace("cadap.prom", "cadap-{pid}.prom"))
+    assert metrics.textfile_path(42).endswith("cadap-42.prom")
+
+def test_pool_workers_write_one_file_each(textfile):
+    metrics.enable(textfile=textfile, textfile_interval=3600)
+    metrics.record("parent", 0.01)
+    with ProcessPoolExecutor(2, mp_context=mp.get_context("fork")) as pool:
+        pids = set(pool.map(_job, range(20)))
+    for pid in pids:
+        path = metrics.textfile_path(pid)
+        # file của worker được ghi lần cuối khi worker thoát, chỉ chứa số liệu của chính nó
+        assert os.path.exists(path) and _calls(path, "parent") == 0
+    assert sum(_calls(metrics.textfile_path(pid), "job") for pid in pids) == 20
+    assert _calls(metrics.textfile_path(), "parent") == 1
+
+def test_disabled_by_default_and_stages_accumulate_when_enabled(textfile):
+    @metrics.timed("double", size=lambda r, xs: {"items": len(xs)})
+    def double(xs):
+        return [2 * x for x in xs]
+
+    assert double([1, 2]) == [2, 4] and metrics.snapshot() == {}
+    with metrics.stage("noop") as m:
+        m["rows"] = 1
+    assert metrics.snapshot() == {}
+
+    metrics.enable()
+    double([1, 2, 3])
+    double([4])
+    with metrics.stage("chart", rows=10) as m:
+        m["points"] = 5
+    snap = metrics.snapshot()
+    assert snap["double"]["calls"] == 2 and snap["double"]["sizes"] == {"items": 4}
+    assert snap["chart"]["sizes"] == {"rows": 10, "points": 5}
+    text = metrics.render_prometheus()
+    assert 'cadap_stage_calls_total{stage="double"} 2' in text
+    assert 'cadap_stage_input_size_total{stage="chart",kind="points"} 5' in text
+    assert 'pid="' not in text and not os.listdir(os.path.dirname(textfile))
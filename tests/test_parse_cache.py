@@ -0,0 +1,38 @@
+from benchmarks.synthetic import make_dossier
+from src.logic.parse_cache import ParseCache, shared_parse_cache
+
+def _counting_parser():
+    calls = []
+    def parse(f):
+        calls.append(1)
+        return {"finance": {"so_tien_vay": len(f.read())}, "collateral": []}
+    return parse, calls
+
+def test_same_bytes_parsed_once_and_results_are_copies():
+    parse, calls = _counting_parser()
+    cache = ParseCache(parse, "1")
+    k1, d1 = cache.get_or_parse(b"abc")
+    d1["finance"]["so_tien_vay"] = 0             # sửa của người gọi không làm bẩn cache
+    k2, d2 = cache.get_or_parse(b"abc")
+    assert k1 == k2 and d2["finance"]["so_tien_vay"] == 3
+    assert len(calls) == 1 and (cache.hits, cache.misses) == (1, 1)
+    assert ParseCache(parse, "2").key(b"abc") != k1
+
+def test_lru_eviction_and_disk_cache_shared_between_instances(tmp_path):
+    parse, calls = _counting_parser()
+    cache = ParseCache(parse, "1", max_entries=2, disk_dir=str(tmp_path))
+    for content in (b"a", b"bb", b"ccc"):
+        cache.get_or_parse(content)
+    assert len(cache._mem) == 2 and cache.key(b"a") not in cache._mem
+    cache.get_or_parse(b"a")                     # bị đẩy khỏi bộ nhớ nhưng còn trên đĩa
+    other = ParseCache(parse, "1", disk_dir=str(tmp_path))
+    assert other.lookup(cache.key(b"bb")) == {"finance": {"so_tien_vay": 2}, "collateral": []}
+    assert len(calls) == 3 and other.lookup("0" * 64) is None
+
+def test_shared_cache_parses_real_dossier():
+    content, expected = make_dossier(7)
+    cache = shared_parse_cache()
+    _, data = cache.get_or_parse(content)
+    assert data["identification"]["ten"] == expected["ten"]
+    assert data["finance"]["so_tien_vay"] == expected["so_tien_vay"]
+    assert cache.get_or_parse(content)[1] == data and cache.hits == 1
@@ -0,0 +1,122 @@
+import io
+
+from src.logic.parser_docx import extract_fields, segment_collateral
+
+def _values(lines):
+    return [a["gia_tri"] for a in segment_collateral([("p", line) for line in lines])]
+
+def test_arabic_heading_without_colon_opens_section():
+    assert _values(["3. Tài sản bảo đảm", "- Giá trị: 1.500.000.000 đồng"]) == [1_500_000_000]
+
+def test_arabic_heading_closes_section():
+    lines = [
+        "4. Tài sản bảo đảm",
+        "- Giá trị: 2.000.000.000 đồng",
+        "5. Đánh giá hiệu quả",
+        "Giá trị hợp đồng đầu ra: 9.000.000.000 đồng",
+    ]
+    assert _values(lines) == [2_000_000_000]
+
+def test_arabic_heading_closes_roman_section():
+    lines = [
+        "III. TÀI SẢN BẢO ĐẢM",
+        "Tài sản 1: Nhà đất tại phường Bến Nghé",
+        "Giá trị định giá: 2.000.000.000 đồng",
+        "5. Đánh giá hiệu quả",
+        "Giá trị hợp đồng đầu ra: 9.000.000.000 đồng",
+    ]
+    assert _values(lines) == [2_000_000_000]
+
+def test_letter_headings():
+    lines = [
+        "b) Tài sản bảo đảm",
+        "Giá trị: 800.000.000 đồng",
+        "c) Phương án trả nợ",
+        "Giá trị doanh thu dự kiến: 3.000.000.000 đồng",
+    ]
+    assert _values(lines) == [800_000_000]
+
+def test_numbered_assets_inside_section_are_not_headings():
+    lines = [
+        "3. Tài sản bảo đảm",
+        "1. Quyền sử dụng đất tại xã An Phú",
+        "Giá trị: 1.000.000.000 đồng",
+        "2. Căn hộ chung cư tại quận 7",
+        "Giá trị: 2.000.000.000 đồng",
+        "4. Nguồn trả nợ",
+        "Giá trị tiền lương: 500.000.000 đồng",
+    ]
+    assert _values(lines) == [1_000_000_000, 2_000_000_000]
+
+def test_second_valuation_line_does_not_open_new_asset():
+    lines = [
+        "Tài sản bảo đảm 1: nhà đất tại xã An Phú",
+        "Giá trị định giá: 2.000.000.000 đồng",
+        "Giá trị thị trường: 2.200.000.000 đồng",
+    ]
+    assert _values(lines) == [2_000_000_000]
+
+def test_appraised_value_wins_over_earlier_value():
+    lines = [
+        "Tài sản bảo đảm 1: nhà đất tại xã An Phú",
+        "Giá trị thị trường: 2.200.000.000 đồng",
+        "Giá trị định giá: 2.000.000.000 đồng",
+        "Tài sản bảo đảm 2: xe ô tô Toyota",
+        "Giá trị: 600.000.000 đồng",
+    ]
+    assert _values(lines) == [2_000_000_000, 600_000_000]
+
+def test_values_in_ty_and_trieu():
+    lines = [
+        "Tài sản bảo đảm 1: nhà đất tại xã An Phú",
+        "Giá trị định giá: 2 tỷ đồng",
+        "Tài sản bảo đảm 2: căn hộ quận 7",
+        "Giá trị định giá: 1,5 tỷ",
+        "Tài sản bảo đảm 3: xe ô tô",
+        "Giá trị: 1 tỷ 200 triệu đồng",
+        "Tài sản bảo đảm 4: sổ tiết kiệm",
+        "Giá trị: 800 triệu đồng",
+    ]
+    assert _values(lines) == [2_000_000_000, 1_500_000_000, 1_200_000_000, 800_000_000]
+
+def test_unparseable_value_keeps_asset():
+    lines = ["Tài sản bảo đảm 1: nhà đất tại xã An Phú", "Giá trị định giá: theo chứng thư thẩm định"]
+    assets = segment_collateral([("p", line) for line in lines])
+    assert [(a["loai"], a["gia_tri"]) for a in assets] == [("Bất động sản", 0)]
+
+def test_extract_fields_pattern_priority_and_first_line():
+    lines = [
+        "Căn cứ hồ sơ khách hàng",
+        "Họ và tên: (bà) Trần Thị Hoa",         # chỉ khớp pattern thứ hai
+        "Họ và tên: Nguyễn Văn An",             # pattern đầu thắng dù ở dòng sau
+        "Họ và tên: Lê Văn Bình",               # cùng pattern: dòng đầu tiên thắng
+        "Lãi suất: không cố định",              # chuyển đổi lỗi -> bỏ qua, đọc dòng sau
+        "Lãi suất: 8,5 %/năm",
+        "Thời hạn vay: 120 tháng",
+        "Số tiền vay: 1.200.000.000 đồng",
+    ]
+    fields = extract_fields(lines)
+    assert fields["ten"] == "Nguyễn Văn An"
+    assert fields["lai_suat_p_a"] == 8.5 and fields["thoi_han_thang"] == 120
+    assert fields["so_tien_vay"] == 1_200_000_000
+    assert "cccd" not in fields and extract_fields(["không có nhãn nào"]) == {}
+
+def test_collateral_table_rows_and_duplicates():
+    from src.logic.parser_docx import parse_docx_streamlit
+    from tests.test_docx_stream import _docx, _p, _t, _tc
+    def row(*cells):
+        return "<w:tr>" + "".join(_tc(_p(_t(c))) for c in cells) + "</w:tr>"
+    body = (
+        _p(_t("IV. TÀI SẢN BẢO ĐẢM"))
+        + "<w:tbl>" + row("STT", "Tài sản", "Số GCN", "Địa chỉ", "Giá trị định giá")
+        + row("1", "Quyền sử dụng đất", "CS 123456", "Thửa 12, Hà Nội", "2.000.000.000 đồng")
+        + row("2", "Xe ô tô Toyota", "", "", "800 triệu")
+        + row("", "Tổng cộng", "", "", "2.800.000.000 đồng") + "</w:tbl>"
+        # cùng tài sản nhắc lại trong đoạn văn: gộp theo số giấy chứng nhận
+        + _p(_t("Tài sản 1: Quyền sử dụng đất")) + _p(_t("Giấy chứng nhận số: CS-123456"))
+        + _p(_t("V. ĐÁNH GIÁ"))
+    )
+    assets = parse_docx_streamlit(io.BytesIO(_docx(body)))["collateral"]
+    assert [(a["loai"], a["gia_tri"]) for a in assets] == [("Bất động sản", 2_000_000_000),
+                                                          ("Phương tiện vận tải", 800_000_000)]
+    assert assets[0]["dia_chi"] == "Thửa 12, Hà Nội" and assets[0]["giay_to"] == "CS 123456"
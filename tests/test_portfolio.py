@@ -0,0 +1,125 @@
+import datetime as dt
+import os
+
+import numpy as np
+
+from src.logic.finance import amortization_arrays
+from src.portfolio.book import PortfolioBook
+
+def _row(i, branch="HN01"):
+    return {"loan_id": str(i), "branch": branch, "product": "mua nhà",
+            "so_tien_vay": 1e9, "lai_suat_p_a": 8.5, "thoi_han_thang": 120}
+
+def _parts(path):
+    return [f for f in os.listdir(path) if f.endswith(".arrow")]
+
+def test_single_row_appends_are_compacted(tmp_path):
+    book = PortfolioBook(str(tmp_path), auto_compact=8)
+    for i in range(100):
+        book.append([_row(i, "HN01" if i % 2 else "HCM")])
+    assert len(_parts(tmp_path)) < 8
+    assert len(book) == 100 == len(PortfolioBook(str(tmp_path)))
+    ids = PortfolioBook(str(tmp_path)).table(["loan_id"]).column(0).to_pylist()
+    assert sorted(ids, key=int) == [str(i) for i in range(100)]
+    assert book.summary(by=("branch",))["so_khoan"].tolist() == [50, 50]
+
+def test_compact_skips_when_locked(tmp_path):
+    book = PortfolioBook(str(tmp_path), auto_compact=None)
+    for i in range(5):
+        book.append([_row(i)])
+    (tmp_path / ".compact.lock").touch()
+    assert book.compact() == 0 and len(_parts(tmp_path)) == 5
+    os.remove(tmp_path / ".compact.lock")
+    assert book.compact() == 5 and len(_parts(tmp_path)) == 1 and len(book) == 5
+
+def test_runoff_matches_per_loan_schedules(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 400
+    P = rng.uniform(1e8, 5e9, n)
+    R = np.round(rng.uniform(6.0, 11.0, n), 2)
+    R[:20] = 0.0
+    N = rng.choice([12, 60, 240], n)
+    appraised = np.datetime64("2020-01-01", "s") + rng.integers(0, 6 * 365 * 86400, n).astype("timedelta64[s]")
+    book = PortfolioBook(str(tmp_path))
+    book.append({"loan_id": np.arange(n).astype(str), "branch": ["HN01"] * n, "product": ["mua nhà"] * n,
+                 "appraised_at": appraised, "so_tien_vay": P, "lai_suat_p_a": R, "thoi_han_thang": N})
+    out = book.runoff(as_of=dt.date(2026, 1, 1), percentiles=())
+
+    months = appraised.astype("datetime64[M]").astype(int)
+    E = np.maximum((2026 - 1970) * 12 - months, 0)
+    a = amortization_arrays(P, R, N)
+    balance, payment, active = np.zeros(len(out)), np.zeros(len(out)), np.zeros(len(out))
+    for i in np.flatnonzero(E < N):
+        tail = slice(E[i], N[i])
+        balance[:N[i] - E[i]] += a["balance"][i, tail]
+        payment[:N[i] - E[i]] += a["payment"][i, tail]
+        active[:N[i] - E[i]] += 1
+    assert len(out) == (N - E).max()
+    np.testing.assert_allclose(out["total_balance"], balance, rtol=1e-9, atol=1.0)
+    np.testing.assert_allclose(out["total_payment"], payment, rtol=1e-9)
+    assert out["active_loans"].tolist() == active.tolist()
+
+def test_compact_keeps_parts_hidden_after_crash_before_unlink(tmp_path):
+    import pyarrow as pa
+    book = PortfolioBook(str(tmp_path), auto_compact=None)
+    for i in range(3):
+        book.append([_row(i)])
+    # compact bị crash sau khi ghi part gộp, trước khi xoá các part cũ
+    live = book._live_tables()
+    book._write_part(pa.concat_tables([t for _, t in live]),
+                     {b"cadap.replaces": ",".join(n for n, _ in live).encode()})
+    assert len(_parts(tmp_path)) == 4 and len(book) == 3
+    book.append([_row(3)])
+    assert book.compact() == 2
+    assert len(_parts(tmp_path)) == 1
+    assert len(book) == 4 == len(PortfolioBook(str(tmp_path)))
+
+def test_compact_does_not_release_lock_taken_over_by_another_process(tmp_path):
+    book = PortfolioBook(str(tmp_path), auto_compact=None)
+    for i in range(2):
+        book.append([_row(i)])
+    lock, token = book._acquire_lock()
+    assert book._acquire_lock() is None
+    # khoá bị coi là cũ và tiến trình khác đã lấy lại
+    (tmp_path / ".compact.lock").write_text("other")
+    book._release_lock(lock, token)
+    assert (tmp_path / ".compact.lock").read_text() == "other"
+    os.remove(lock)
+    assert book.compact() == 2 and not (tmp_path / ".compact.lock").exists()
+
+def test_runoff_chart_draws_book_runoff(tmp_path):
+    from src.ui.charts import runoff_chart
+    book = PortfolioBook(str(tmp_path))
+    book.append([_row(i) for i in range(30)])
+    out = book.runoff()
+    spec = runoff_chart(out, max_points=50).to_dict()
+    assert len(spec["vconcat"]) == 2
+    assert {"p10_balance", "p50_balance", "p90_balance"} <= set(out.columns)
+
+def test_summary_and_buckets_match_pandas(tmp_path):
+    import pandas as pd
+    rng = np.random.default_rng(3)
+    n = 2_000
+    df = pd.DataFrame({"loan_id": np.arange(n).astype(str), "branch": rng.choice(["HN01", "HCM", "DN"], n),
+                       "product": rng.choice(["mua nhà", "ô tô"], n), "so_tien_vay": rng.uniform(1e8, 3e9, n),
+                       "dsr_percent": rng.uniform(5, 90, n), "ltv_percent": rng.uniform(20, 110, n)})
+    df.loc[:49, "ltv_percent"] = np.nan
+    book = PortfolioBook(str(tmp_path), auto_compact=None)
+    rows = df.astype(object).where(df.notna(), None).to_dict("records")   # thiếu LTV -> null như append_dossier
+    for start in range(0, n, 500):
+        book.append(rows[start:start + 500])
+
+    s = book.summary(by=("branch",), where={"product": "mua nhà"}, percentiles=(50,))
+    sub = df[df["product"] == "mua nhà"].groupby("branch")
+    assert s["branch"].tolist() == sorted(sub.groups)
+    assert s["so_khoan"].tolist() == sub.size().tolist()
+    np.testing.assert_allclose(s["tong_tien_vay"], sub["so_tien_vay"].sum())
+    np.testing.assert_allclose(s["ltv_mean"], sub["ltv_percent"].mean())
+    np.testing.assert_allclose(s["dsr_p50"], sub["dsr_percent"].median(), rtol=0.02)
+
+    b = book.buckets("ltv_percent")
+    expected = pd.cut(df["ltv_percent"], [-np.inf, 50, 60, 70, 80, 90, 100, np.inf], right=False).value_counts(sort=False)
+    assert b["bucket"].tolist()[-1] == "n/a" and b["so_khoan"].tolist() == expected.tolist() + [50]
+    assert b["ty_trong"].sum() == 1.0
+    by_branch = book.buckets("dsr_percent", edges=(30, 60), by=("branch",))
+    assert by_branch.groupby("branch")["ty_trong"].sum().round(12).eq(1.0).all()
@@ -0,0 +1,40 @@
+import copy
+
+import pytest
+
+from src.logic.finance import recalc_all
+from src.logic.reactive import Derived
+
+_DATA = {
+    "identification": {"ten": "Nguyễn Văn An"},
+    "finance": {"so_tien_vay": 1_000_000_000, "lai_suat_p_a": 8.5, "thoi_han_thang": 120},
+    "income": {"thu_nhap_hang_thang": 40_000_000},
+    "collateral": [{"gia_tri": 2_000_000_000}],
+}
+
+def test_derived_recomputes_only_when_inputs_change():
+    d = Derived("sum", lambda data: (data["a"], data["b"]), lambda a, b: a + b)
+    assert d.get({"a": 1, "b": 2, "x": 0}) == 3
+    assert d.get({"a": 1, "b": 2, "x": 9}) == 3 and d.computations == 1
+    assert d.get({"a": 2, "b": 2}) == 4 and d.computations == 2
+    d.invalidate()
+    assert d.get({"a": 2, "b": 2}) == 4 and d.computations == 3
+
+def test_recalc_all_reuses_schedule_across_unrelated_edits():
+    state = {"data": copy.deepcopy(_DATA)}
+    schedule = recalc_all(state)
+    model = state["recalc_model"]
+    dsr = state["summary"]["dsr_percent"]
+
+    state["data"]["identification"]["ten"] = "Trần Thị Hoa"
+    assert recalc_all(state) is schedule
+    assert (model.schedule.computations, model.summary.computations) == (1, 1)
+
+    # thu nhập đổi: chỉ summary tính lại, lịch trả nợ giữ nguyên
+    state["data"]["income"]["thu_nhap_hang_thang"] = 80_000_000
+    assert recalc_all(state) is schedule
+    assert (model.schedule.computations, model.summary.computations) == (1, 2)
+    assert state["summary"]["dsr_percent"] == pytest.approx(dsr / 2)
+
+    state["data"]["finance"]["thoi_han_thang"] = 60
+    assert len(recalc_all(state)) == 60 and model.schedule.computations == 2
@@ -0,0 +1,109 @@
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from src.export.report_engine import DOCUMENT_PART, ReportTemplate, default_template_bytes
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# mẫu thật của ngân hàng: đoạn rỗng tự đóng ngay trước bảng, placeholder bị Word cắt thành nhiều run
+_BODY = (
+    '<w:p><w:r><w:t>Họ tên: {{ten}}</w:t></w:r></w:p>'
+    '<w:p w:rsidR="00A1B2C3" w:rsidRDefault="00A1B2C3"/>'
+    '<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/></w:tblPr>'
+    '<w:tr><w:tc><w:p w:rsidR="00D4"><w:r><w:t>{{cc</w:t></w:r><w:r><w:t>cd}}</w:t></w:r></w:p></w:tc>'
+    '<w:tc><w:p><w:r><w:t>CCCD</w:t></w:r></w:p></w:tc></w:tr>'
+    '</w:tbl>'
+    '<w:p w:rsidR="00E5"/>'
+    '<w:p><w:r><w:t>{{BANG_LICH_TRA_NO}}</w:t></w:r></w:p>'
+)
+
+def _template_with_body(body):
+    src = zipfile.ZipFile(io.BytesIO(default_template_bytes()))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name in src.namelist():
+            content = src.read(name)
+            if name == DOCUMENT_PART:
+                xml = content.decode("utf-8")
+                start, end = xml.index("<w:body>") + len("<w:body>"), xml.index("<w:sectPr>")
+                content = (xml[:start] + body + xml[end:]).encode("utf-8")
+            z.writestr(name, content)
+    return buf.getvalue()
+
+def test_self_closing_paragraph_before_table():
+    tpl = ReportTemplate.load(_template_with_body(_BODY))
+    data = {"identification": {"ten": "Nguyễn Văn A", "cccd": "012345678901"}, "finance": {}, "income": {}}
+    schedule = pd.DataFrame({"month": [1, 2], "payment": [10.0, 10.0], "interest": [1.0, 0.5],
+                             "principal": [9.0, 9.5], "balance": [9.5, 0.0]})
+    out = tpl.render(data, schedule)
+    root = ET.fromstring(zipfile.ZipFile(io.BytesIO(out)).read(DOCUMENT_PART))
+    body = root.find(f"{W}body")
+    tables = body.findall(f"{W}tbl")
+    assert len(tables) == 2                      # bảng của mẫu + bảng lịch trả nợ
+    cells = ["".join(t.text or "" for t in tc.iter(f"{W}t")) for tc in tables[0].iter(f"{W}tc")]
+    assert cells == ["012345678901", "CCCD"]
+    assert len(tables[1].findall(f"{W}tr")) == 3
+    texts = "".join(t.text or "" for t in body.iter(f"{W}t"))
+    assert "Nguyễn Văn A" in texts and "{{" not in texts
+
+def _document(out):
+    return ET.fromstring(zipfile.ZipFile(io.BytesIO(out)).read(DOCUMENT_PART)).find(f"{W}body")
+
+_DATA = {"identification": {"ten": "Nguyễn Văn A", "cccd": "012345678901"}, "finance": {}, "income": {}}
+
+def test_split_placeholder_keeps_other_runs_and_paragraph_properties():
+    body = (
+        '<w:p><w:pPr><w:jc w:val="center"/></w:pPr>'
+        '<w:r><w:rPr><w:i/></w:rPr><w:t xml:space="preserve">Họ tên: </w:t></w:r>'
+        '<w:r><w:rPr><w:b/></w:rPr><w:t>{{te</w:t></w:r>'
+        '<w:proofErr w:type="spellStart"/>'
+        '<w:r><w:rPr><w:u w:val="single"/></w:rPr><w:t>n}}</w:t></w:r>'
+        '<w:r><w:tab/></w:r>'
+        '<w:r><w:rPr><w:i/></w:rPr><w:t>CCCD {{cccd}}</w:t></w:r></w:p>'
+    )
+    para = _document(ReportTemplate.load(_template_with_body(body)).render(_DATA)).find(f"{W}p")
+    assert para.find(f"{W}pPr/{W}jc").get(f"{W}val") == "center"
+    runs = para.findall(f"{W}r")
+    texts = ["".join(t.text or "" for t in r.iter(f"{W}t")) for r in runs]
+    assert texts == ["Họ tên: ", "Nguyễn Văn A", "", "CCCD 012345678901"]
+    assert runs[0].find(f"{W}rPr/{W}i") is not None
+    assert runs[1].find(f"{W}rPr/{W}b") is not None and runs[1].find(f"{W}rPr/{W}u") is None
+    assert runs[2].find(f"{W}tab") is not None
+    assert para.find(f"{W}proofErr") is not None
+
+def test_text_box_paragraphs_are_not_confused_with_outer_paragraph():
+    body = (
+        '<w:p><w:r><w:t>Trước </w:t></w:r><w:r><w:pict><w:txbxContent>'
+        '<w:p><w:r><w:t>{{cc</w:t></w:r><w:r><w:t>cd}}</w:t></w:r></w:p>'
+        '</w:txbxContent></w:pict></w:r><w:r><w:t>Sau {{ten}}</w:t></w:r></w:p>'
+    )
+    body_el = _document(ReportTemplate.load(_template_with_body(body)).render(_DATA))
+    outer = body_el.find(f"{W}p")
+    inner = outer.find(f".//{W}txbxContent/{W}p")
+    assert "".join(t.text for t in inner.iter(f"{W}t")) == "012345678901"
+    own = [t.text for r in outer.findall(f"{W}r") for t in r.findall(f"{W}t")]
+    assert own == ["Trước ", "Sau Nguyễn Văn A"]
+
+def test_table_placeholder_inside_table_cell_keeps_cell_valid():
+    body = ('<w:tbl><w:tr><w:tc><w:p><w:r><w:t>{{BANG_LICH_TRA_NO}}</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+            '<w:p><w:r><w:t>Hết</w:t></w:r></w:p>')
+    schedule = pd.DataFrame({"month": [1], "payment": [10.0], "interest": [1.0], "principal": [9.0], "balance": [0.0]})
+    body_el = _document(ReportTemplate.load(_template_with_body(body)).render(_DATA, schedule))
+    cell = body_el.find(f"{W}tbl/{W}tr/{W}tc")
+    assert [c.tag for c in cell] == [f"{W}tbl", f"{W}p"]
+    assert len(cell.find(f"{W}tbl").findall(f"{W}tr")) == 2
+
+def test_batch_reports_zip_with_unique_names():
+    from src.export.report_engine import render_reports_zip
+    schedule = pd.DataFrame({"month": [1], "payment": [10.0], "interest": [1.0], "principal": [9.0], "balance": [0.0]})
+    items = [(name, {**_DATA, "identification": {"ten": ten, "cccd": ""}}, schedule)
+             for name, ten in (("hs_a", "Nguyễn Văn A"), ("hs_a.docx", "Trần Thị B"), ("hs_c", "Lê Văn C"))]
+    buf = io.BytesIO()
+    assert render_reports_zip(items, buf, template=_template_with_body(_BODY), workers=2, chunksize=1) == 3
+    z = zipfile.ZipFile(buf)
+    assert z.namelist() == ["hs_a.docx", "hs_a (2).docx", "hs_c.docx"]
+    texts = ["".join(t.text or "" for t in _document(z.read(n)).iter(f"{W}t")) for n in z.namelist()]
+    assert ["Trần Thị B" in t for t in texts] == [False, True, False]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from src.logic.finance import amortization_arrays, amortization_schedule, schedules_to_frame
+from src.logic.schedule import Schedule, ScheduleBatch
+from src.ui.charts import schedule_chart_frame
+
+def test_batch_negative_index_and_bounds():
+    batch = ScheduleBatch([1e9, 2e9, 3e8], [8.5, 0.0, 10.0], [12, 24, 36], dtype="float64").materialize()
+    for i in range(-3, 0):
+        assert batch[i].principal == batch[i + 3].principal
+        np.testing.assert_array_equal(batch[i].columns()["balance"], batch[i + 3].columns()["balance"])
+    assert len(batch[-1].columns()["balance"]) == 36
+    for i in (3, -4):
+        with pytest.raises(IndexError):
+            batch[i]
+    assert [s.principal for s in batch] == [1e9, 2e9, 3e8]
+
+def test_schedule_chart_frame_downsamples_without_full_frame():
+    sched = Schedule(2e9, 9.0, 3000, dtype="int64")
+    small = schedule_chart_frame(sched, ["payment", "balance"], max_points=200)
+    assert 3 <= len(small) <= 200
+    full = sched.to_pandas().set_index("month")
+    assert (small.set_index("month")[["payment", "balance"]] == full.loc[small["month"], ["payment", "balance"]]).all().all()
+    assert small["month"].iloc[0] == 1 and small["month"].iloc[-1] == 3000
+    assert len(schedule_chart_frame(sched.head(24))) == 24
+
+def test_schedule_is_lazy_and_matches_dataframe_engine():
+    sched = Schedule(1_500_000_000, 8.5, 240)
+    head = sched.head(24)
+    assert sched.nbytes == 0 and head.nbytes == 0 and len(head) == 24
+    expected = amortization_schedule(1_500_000_000, 8.5, 240)
+    np.testing.assert_allclose(head.payment, expected["payment"][:24])
+    assert head.nbytes == 4 * 24 * 8 and sched.nbytes == 0
+    np.testing.assert_allclose(sched[::12].balance, expected["balance"][::12])
+    np.testing.assert_allclose(sched.to_pandas().to_numpy(), expected.to_numpy())
+    assert sched[-1] == pytest.approx({**expected.iloc[-1].to_dict(), "month": 240})
+    rows = list(sched.tail(3).rows(chunk_size=2))
+    assert [r["month"] for r in rows] == [238, 239, 240]
+
+def test_int64_rounding_and_dtype_validation():
+    sched = Schedule(1_000_000_000, 9.0, 60, dtype="int64")
+    assert sched.payment.dtype == np.int64
+    np.testing.assert_array_equal(sched.payment, np.rint(amortization_schedule(1e9, 9.0, 60)["payment"]))
+    assert len(Schedule(0, 9.0, 60)) == 0 and Schedule(0, 9.0, 60).to_pandas().empty
+    with pytest.raises(ValueError):
+        Schedule(1e9, 9.0, 60, dtype="float16")
+
+def test_batch_long_frame_matches_schedules_to_frame():
+    P, R, N = [1e9, 0.0, 3e8, 5e8], [8.5, 9.0, 0.0, 12.0], [12, 24, 36, 6]
+    batch = ScheduleBatch(P, R, N, dtype="float64", loan_ids=["a", "b", "c", "d"])
+    assert batch.n_rows == 54 and batch.nbytes < 200
+    df = batch.to_pandas()
+    expected = schedules_to_frame(amortization_arrays(P, R, N), loan_ids=["a", "b", "c", "d"])
+    expected = expected[expected["loan_id"] != "b"].reset_index(drop=True)
+    np.testing.assert_allclose(df[["month", "payment", "balance"]], expected[["month", "payment", "balance"]])
+    assert df["loan_id"].tolist() == expected["loan_id"].tolist()
+    assert np.shares_memory(batch[2].columns()["balance"], batch._cols["balance"])